@@ -0,0 +1,198 @@
+"""Offline benchmark suite of the ingest pipeline.
+
+Every synthetic data product shape (see synthetic.SHAPES) is run through the stages of a registration:
+ZipHandler, DataReader (full read and schema only), DataProductDetailSampleDataTable._extract_columns,
+whole_data_product_to_json and a full register_product with uploads and catalog posts against local stand-ins.
+The results are stored per commit in benchmarks/results, so regressions are visible between commits.
+
+Usage:
+    python -m benchmarks.ingest                       # all shapes, full size
+    python -m benchmarks.ingest --shapes csv,wide --scale 0.1 --repeat 3
+    python -m benchmarks.ingest --compare benchmarks/results/<commit>.json
+"""
+from pathlib import Path
+from typing import Callable, Optional
+import argparse
+import datetime
+import io
+import json
+import platform
+import subprocess
+import sys
+import time
+
+from benchmarks.stand_ins import LocalBlobServiceClient, LocalCatalogServer
+from benchmarks.synthetic import SHAPES, ProductShape, make_product_zip, scaled
+import src.modules.logic.blob_storage as bs
+import src.modules.logic.data_product_details as dp
+import src.modules.logic.data_reader as dr
+import src.modules.logic.posts as posts
+import src.modules.logic.zip_handler as zh
+import src.modules.ui_components.dp_form as dp_form
+
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+CONNECTION_STRING = "DefaultEndpointsProtocol=https;AccountName=devaccount;AccountKey=a2V5;EndpointSuffix=core.windows.net"
+# a stage counts as regressed if it is this much slower than in the compared run
+REGRESSION_THRESHOLD = 1.2
+
+
+def _best_of(repeat: int, fn: Callable[[], object]) -> float:
+    """Helper Function that returns the fastest of 'repeat' runs in seconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def _dp_details(shape: ProductShape) -> dp.DataProductDetails:
+    information = dp.DataProductDetailsInformation("BENCH", "Benchmark", "Benchmark", ["en"])
+    access_details = dp.AccessDetails("private", "http/json")
+    return dp.DataProductDetails(shape.data_product_name, 1, access_details, information)
+
+
+def _members(data: bytes) -> list[tuple[bytes, str]]:
+    return list(zh.ZipHandler(io.BytesIO(data), "").extract_dp_items())
+
+
+def run_shape(shape: ProductShape, repeat: int = 3) -> dict[str, float]:
+    """Runs all stages for one data product shape and returns the best time of every stage in seconds"""
+    data = make_product_zip(shape)
+    members = _members(data)
+    frames = [(name, dr.DataReader(name, bytes_data).data) for bytes_data, name in members]
+    details = _dp_details(shape)
+
+    def extract_columns():
+        return [
+            dp.DataProductDetailSampleDataTable(name, 1, details.id, df) for name, df in frames
+        ]
+
+    def to_json():
+        details.register_product_detail_sample_data_tables(extract_columns())
+        return details.whole_data_product_to_json()
+
+    results = {
+        "zip_bytes": len(data),
+        "zip_handler": _best_of(repeat, lambda: _members(data)),
+        "data_reader": _best_of(repeat, lambda: [dr.DataReader(n, b) for b, n in members]),
+        "data_reader_schema_only": _best_of(
+            repeat, lambda: [dr.DataReader(n, b, schema_only=True) for b, n in members]
+        ),
+        "extract_columns": _best_of(repeat, extract_columns),
+        "whole_data_product_to_json": _best_of(repeat, to_json),
+    }
+    with LocalCatalogServer() as catalog:
+        results["register_product"] = _best_of(repeat, lambda: register(shape, data, catalog.url))
+    return results
+
+
+def register(shape: ProductShape, data: bytes, catalog_url: str) -> None:
+    """Runs a full registration the way the app does, against the local blob storage and catalog stand-ins"""
+    blob_handler = bs.BlobStorage(CONNECTION_STRING, "bench")
+    blob_handler.blob_service_client = LocalBlobServiceClient()
+    details = _dp_details(shape)
+
+    table_poster = posts.CatalogPoster(f"{catalog_url}/tables")
+    column_poster = posts.CatalogPoster(f"{catalog_url}/columns")
+    dp_form.register_product(
+        io.BytesIO(data),
+        details,
+        blob_handler,
+        stream_upload=True,
+        max_workers=4,
+        max_concurrency=2,
+    )
+    posts.post_data_product_details(details, f"{catalog_url}/products")
+    with posts.TablePublisher(table_poster, column_poster) as publish_table:
+        for table in details.data_product_detail_sample_data_table:
+            publish_table(table)
+        publish_table.wait()
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(shapes: list[str], scale: float = 1.0, repeat: int = 3) -> dict:
+    """Runs the suite and returns the results together with the commit and the environment"""
+    results = {}
+    for name in shapes:
+        shape = scaled(SHAPES[name], scale)
+        print(f"running {shape}", file=sys.stderr)
+        results[name] = run_shape(shape, repeat)
+    return {
+        "commit": _commit(),
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "scale": scale,
+        "results": results,
+    }
+
+
+def save(report: dict, results_dir: Path = RESULTS_DIR) -> Path:
+    results_dir.mkdir(parents=True, exist_ok=True)
+    path = results_dir / f"{report['commit']}.json"
+    path.write_text(json.dumps(report, indent=2))
+    return path
+
+
+def compare(report: dict, baseline: dict, threshold: float = REGRESSION_THRESHOLD) -> list[str]:
+    """Prints the ratio of every stage to the baseline and returns the regressed stages"""
+    regressions = []
+    for shape, stages in report["results"].items():
+        for stage, seconds in stages.items():
+            before = baseline["results"].get(shape, {}).get(stage)
+            if stage == "zip_bytes" or not before:
+                continue
+            ratio = seconds / before
+            marker = "REGRESSION" if ratio > threshold else ""
+            print(f"{shape:>12} {stage:>28} {before:9.4f}s -> {seconds:9.4f}s  x{ratio:5.2f} {marker}")
+            if marker:
+                regressions.append(f"{shape}/{stage}")
+    return regressions
+
+
+def latest_baseline(results_dir: Path, exclude: str) -> Optional[dict]:
+    """Returns the most recent stored report of another commit"""
+    reports = sorted(
+        (path for path in results_dir.glob("*.json") if path.stem != exclude),
+        key=lambda path: path.stat().st_mtime,
+    )
+    return json.loads(reports[-1].read_text()) if reports else None
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shapes", default=",".join(SHAPES), help="comma separated shapes to run")
+    parser.add_argument("--scale", type=float, default=1.0, help="scales rows and files of every shape")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per stage, the fastest counts")
+    parser.add_argument("--compare", type=Path, help="report to compare against (default: latest stored report)")
+    parser.add_argument("--no-save", action="store_true", help="do not store the report")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args(argv)
+
+    report = run(args.shapes.split(","), args.scale, args.repeat)
+    print(json.dumps(report, indent=2))
+    if not args.no_save:
+        print(f"stored report in {save(report)}", file=sys.stderr)
+
+    baseline = (
+        json.loads(args.compare.read_text())
+        if args.compare
+        else latest_baseline(RESULTS_DIR, exclude=report["commit"])
+    )
+    if baseline is None:
+        return 0
+    regressions = compare(report, baseline)
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""Local stand-ins for the blob storage and the catalog endpoints, so the ingest benchmarks run offline."""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import gzip
+import json
+import threading
+
+
+class LocalBlobClient:
+    """Keeps an uploaded blob in memory, implements the blob client calls used by BlobStorage"""
+
+    def __init__(self, service: "LocalBlobServiceClient", name: str):
+        self.service = service
+        self.name = name
+        self.staged: dict[str, bytes] = {}
+
+    def upload_blob(self, data, **kwargs):
+        self.service.store(self.name, data if isinstance(data, bytes) else data.read())
+
+    def stage_block(self, block_id, data, **kwargs):
+        self.staged[block_id] = bytes(data)
+
+    def commit_block_list(self, block_list, **kwargs):
+        self.service.store(self.name, b"".join(self.staged.pop(block.id) for block in block_list))
+
+
+class LocalBlobServiceClient:
+    """In-memory stand-in for azure's BlobServiceClient, only the sizes of the blobs are kept"""
+
+    def __init__(self):
+        self.blob_sizes: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def store(self, name: str, data: bytes) -> None:
+        with self._lock:
+            self.blob_sizes[name] = len(data)
+
+    def get_blob_client(self, container, blob):
+        return LocalBlobClient(self, blob)
+
+    def get_container_client(self, container):
+        return self
+
+    def walk_blobs(self, name_starts_with=None, delimiter="/"):
+        return []
+
+
+class _CatalogHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        if self.headers.get("Content-Type", "").startswith("application/json"):
+            payload = json.loads(body)
+            self.server.count(len(payload) if isinstance(payload, list) else 1)
+        else:
+            self.server.count(1)
+        self.send_response(201)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class LocalCatalogServer(ThreadingHTTPServer):
+    """Catalog stand-in on localhost that accepts single items and lists of items and counts them"""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _CatalogHandler)
+        self.items = 0
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(
+            target=self.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+        )
+
+    def count(self, items: int) -> None:
+        with self._lock:
+            self.items += items
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
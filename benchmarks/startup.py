@@ -0,0 +1,102 @@
+"""Startup benchmark of the app, measured in fresh interpreters like a cold container start.
+
+It checks the import time of src.app, that the heavy libraries are not imported before they are needed,
+and the time until the first page is rendered, against a budget.
+
+Usage:
+    python -m benchmarks.startup
+"""
+from pathlib import Path
+import json
+import os
+import subprocess
+import sys
+
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# seconds, can be overridden per environment (e.g. slower CI machines)
+IMPORT_BUDGET = float(os.environ.get("STARTUP_IMPORT_BUDGET", 2.0))
+FIRST_RENDER_BUDGET = float(os.environ.get("STARTUP_RENDER_BUDGET", 6.0))
+
+# libraries that must only be imported once a data product is registered
+HEAVY_MODULES = ["pandas", "pyarrow", "openpyxl", "azure.storage.blob", "requests"]
+
+# the first page only needs the storage settings, the values are never used to connect
+RENDER_ENVIRONMENT = {
+    "AZURE_ACCOUNT_URL": "DefaultEndpointsProtocol=https;AccountName=devaccount;AccountKey=a2V5;EndpointSuffix=core.windows.net",
+    "DATA_PRODUCTS_CONTAINER_NAME": "data-products",
+}
+
+_IMPORT_CODE = """
+import json, sys, time
+start = time.perf_counter()
+import src.app
+seconds = time.perf_counter() - start
+loaded = [
+    name for name in {heavy!r}
+    if name in sys.modules and type(sys.modules[name]).__name__ != "_LazyModule"
+]
+print(json.dumps({{"seconds": seconds, "heavy_modules": loaded}}))
+"""
+
+_RENDER_CODE = """
+import json, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file("main.py")
+app.run(timeout=60)
+seconds = time.perf_counter() - start
+print(json.dumps({"seconds": seconds, "exceptions": [str(e.value) for e in app.exception]}))
+"""
+
+
+def _run(code: str, environment: dict[str, str] = None) -> dict:
+    """Helper Function that runs python code in a fresh interpreter and returns the JSON it prints last"""
+    env = {**os.environ, **(environment or {})}
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def measure_import() -> dict:
+    """Returns the import time of src.app and the heavy modules it imported"""
+    return _run(_IMPORT_CODE.format(heavy=HEAVY_MODULES))
+
+
+def measure_first_render() -> dict:
+    """Returns the time until the first page is rendered, including the streamlit start-up"""
+    environment = {key: os.environ.get(key, value) for key, value in RENDER_ENVIRONMENT.items()}
+    return _run(_RENDER_CODE, environment)
+
+
+def check_budget(import_result: dict, render_result: dict) -> list[str]:
+    """Returns a description of every violated budget, an empty list if the start-up is within budget"""
+    violations = []
+    if import_result["seconds"] > IMPORT_BUDGET:
+        violations.append(f"import of src.app took {import_result['seconds']:.2f}s, budget {IMPORT_BUDGET:.2f}s")
+    if import_result["heavy_modules"]:
+        violations.append(f"src.app imported {import_result['heavy_modules']} eagerly")
+    if render_result["seconds"] > FIRST_RENDER_BUDGET:
+        violations.append(f"first render took {render_result['seconds']:.2f}s, budget {FIRST_RENDER_BUDGET:.2f}s")
+    if render_result["exceptions"]:
+        violations.append(f"first render raised {render_result['exceptions']}")
+    return violations
+
+
+def main() -> int:
+    import_result = measure_import()
+    render_result = measure_first_render()
+    violations = check_budget(import_result, render_result)
+    print(json.dumps({"import": import_result, "first_render": render_result, "violations": violations}, indent=2))
+    return 1 if violations else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
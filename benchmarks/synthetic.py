@@ -0,0 +1,86 @@
+"""Generates synthetic data product zips of configurable size and shape for the benchmarks."""
+from dataclasses import dataclass
+import io
+import zipfile
+import numpy as np
+import pandas as pd
+
+
+@dataclass(frozen=True)
+class ProductShape:
+    """Data Class that describes a synthetic data product,
+    every file holds 'rows' rows of 'columns' columns (mixed int, float, string and date columns)"""
+
+    name: str
+    file_type: str
+    files: int = 1
+    rows: int = 10_000
+    columns: int = 10
+    sheets: int = 1
+
+    @property
+    def data_product_name(self) -> str:
+        return f"bench-{self.name}"
+
+
+# the default shapes cover the file types and the extremes we see in production
+SHAPES = {
+    "csv": ProductShape("csv", "csv", files=2, rows=200_000, columns=12),
+    "parquet": ProductShape("parquet", "parquet", files=2, rows=200_000, columns=12),
+    "excel": ProductShape("excel", "xlsx", files=1, rows=5_000, columns=8, sheets=4),
+    "wide": ProductShape("wide", "parquet", files=1, rows=1_000, columns=3_000),
+    "many-small": ProductShape("many-small", "csv", files=200, rows=50, columns=6),
+}
+
+
+def make_frame(rows: int, columns: int, seed: int = 0) -> pd.DataFrame:
+    """Creates a dataframe whose columns cycle through int, float, string and date values"""
+    rng = np.random.default_rng(seed)
+    data = {}
+    for i in range(columns):
+        kind = i % 4
+        if kind == 0:
+            data[f"int_{i}"] = rng.integers(0, 1_000_000, rows)
+        elif kind == 1:
+            data[f"float_{i}"] = rng.random(rows)
+        elif kind == 2:
+            data[f"string_{i}"] = rng.choice(["Wien", "Graz", "Linz", "Salzburg", "Innsbruck"], rows)
+        else:
+            data[f"date_{i}"] = pd.Timestamp("2020-01-01") + pd.to_timedelta(rng.integers(0, 1_000, rows), unit="D")
+    return pd.DataFrame(data)
+
+
+def _to_bytes(df: pd.DataFrame, shape: ProductShape) -> bytes:
+    with io.BytesIO() as f:
+        if shape.file_type == "csv":
+            df.to_csv(f, index=False)
+        elif shape.file_type == "parquet":
+            df.to_parquet(f, index=False)
+        else:
+            with pd.ExcelWriter(f) as writer:
+                for sheet in range(shape.sheets):
+                    df.to_excel(writer, sheet_name=f"Sheet{sheet}", index=False)
+        return f.getvalue()
+
+
+def make_product_zip(shape: ProductShape) -> bytes:
+    """Creates the zip of a synthetic data product, one folder named after the data product holding all files"""
+    df = make_frame(shape.rows, shape.columns)
+    data = _to_bytes(df, shape)
+    with io.BytesIO() as f:
+        with zipfile.ZipFile(f, "w", zipfile.ZIP_DEFLATED) as zip_:
+            for i in range(shape.files):
+                zip_.writestr(f"{shape.data_product_name}/table_{i}.{shape.file_type}", data)
+        return f.getvalue()
+
+
+def scaled(shape: ProductShape, factor: float) -> ProductShape:
+    """Returns the shape with its rows and files scaled, e.g. to run the suite quickly"""
+    return ProductShape(
+        shape.name,
+        shape.file_type,
+        files=max(1, int(shape.files * factor)),
+        rows=max(1, int(shape.rows * factor)),
+        columns=shape.columns,
+        sheets=shape.sheets,
+    )
@@ -0,0 +1,247 @@
+"""Headless entry point that registers many data products from a manifest, without the streamlit form.
+
+Every product runs through the same pipeline as in the app: ZipHandler -> DataReader -> blob upload -> catalog posts
+-> back-end post, up to --workers products at the same time. A result and timing line is printed per product.
+The endpoints, the storage account and the reader options are taken from the same environment variables as the app.
+
+The manifest is a JSON list of products (or an object with a "products" list), relative paths start at the manifest:
+    [
+        {
+            "data_product_name": "sales",
+            "path": "sales.zip",                      # a zip with one folder, or a folder of data product items
+            "schema_version": 1,
+            "information": {"domain": "ODS", "description": "Sales", "data_owner": "Jana Doe", "language": ["en"]},
+            "restriction_type": "private",
+            "tags": ["sales"]
+        }
+    ]
+
+Usage:
+    python register_products.py manifest.json --workers 4
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import IO, Optional, TextIO
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import zipfile
+
+from dotenv import load_dotenv
+import src.modules.logic.blob_storage as bs
+import src.modules.logic.data_product_details as dp
+import src.modules.logic.posts as posts
+import src.modules.ui_components.dp_form as dp_form
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RegistrationSettings:
+    """Data Class that holds the endpoints and the pipeline options shared by all registrations of a run"""
+
+    data_product_endpoint_url: str
+    table_endpoint_url: str
+    column_endpoint_url: str
+    backend_endpoint_url: Optional[str] = None
+    admin_pw: Optional[str] = field(default=None, repr=False)
+    upload_workers: int = 4
+    upload_max_concurrency: int = 2
+    parse_workers: int = 0
+    reader_options: dict = field(default_factory=dict)
+    sample_budget: Optional[int] = None
+    catalog_batch_size: int = 1
+    catalog_max_concurrency: int = 8
+    to_parquet: bool = False
+    keep_original: bool = True
+
+    @classmethod
+    def from_env(cls) -> "RegistrationSettings":
+        """Reads the settings from the environment variables of the app"""
+        stable_chunks = os.environ.get("CSV_SCHEMA_STABLE_CHUNKS")
+        return cls(
+            data_product_endpoint_url=os.environ["DATA_PRODUCT_DETAIL_ENDPOINT"],
+            table_endpoint_url=os.environ["DATA_PRODUCT_TABLE_DETAIL_ENDPOINT"],
+            column_endpoint_url=os.environ["DATA_PRODUCT_COLUMN_DETAIL_ENDPOINT"],
+            backend_endpoint_url=os.environ["CREATE_ENDPOINT_BACKEND"],
+            admin_pw=os.environ["ADMIN_PW"],
+            upload_workers=int(os.environ.get("UPLOAD_WORKERS", 4)),
+            upload_max_concurrency=int(os.environ.get("UPLOAD_MAX_CONCURRENCY", 2)),
+            parse_workers=int(os.environ.get("PARSE_WORKERS", 0)),
+            reader_options={
+                "max_rows": int(os.environ.get("EXCEL_SCHEMA_ROWS", 10_000)),
+                "csv_engine": os.environ.get("CSV_ENGINE", "arrow"),
+                "sample_rows": int(os.environ.get("SAMPLE_ROWS", 10)),
+                "profile": os.environ.get("PROFILE_COLUMNS", "false").lower() == "true",
+                "chunked_schema": os.environ.get("CSV_CHUNKED_SCHEMA", "true").lower() == "true",
+                "stable_chunks": int(stable_chunks) if stable_chunks else None,
+            },
+            sample_budget=int(os.environ.get("SAMPLE_BUDGET_KB", 256)) * 1024,
+            catalog_batch_size=int(os.environ.get("CATALOG_BATCH_SIZE", 1)),
+            catalog_max_concurrency=int(os.environ.get("CATALOG_MAX_CONCURRENCY", 8)),
+            to_parquet=os.environ.get("TRANSCODE_TO_PARQUET", "false").lower() == "true",
+            keep_original=os.environ.get("KEEP_ORIGINAL_FILES", "true").lower() == "true",
+        )
+
+
+@dataclass
+class ProductResult:
+    """Data Class that holds the outcome of one registration"""
+
+    data_product_name: str
+    status: str = "ok"
+    seconds: float = 0.0
+    bytes: int = 0
+    tables: int = 0
+    columns: int = 0
+    error: Optional[str] = None
+
+    def __str__(self) -> str:
+        line = (
+            f"{self.data_product_name:<30} {self.status:<6} {self.seconds:8.2f}s "
+            f"{self.bytes / 1_000_000:10.1f} MB {self.tables:5} tables {self.columns:7} columns"
+        )
+        return f"{line}  {self.error}" if self.error else line
+
+
+def load_manifest(path: Path) -> list[dict]:
+    """Reads the products of a manifest, their paths are resolved relative to the manifest"""
+    manifest = json.loads(path.read_text())
+    entries = manifest["products"] if isinstance(manifest, dict) else manifest
+    for entry in entries:
+        entry["path"] = (path.parent / entry["path"]).resolve()
+    return entries
+
+
+def product_details(entry: dict) -> dp.DataProductDetails:
+    """Creates the data product details of a manifest entry"""
+    return dp.DataProductDetails(
+        entry["data_product_name"].strip(),
+        entry.get("schema_version", 1),
+        dp.AccessDetails(entry.get("restriction_type", "private"), "http/json"),
+        dp.DataProductDetailsInformation(**entry["information"]),
+        tags=entry.get("tags", []),
+    )
+
+
+def open_product_data(path: Path) -> IO[bytes]:
+    """Opens the zip of a product, a folder is first packed into an uncompressed zip in a temporary file
+    (the items are then read from the zip without decompressing them)"""
+    if not path.is_dir():
+        return open(path, "rb")
+    data = tempfile.TemporaryFile()
+    with zipfile.ZipFile(data, "w", zipfile.ZIP_STORED) as zip_:
+        for item in sorted(path.iterdir()):
+            zip_.write(item, f"{path.name}/{item.name}")
+    data.seek(0)
+    return data
+
+
+def register_entry(entry: dict, blob_handler: bs.BlobStorage, settings: RegistrationSettings) -> ProductResult:
+    """Registers one product of the manifest, failures are returned as an error result instead of being raised"""
+    result = ProductResult(entry["data_product_name"])
+    start = time.perf_counter()
+    try:
+        details = product_details(entry)
+        if blob_handler.data_product_exists(details.data_product_name):
+            raise ValueError(f"The Data Product {details.data_product_name!r} already exists")
+
+        table_poster = posts.CatalogPoster(
+            settings.table_endpoint_url,
+            batch_size=settings.catalog_batch_size,
+            max_concurrency=settings.catalog_max_concurrency,
+        )
+        column_poster = posts.CatalogPoster(
+            settings.column_endpoint_url,
+            batch_size=settings.catalog_batch_size,
+            max_concurrency=settings.catalog_max_concurrency,
+        )
+        with open_product_data(entry["path"]) as file:
+            result.bytes = file.seek(0, os.SEEK_END)
+            file.seek(0)
+            dp_form.register_product(
+                file,
+                details,
+                blob_handler,
+                stream_upload=True,
+                max_workers=settings.upload_workers,
+                max_concurrency=settings.upload_max_concurrency,
+                parse_workers=settings.parse_workers,
+                reader_options=settings.reader_options,
+                sample_budget=settings.sample_budget,
+                to_parquet=settings.to_parquet,
+                keep_original=settings.keep_original,
+            )
+
+        # like in the app, the catalog is only posted to once all items are uploaded
+        posts.post_data_product_details(details, settings.data_product_endpoint_url)
+        with posts.TablePublisher(table_poster, column_poster) as publish_table:
+            for table in details.data_product_detail_sample_data_table:
+                publish_table(table)
+            publish_table.wait()
+
+        if settings.backend_endpoint_url:
+            posts.post_data_product_to_backend(details, settings.backend_endpoint_url, settings.admin_pw)
+        blob_handler.mark_data_product_registered(details.data_product_name)
+        result.tables = len(details.data_product_detail_sample_data_table)
+        result.columns = len(details.data_product_detail_sample_data_column)
+    except Exception as e:
+        logger.exception(f"Registration of {result.data_product_name!r} failed")
+        result.status = "error"
+        result.error = f"{type(e).__name__}: {e}"
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+def run(
+    entries: list[dict],
+    blob_handler: bs.BlobStorage,
+    settings: RegistrationSettings,
+    workers: int = 4,
+    out: TextIO = sys.stdout,
+) -> list[ProductResult]:
+    """Registers the products on 'workers' threads, prints every result as soon as it is known
+    and returns the results in manifest order"""
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(register_entry, entry, blob_handler, settings) for entry in entries]
+        for future in as_completed(futures):
+            print(future.result(), file=out, flush=True)
+    return [future.result() for future in futures]
+
+
+def print_summary(results: list[ProductResult], seconds: float, out: TextIO = sys.stdout) -> None:
+    failed = [result for result in results if result.status != "ok"]
+    total_bytes = sum(result.bytes for result in results)
+    print(
+        f"{len(results) - len(failed)} of {len(results)} data products registered in {seconds:.2f}s "
+        f"({total_bytes / 1_000_000 / seconds if seconds else 0:.1f} MB/s), {len(failed)} failed",
+        file=out,
+    )
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("manifest", type=Path, help="JSON manifest of the data products")
+    parser.add_argument("--workers", type=int, default=4, help="data products registered at the same time")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=os.environ.get("LOG_LEVEL", "WARNING"))
+
+    # only for local development
+    load_dotenv()
+    settings = RegistrationSettings.from_env()
+    blob_handler = bs.BlobStorage(os.environ["AZURE_ACCOUNT_URL"], os.environ["DATA_PRODUCTS_CONTAINER_NAME"])
+
+    start = time.perf_counter()
+    results = run(load_manifest(args.manifest), blob_handler, settings, args.workers)
+    print_summary(results, time.perf_counter() - start)
+    return 0 if all(result.status == "ok" for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
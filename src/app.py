@@ -6,17 +6,18 @@ can be imported into other modules.
 import os
 import streamlit as st
 import src.modules.ui_components.dp_form as dp_form
-import src.modules.logic.blob_storage as bs
-from src.modules.logic.posts import (
-    post_data_product_data_column_details,
-    post_data_product_data_table_details,
-    post_data_product_details,
-)
+from src.modules.logic.lazy_import import lazy_import
 from dotenv import load_dotenv
-import requests
 import json
 import logging
 
+# storage and http modules are loaded on first use, the first page renders without them
+bs = lazy_import("src.modules.logic.blob_storage")
+posts = lazy_import("src.modules.logic.posts")
+resources = lazy_import("src.modules.logic.resources")
+upload_cache = lazy_import("src.modules.logic.upload_cache")
+tm = lazy_import("src.modules.logic.telemetry")
+
 
 # only needed for local testing
 from dotenv import load_dotenv
@@ -38,54 +39,118 @@ def create_app():
     # only for local development
     load_dotenv()
 
+    # with METRICS_PORT set, the stage and call latencies of all registrations are served for scraping under /metrics
+    if os.environ.get("METRICS_PORT"):
+        tm.start_metrics_server(int(os.environ["METRICS_PORT"]))
+
     azure_account_url = os.environ["AZURE_ACCOUNT_URL"]
     azure_container_name = os.environ["DATA_PRODUCTS_CONTAINER_NAME"]
     blob_handler = bs.BlobStorage(azure_account_url, azure_container_name)
 
+    # with STAGING_CONTAINER_NAME set, data products can also be registered from a folder of that container,
+    # their items are copied server-side instead of being uploaded through the browser
+    staging = (
+        bs.BlobStorage(azure_account_url, os.environ["STAGING_CONTAINER_NAME"])
+        if os.environ.get("STAGING_CONTAINER_NAME")
+        else None
+    )
+
     # get all the information of the data product
     dp_details = dp_form.data_product_form(blob_handler)
-    file = dp_form.upload_data_product()
+    file = dp_form.select_data_product(staging)
 
     # read the content of the data product and create details
     # afterwards push the data product to azure
-
-    filled_dp_details = dp_form.register_product(file, dp_details, blob_handler)
-
-    # push the data products, data product table and data product column details to the front-end database
+    # parsing and uploading run as a pipeline, the front-end database is only posted to once all items are uploaded,
+    # so a failed upload leaves no catalog entries behind (its blobs are deleted again), a failed catalog
+    # or back-end post however leaves the uploaded blobs and the entries posted until then behind
 
     data_product_endpoint_url = os.environ["DATA_PRODUCT_DETAIL_ENDPOINT"]
     data_product_table_endpoint_url = os.environ["DATA_PRODUCT_TABLE_DETAIL_ENDPOINT"]
     data_product_column_endpoint_url = os.environ["DATA_PRODUCT_COLUMN_DETAIL_ENDPOINT"]
 
-    logger.info("Data Processed")
-    logger.info("Start with Posting")
-
-    post_data_product_details(filled_dp_details, data_product_endpoint_url)
-    post_data_product_data_table_details(
-        filled_dp_details, data_product_table_endpoint_url
+    # items are uploaded concurrently, the worker count and the connections per blob are configurable
+    upload_workers = int(os.environ.get("UPLOAD_WORKERS", 4))
+    upload_max_concurrency = int(os.environ.get("UPLOAD_MAX_CONCURRENCY", 2))
+    # with PARSE_WORKERS > 0 the items are parsed in a pool of worker processes instead of the script thread
+    parse_workers = int(os.environ.get("PARSE_WORKERS", 0))
+    # the schema of excel sheets is inferred from the first EXCEL_SCHEMA_ROWS rows,
+    # CSV_ENGINE "arrow" sniffs the csv dialect and parses multithreaded, "pandas" expects comma separated utf-8
+    # every table gets SAMPLE_ROWS sample rows, the samples of a data product are capped at SAMPLE_BUDGET_KB
+    # with PROFILE_COLUMNS=true every column is profiled, chunked csv schemas are sampled and profiled in the same pass,
+    # excel sheets and csv files without a chunked schema in an extra pass
+    # with CSV_CHUNKED_SCHEMA=true csv schemas are inferred chunk by chunk, CSV_SCHEMA_STABLE_CHUNKS stops that early
+    # once the dtypes did not change for that many chunks (the row count is then unknown)
+    reader_options = {
+        "max_rows": int(os.environ.get("EXCEL_SCHEMA_ROWS", 10_000)),
+        "csv_engine": os.environ.get("CSV_ENGINE", "arrow"),
+        "sample_rows": int(os.environ.get("SAMPLE_ROWS", 10)),
+        "profile": os.environ.get("PROFILE_COLUMNS", "false").lower() == "true",
+        "chunked_schema": os.environ.get("CSV_CHUNKED_SCHEMA", "true").lower() == "true",
+        "stable_chunks": int(os.environ["CSV_SCHEMA_STABLE_CHUNKS"]) if os.environ.get("CSV_SCHEMA_STABLE_CHUNKS") else None,
+    }
+    sample_budget = int(os.environ.get("SAMPLE_BUDGET_KB", 256)) * 1024
+    # with TRANSCODE_TO_PARQUET=true csv files and excel sheets are also stored as parquet,
+    # KEEP_ORIGINAL_FILES=false then stores only the parquet files
+    to_parquet = os.environ.get("TRANSCODE_TO_PARQUET", "false").lower() == "true"
+    keep_original = os.environ.get("KEEP_ORIGINAL_FILES", "true").lower() == "true"
+
+    # tables and columns are batched if CATALOG_BATCH_SIZE > 1 and the endpoints accept lists,
+    # otherwise they are posted one by one with CATALOG_MAX_CONCURRENCY requests in flight
+    catalog_batch_size = int(os.environ.get("CATALOG_BATCH_SIZE", 1))
+    catalog_max_concurrency = int(os.environ.get("CATALOG_MAX_CONCURRENCY", 8))
+    table_poster = posts.CatalogPoster(
+        data_product_table_endpoint_url,
+        batch_size=catalog_batch_size,
+        max_concurrency=catalog_max_concurrency,
+    )
+    column_poster = posts.CatalogPoster(
+        data_product_column_endpoint_url,
+        batch_size=catalog_batch_size,
+        max_concurrency=catalog_max_concurrency,
     )
-    post_data_product_data_column_details(
-        filled_dp_details, data_product_column_endpoint_url
+
+    # parsed tables survive streamlit reruns (e.g. a retry after a failed registration),
+    # keyed by the upload's content and the data product name
+    registration_cache = upload_cache.UploadCache(
+        st.session_state,
+        max_bytes=int(os.environ.get("UPLOAD_CACHE_MB", 64)) * 1024 * 1024,
     )
 
+    with tm.telemetry.span("register_product", dp_details.data_product_name, bytes=file.size) as span:
+        dp_form.register_product(
+            file,
+            dp_details,
+            blob_handler,
+            stream_upload=True,
+            max_workers=upload_workers,
+            max_concurrency=upload_max_concurrency,
+            parse_workers=parse_workers,
+            reader_options=reader_options,
+            cache=registration_cache,
+            sample_budget=sample_budget,
+            to_parquet=to_parquet,
+            keep_original=keep_original,
+        )
+
+        # the data product itself is posted first, so the tables can reference it, the tables and columns follow concurrently
+        logger.info("Start with Posting")
+        posts.post_data_product_details(dp_details, data_product_endpoint_url)
+        with posts.TablePublisher(table_poster, column_poster) as publish_table:
+            for table in dp_details.data_product_detail_sample_data_table:
+                publish_table(table)
+            publish_table.wait()
+        span.set(columns=len(dp_details.data_product_detail_sample_data_column))
+
+    logger.info("Data Processed")
+
     # push minimal data_product inforamtion to api back-end
     admin_pw = os.environ["ADMIN_PW"]
     backend_endpoint = os.environ["CREATE_ENDPOINT_BACKEND"]
-    dp_dict = dp_details.to_dict()
-
-    data_body = {
-        "name": dp_dict["name"],
-        "data_owner": dp_dict["information"]["data_owner"],
-        "schema_version": dp_dict["schema_version"],
-        "restriction_type": dp_dict["access_details"]["restriction_type"],
-        "data_product_id": dp_dict["id"],
-        "password": admin_pw,
-    }
-
-    logger.info("Start Posting to Backend API")
-    r = requests.post(backend_endpoint, data=data_body)
-    r.raise_for_status()
+    posts.post_data_product_to_backend(dp_details, backend_endpoint, admin_pw)
+    logger.info(f"Shared network resources: {resources.registry.metrics()}")
 
+    blob_handler.mark_data_product_registered(dp_details.data_product_name)
     st.balloons()
     st.success("Successfully uploaded the Data Product")
 
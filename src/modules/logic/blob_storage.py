@@ -1,7 +1,113 @@
-from azure.storage.blob import BlobServiceClient
 from dataclasses import dataclass,field
+from functools import cached_property
+from typing import IO, Optional
+from urllib.parse import urlsplit
+from src.modules.logic.worker_pool import BoundedWorkerPool
+from src.modules.logic.resources import registry
+from src.modules.logic.telemetry import telemetry
+from src.modules.logic.concurrency import AdaptiveLimiter, controller
+from src.modules.logic.lazy_import import lazy_import
+import base64
+import io
+import threading
+import time
 
+# the azure sdk is only imported when the first blob operation runs
+azure_core = lazy_import("azure.core")
+azure_blob = lazy_import("azure.storage.blob")
 
+# Azure accepts up to 4000 MiB per block, 4 MiB keeps the memory per upload small while staying efficient
+DEFAULT_BLOCK_SIZE = 4 * 1024 * 1024
+# reads of a BlobRangeReader are buffered to at least this many bytes, so small reads do not become requests each
+RANGE_READ_SIZE = 1024 * 1024
+COPY_POLL_INTERVAL = 1.0
+
+
+class BlobRangeReader(io.RawIOBase):
+    """Read-only, seekable file object over a blob, every read downloads only the requested range of the blob.
+    Readers (e.g. of parquet footers) thus only transfer the bytes they actually read, 'bytes_read' counts them.
+    With a limiter, the downloads run within its limit and are retried if the storage account throttles them.
+    Use BlobStorage.open_blob, which buffers the reads.
+    """
+
+    def __init__(self,blob_client,size:Optional[int]=None,limiter:Optional[AdaptiveLimiter]=None):
+        self.blob_client = blob_client
+        self.limiter = limiter
+        self.size = size if size is not None else self._call(blob_client.get_blob_properties).size
+        self.position = 0
+        self.bytes_read = 0
+
+    def readable(self)->bool:
+        return True
+
+    def seekable(self)->bool:
+        return True
+
+    def tell(self)->int:
+        return self.position
+
+    def seek(self,offset:int,whence:int=io.SEEK_SET)->int:
+        base = {io.SEEK_SET:0,io.SEEK_CUR:self.position,io.SEEK_END:self.size}[whence]
+        self.position = max(base + offset,0)
+        return self.position
+
+    def _download(self,length:int)->bytes:
+        length = min(length,self.size - self.position)
+        if length <= 0:
+            return b""
+        data = self._call(self._download_range,self.blob_client,self.position,length)
+        self.position += len(data)
+        self.bytes_read += len(data)
+        return data
+
+    def _call(self,fn,*args):
+        return fn(*args) if self.limiter is None else self.limiter.call(fn,*args)
+
+    @staticmethod
+    def _download_range(blob_client,offset:int,length:int)->bytes:
+        with telemetry.timed_call("blob.download_range"):
+            return blob_client.download_blob(offset=offset,length=length).readall()
+
+    def readinto(self,buffer)->int:
+        data = self._download(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def readall(self)->bytes:
+        """Reads the rest of the blob in one request"""
+        return self._download(self.size - self.position)
+
+
+@dataclass
+class ProductNameCache:
+    """Thread-safe cache that remembers for 'ttl' seconds the data product names that are known to exist.
+    Only existing names are cached, a free name is looked up again on every check.
+    Names are stored in lower case because data product names are compared case insensitive"""
+
+    ttl: float = 300.0
+
+    def __post_init__(self):
+        self._registered: dict[str,float] = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self,dp_name:str)->bool:
+        with self._lock:
+            stored_at = self._registered.get(dp_name.lower())
+            if stored_at is None:
+                return False
+            if time.monotonic() - stored_at > self.ttl:
+                del self._registered[dp_name.lower()]
+                return False
+            return True
+
+    def add(self,dp_name:str)->None:
+        with self._lock:
+            self._registered[dp_name.lower()] = time.monotonic()
+
+
+# the BlobStorage is created on every streamlit rerun, the caches are therefore kept per container for the whole process
+_product_name_caches: dict[str,ProductNameCache] = {}
+_product_name_caches_lock = threading.Lock()
 
 
 @dataclass
@@ -10,38 +116,179 @@ class BlobStorage:
 
     account_url:str = field(repr=False)
     container_name:str 
+    product_cache_ttl:float = field(default=300.0,repr=False)
 
 
     def __post_init__(
         self
     ):
-        self.blob_service_client = BlobServiceClient.from_connection_string(self.account_url)
-    
+        with _product_name_caches_lock:
+            self.product_cache = _product_name_caches.setdefault(
+                self.container_name,ProductNameCache(self.product_cache_ttl)
+            )
+
+    @cached_property
+    def blob_service_client(self):
+        """The client is created on first use and shared by all BlobStorage objects of the process (with its connection pool)"""
+        return registry.blob_service_client(self.account_url)
+
+    @cached_property
+    def limiter(self)->AdaptiveLimiter:
+        """The adaptive limiter of the storage account, shared by all requests to it in the process.
+        The shared blob service client only retries connection, timeout and server errors (see resources.blob_retry_policy),
+        throttled requests are retried by the limiter"""
+        settings = dict(part.split("=",1) for part in self.account_url.split(";") if "=" in part)
+        account = settings.get("AccountName") or urlsplit(self.account_url).netloc or self.account_url
+        return controller.limiter(f"blob {account}")
+
+
+    def upload_a_file(self,bytes_data:bytes,file_name:str,max_concurrency:int=1)->None:
+        """Uploads a file to a blob container, large files are split into blocks
+        of which 'max_concurrency' are uploaded in parallel.
+        Like all requests to the storage account, the upload is retried if the account throttles it"""
 
+        blob_client = self.blob_service_client.get_blob_client(
+            self.container_name,
+            file_name
+        )
+        self.limiter.call(self._upload_blob,blob_client,bytes_data,max_concurrency)
+
+    def open_blob(self,file_name:str,size:Optional[int]=None,buffer_size:int=RANGE_READ_SIZE)->io.BufferedReader:
+        """Opens a blob of the container as a seekable file object that downloads only the ranges that are read"""
+        blob_client = self.blob_service_client.get_blob_client(self.container_name,file_name)
+        return io.BufferedReader(BlobRangeReader(blob_client,size,self.limiter),buffer_size)
+
+    def blob_url(self,file_name:str)->str:
+        return self.blob_service_client.get_blob_client(self.container_name,file_name).url
+
+    def list_blobs(self,prefix:str)->dict[str,int]:
+        """Returns the name and the size of every blob whose name starts with the prefix"""
+        container_client = self.blob_service_client.get_container_client(self.container_name)
+        return self.limiter.call(self._list_blobs,container_client,prefix)
 
-    def upload_a_file(self,bytes_data:bytes,file_name:str)->None:
-        """Uploads a file to a blob container"""
+    @staticmethod
+    def _list_blobs(container_client,prefix:str)->dict[str,int]:
+        with telemetry.timed_call("blob.list_blobs"):
+            return {blob.name:blob.size for blob in container_client.list_blobs(name_starts_with=prefix)}
 
+    def copy_from_url(self,source_url:str,file_name:str,poll_interval:float=COPY_POLL_INTERVAL)->None:
+        """Copies a blob (e.g. of a staging container) server-side into this container, no data passes through the app.
+        The source must be readable by the storage account, i.e. in the same account or with a SAS token in its url.
+        Waits until the copy is finished, like the uploads an already existing blob is not overwritten.
+        """
+        blob_client = self.blob_service_client.get_blob_client(self.container_name,file_name)
+        copy = self.limiter.call(self._start_copy,blob_client,source_url)
+        status = copy["copy_status"]
+        while status == "pending":
+            time.sleep(poll_interval)
+            status = self.limiter.call(blob_client.get_blob_properties).copy.status
+        if status != "success":
+            # the query string may hold a SAS token
+            raise RuntimeError(f"The copy of {source_url.split('?')[0]!r} to {file_name!r} ended with the status {status!r}")
+
+    @staticmethod
+    def _start_copy(blob_client,source_url:str)->dict:
+        with telemetry.timed_call("blob.start_copy_from_url"):
+            return blob_client.start_copy_from_url(
+                source_url,etag="*",match_condition=azure_core.MatchConditions.IfMissing
+            )
+
+    def delete_blobs(self,file_names:list[str])->None:
+        """Deletes blobs of the container, e.g. the items of a registration that failed, missing blobs are skipped"""
+        for file_name in file_names:
+            blob_client = self.blob_service_client.get_blob_client(self.container_name,file_name)
+            try:
+                self.limiter.call(self._delete_blob,blob_client)
+            except azure_core.exceptions.ResourceNotFoundError:
+                pass
+
+    @staticmethod
+    def _delete_blob(blob_client)->None:
+        with telemetry.timed_call("blob.delete_blob"):
+            blob_client.delete_blob()
+
+    def upload_a_stream(self,stream:IO[bytes],file_name:str,block_size:int=DEFAULT_BLOCK_SIZE,max_concurrency:int=1)->None:
+        """Uploads a file-like object to a blob container in fixed-size blocks.
+        Each block is staged as soon as it is read and the block list is committed at the end,
+        so only 'max_concurrency' blocks are held in memory at a time.
+        Like upload_a_file, an already existing blob is not overwritten.
+        """
         blob_client = self.blob_service_client.get_blob_client(
             self.container_name,
             file_name
         )
-        try:
-            blob_client.upload_blob(bytes_data)
-        except Exception as e:
-            raise e
+        block_list: list[azure_blob.BlobBlock] = []
+        with BoundedWorkerPool(max_concurrency,max_pending=max_concurrency) as pool:
+            while True:
+                chunk = stream.read(block_size)
+                if not chunk:
+                    break
+                block_id = self._block_id(len(block_list))
+                pool.submit(self.limiter.call,self._stage_block,blob_client,block_id,chunk)
+                block_list.append(azure_blob.BlobBlock(block_id=block_id))
+            pool.wait()
+
+        self.limiter.call(self._commit_block_list,blob_client,block_list)
+
+    @staticmethod
+    def _upload_blob(blob_client,bytes_data:bytes,max_concurrency:int)->None:
+        with telemetry.timed_call("blob.upload_blob"):
+            blob_client.upload_blob(bytes_data,max_concurrency=max_concurrency)
+
+    @staticmethod
+    def _commit_block_list(blob_client,block_list:list)->None:
+        with telemetry.timed_call("blob.commit_block_list"):
+            blob_client.commit_block_list(block_list,etag="*",match_condition=azure_core.MatchConditions.IfMissing)
+
+    @staticmethod
+    def _stage_block(blob_client,block_id:str,chunk:bytes)->None:
+        """Helper Function that stages one block and records the latency of the call"""
+        with telemetry.timed_call("blob.stage_block"):
+            blob_client.stage_block(block_id,chunk)
+
+    @staticmethod
+    def _block_id(index:int)->str:
+        """Returns the base64 encoded block id of a block, all ids of a blob must have the same length"""
+        return base64.b64encode(f"{index:08d}".encode()).decode()
 
 
 
     def data_product_exists(self,dp_name:str)->bool:
-        """Checks the blob storage if a given data product already exists
+        """Checks the blob storage if a given data product already exists, the names are compared case insensitive.
+        The folder of the name itself is looked up first, only if it is missing the top-level folders are compared
+        in lower case (e.g. 'Sales' for 'sales'). Existing names are cached for 'product_cache_ttl' seconds.
         Returns:
             True: it exists 
             False: does not exists
         """
-        # get all data products 
-        existing_data_products = self.data_products
-        return dp_name.lower() in existing_data_products
+        if dp_name in self.product_cache:
+            return True
+        exists = self._lookup_data_product(dp_name)
+        if exists:
+            self.product_cache.add(dp_name)
+        return exists
+
+    def mark_data_product_registered(self,dp_name:str)->None:
+        """Records a successful registration, so the next existence check does not need to ask the blob storage"""
+        self.product_cache.add(dp_name)
+
+    def _lookup_data_product(self,dp_name:str)->bool:
+        """Helper Function that looks up the folder of the data product name, the delimiter makes the blob storage
+        collapse every folder into a single entry instead of returning all of its blobs.
+        The folder names are case sensitive, a miss falls back to comparing all top-level folders in lower case
+        """
+        if not dp_name:
+            return False
+        container_client = self.blob_service_client.get_container_client(self.container_name)
+        if self.limiter.call(self._has_folder,container_client,dp_name):
+            return True
+        return dp_name.lower() in self.data_products
+
+    @staticmethod
+    def _has_folder(container_client,dp_name:str)->bool:
+        with telemetry.timed_call("blob.walk_blobs"):
+            folders = container_client.walk_blobs(name_starts_with=f"{dp_name}/",delimiter="/")
+            return next(iter(folders),None) is not None
 
 
     @property
@@ -49,14 +296,11 @@ class BlobStorage:
         """Returns a list of all data products currently in the blob"""
 
         blob_client = self.blob_service_client.get_container_client(self.container_name)
-        blobs = blob_client.list_blobs()
+        # the delimiter returns every top level folder once, the blobs inside the folders are not listed
+        names = self.limiter.call(lambda: [blob.name for blob in blob_client.walk_blobs(delimiter="/")])
 
         # data products are only the first string before the first "/"
-        data_products = [str(blob.name).split("/")[0].lower() for blob in blobs]
+        data_products = [str(name).split("/")[0].lower() for name in names]
         data_products = set(data_products)
         data_products = list(data_products)
         return data_products
-
-
-
-    
\ No newline at end of file
@@ -0,0 +1,270 @@
+"""This modules profiles the columns of a data product item in a single pass over its chunks.
+Per column it counts the values and nulls, keeps the min and max, estimates the number of distinct values
+with a HyperLogLog sketch and the quantiles of numeric columns from a fixed-size reservoir.
+Parquet files already store null counts, min and max per row group in their footer, those are used instead of scanning.
+"""
+from __future__ import annotations
+import datetime
+import math
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import src.modules.logic.csv_reader as cr
+import src.modules.logic.excel_reader as er
+from dataclasses import dataclass, field
+from typing import IO, Any, Hashable, Iterable, Optional
+
+
+QUANTILES = (0.25, 0.5, 0.75)
+# 2^12 registers give a relative error of about 1.6% for the distinct counts
+HLL_PRECISION = 12
+QUANTILE_SAMPLE_SIZE = 4096
+CHUNK_ROWS = 50_000
+
+
+@dataclass
+class HyperLogLog:
+    """Sketch that estimates the number of distinct values from their 64 bit hashes in 2^precision bytes"""
+
+    precision: int = HLL_PRECISION
+
+    def __post_init__(self):
+        self.registers = np.zeros(1 << self.precision, dtype=np.uint8)
+
+    def add_hashes(self, hashes: np.ndarray) -> None:
+        """Adds the uint64 hashes of values, the first 'precision' bits select the register"""
+        if len(hashes) == 0:
+            return
+        hashes = hashes.astype(np.uint64, copy=False)
+        index = (hashes >> np.uint64(64 - self.precision)).astype(np.intp)
+        rest = hashes << np.uint64(self.precision)
+        max_rank = 64 - self.precision + 1
+        # the rank is the position of the first set bit of the remaining bits
+        with np.errstate(divide="ignore"):
+            leading_zeros = 63 - np.floor(np.log2(rest.astype(np.float64)))
+        rank = np.where(rest == 0, max_rank, np.minimum(leading_zeros + 1, max_rank)).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def estimate(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.power(2.0, -self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        # small cardinalities are counted more exactly from the empty registers (linear counting)
+        if raw <= 2.5 * m and zeros:
+            return round(m * math.log(m / zeros))
+        return round(raw)
+
+
+@dataclass
+class QuantileSketch:
+    """Uniform reservoir of at most 'size' numeric values, the quantiles of the reservoir approximate the column's"""
+
+    size: int = QUANTILE_SAMPLE_SIZE
+    rng: np.random.Generator = field(default_factory=np.random.default_rng, repr=False)
+
+    def __post_init__(self):
+        self.reservoir = np.empty(0, dtype=np.float64)
+        self.seen = 0
+
+    def add(self, values: np.ndarray) -> None:
+        values = values.astype(np.float64, copy=False)
+        free = self.size - len(self.reservoir)
+        if free > 0:
+            self.reservoir = np.concatenate([self.reservoir, values[:free]])
+            self.seen += min(free, len(values))
+            values = values[free:]
+        if len(values) == 0:
+            return
+        # every later value j replaces a random slot with probability size / (j + 1)
+        positions = np.arange(self.seen, self.seen + len(values))
+        slots = self.rng.integers(0, positions + 1)
+        keep = slots < self.size
+        self.reservoir[slots[keep]] = values[keep]
+        self.seen += len(values)
+
+    def quantiles(self, qs: Iterable[float] = QUANTILES) -> Optional[dict[str, float]]:
+        if len(self.reservoir) == 0:
+            return None
+        values = np.quantile(self.reservoir, list(qs))
+        return {f"p{round(q * 100)}": float(value) for q, value in zip(qs, values)}
+
+
+def _json_value(value: Any) -> Any:
+    """Helper Function that turns numpy, pandas and datetime values into json compatible values"""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    if isinstance(value, (pd.Timestamp, datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return _json_value(value.item())
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="replace")
+    return value
+
+
+@dataclass
+class ColumnProfile:
+    """Data Class that holds the statistics of one column, distinct_count and quantiles are approximations.
+    Every profile has the same keys whatever file type it comes from, statistics that are not known are None:
+    min and max of columns without an order, quantiles of non numeric columns and the distinct count and quantiles
+    of parquet columns whose footer statistics are used (unless profile_parquet computes the sketches as well)
+    """
+
+    count: int = 0
+    null_count: int = 0
+    min: Any = None
+    max: Any = None
+    distinct_count: Optional[int] = None
+    quantiles: Optional[dict[str, float]] = None
+    source: str = "scan"
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "count": self.count,
+            "null_count": self.null_count,
+            "min": _json_value(self.min),
+            "max": _json_value(self.max),
+            "distinct_count": self.distinct_count,
+            "quantiles": self.quantiles,
+            "source": self.source,
+        }
+
+
+@dataclass
+class _ColumnState:
+    sketch: HyperLogLog = field(default_factory=HyperLogLog)
+    quantiles: Optional[QuantileSketch] = None
+    profile: ColumnProfile = field(default_factory=ColumnProfile)
+    ordered: bool = True
+
+    def update(self, series: pd.Series) -> None:
+        profile = self.profile
+        values = series.dropna()
+        profile.count += len(series)
+        profile.null_count += len(series) - len(values)
+        if len(values) == 0:
+            return
+        self.sketch.add_hashes(pd.util.hash_pandas_object(values, index=False).to_numpy())
+        if self.ordered:
+            try:
+                low, high = values.min(), values.max()
+                profile.min = low if profile.min is None or low < profile.min else profile.min
+                profile.max = high if profile.max is None or high > profile.max else profile.max
+            except TypeError:
+                # mixed types (e.g. numbers and strings in one object column or in different chunks) have no order
+                profile.min = profile.max = None
+                self.ordered = False
+        if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            if self.quantiles is None:
+                self.quantiles = QuantileSketch()
+            self.quantiles.add(values.to_numpy())
+
+    def finish(self) -> ColumnProfile:
+        self.profile.distinct_count = self.sketch.estimate() if self.profile.count > self.profile.null_count else 0
+        if self.quantiles is not None:
+            self.profile.quantiles = self.quantiles.quantiles()
+        return self.profile
+
+
+class ChunkProfiler:
+    """Profiles all columns of dataframe chunks that are fed one by one, only the sketches are held in memory"""
+
+    def __init__(self):
+        self.states: dict[Hashable, _ColumnState] = {}
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        for column in chunk.columns:
+            self.states.setdefault(column, _ColumnState()).update(chunk[column])
+
+    def finish(self) -> dict[Hashable, ColumnProfile]:
+        return {column: state.finish() for column, state in self.states.items()}
+
+
+def profile_chunks(chunks: Iterable[pd.DataFrame]) -> dict[Hashable, ColumnProfile]:
+    """Profiles all columns of a stream of dataframe chunks, only one chunk is held in memory at a time"""
+    profiler = ChunkProfiler()
+    for chunk in chunks:
+        profiler.update(chunk)
+    return profiler.finish()
+
+
+def _frame_chunks(df: pd.DataFrame, chunk_rows: int = CHUNK_ROWS) -> Iterable[pd.DataFrame]:
+    for start in range(0, max(len(df), 1), chunk_rows):
+        yield df.iloc[start : start + chunk_rows]
+
+
+def profile_dataframe(df: pd.DataFrame) -> dict[Hashable, ColumnProfile]:
+    """Profiles an already loaded dataframe chunk by chunk"""
+    return profile_chunks(_frame_chunks(df))
+
+
+def profile_csv(data_io: IO[bytes], csv_engine: str = "pandas") -> dict[Hashable, ColumnProfile]:
+    """Profiles a csv file while it is streamed in chunks"""
+    return cr.consume_csv_chunks(data_io, profile_chunks, csv_engine, CHUNK_ROWS)
+
+
+def profile_excel(data_io: IO[bytes], file_type: str, sheet_name: Optional[str] = None) -> dict[Hashable, ColumnProfile]:
+    """Profiles a single excel sheet, the sheet is read as a whole (streamed row by row with openpyxl)"""
+    df, _ = er.read_sheet(data_io, file_type, sheet_name)
+    return profile_dataframe(df)
+
+
+def _footer_statistics(metadata, column_index: int) -> Optional[ColumnProfile]:
+    """Helper Function that combines the statistics of a column over all row groups of a parquet footer,
+    None if a row group misses them"""
+    profile = ColumnProfile(count=metadata.num_rows, source="parquet_footer")
+    distinct_counts = []
+    for i in range(metadata.num_row_groups):
+        statistics = metadata.row_group(i).column(column_index).statistics
+        if statistics is None or not statistics.has_null_count:
+            return None
+        profile.null_count += statistics.null_count
+        if statistics.has_min_max:
+            profile.min = statistics.min if profile.min is None else min(profile.min, statistics.min)
+            profile.max = statistics.max if profile.max is None else max(profile.max, statistics.max)
+        elif statistics.num_values > 0:
+            return None
+        if statistics.has_distinct_count:
+            distinct_counts.append(statistics.distinct_count)
+    # distinct counts of several row groups cannot be combined
+    if metadata.num_row_groups == 1 and distinct_counts:
+        profile.distinct_count = distinct_counts[0]
+    return profile
+
+
+def profile_parquet(data_io: IO[bytes], sketches: bool = False) -> dict[Hashable, ColumnProfile]:
+    """Profiles a parquet file, null counts, min and max come from the footer wherever all row groups store them,
+    only the remaining columns are scanned, one row group batch at a time.
+    Distinct counts and quantiles of the columns covered by the footer are only computed with 'sketches',
+    which scans all columns but keeps the exact footer values.
+    """
+    parquet_file = pq.ParquetFile(data_io)
+    metadata = parquet_file.metadata
+    names = parquet_file.schema_arrow.names
+    # footer statistics are stored per leaf column, only flat columns map onto exactly one leaf
+    leaves = parquet_file.schema.names
+    footer: dict[Hashable, ColumnProfile] = {}
+    for name in names:
+        if leaves.count(name) == 1:
+            statistics = _footer_statistics(metadata, leaves.index(name))
+            if statistics is not None:
+                footer[name] = statistics
+
+    scan_columns = [name for name in names if sketches or name not in footer]
+    scanned: dict[Hashable, ColumnProfile] = {}
+    if scan_columns:
+        scanned = profile_chunks(
+            batch.to_pandas()
+            for batch in parquet_file.iter_batches(batch_size=CHUNK_ROWS, columns=scan_columns)
+        )
+
+    profiles = {}
+    for name in names:
+        profile = footer.get(name) or scanned.get(name) or ColumnProfile(count=metadata.num_rows)
+        if name in footer and name in scanned:
+            # the footer values are exact, the sketches come from the scan
+            profile.distinct_count = scanned[name].distinct_count
+            profile.quantiles = scanned[name].quantiles
+        profiles[name] = profile
+    return profiles
@@ -0,0 +1,181 @@
+"""This modules adapts the number of concurrent requests per endpoint (a catalog endpoint, a storage account)
+to what the endpoint can take. The limit grows by one request per round of successful requests and is halved
+when the endpoint throttles, like the AIMD congestion control of TCP.
+Throttled requests (429, 503) are retried after the endpoint's Retry-After or after a jittered exponential backoff,
+other errors are not retried, the posts to the catalog are not idempotent.
+The limits, requests in flight and retry counts of all endpoints are exported as metrics.
+"""
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Optional
+from src.modules.logic.telemetry import telemetry
+import datetime
+import logging
+import os
+import random
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+# status codes with which an endpoint tells us to slow down or that it is temporarily overloaded
+THROTTLE_STATUS_CODES = {429, 503}
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Returns the seconds to wait from a Retry-After header, which holds either seconds or an http date"""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max((retry_at - datetime.datetime.now(datetime.timezone.utc)).total_seconds(), 0.0)
+
+
+def throttling(outcome: Any) -> tuple[bool, Optional[float]]:
+    """Returns whether a response or an exception (of requests or the azure sdk) signals throttling,
+    together with the seconds of its Retry-After header if it has one"""
+    response = getattr(outcome, "response", None) if isinstance(outcome, BaseException) else outcome
+    status = getattr(outcome, "status_code", None) or getattr(response, "status_code", None)
+    if status not in THROTTLE_STATUS_CODES:
+        return False, None
+    headers = getattr(response, "headers", None) or {}
+    return True, parse_retry_after(headers.get("Retry-After"))
+
+
+@dataclass
+class AdaptiveLimiter:
+    """Data Class that limits the requests in flight to one endpoint and adapts the limit (AIMD):
+    every successful request raises the limit by 1/limit (one request per round), a throttled request halves it.
+    Only one decrease happens per round, requests that were started before the last decrease do not decrease it again.
+
+    'call' runs a request within the limit and retries it up to max_retries times while it is throttled,
+    waiting for the Retry-After of the endpoint or a random time of up to base_delay * 2^attempt (capped at max_delay).
+    A response that is still throttled after the last retry is returned, an exception is raised.
+    """
+
+    name: str
+    initial_limit: float = 8
+    min_limit: float = 1
+    max_limit: float = 64
+    decrease_factor: float = 0.5
+    max_retries: int = 5
+    base_delay: float = 0.5
+    max_delay: float = 30.0
+    sleep: Callable[[float], None] = field(default=time.sleep, repr=False)
+
+    def __post_init__(self):
+        self.limit = float(self.initial_limit)
+        self.in_flight = 0
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+        self._round = 0
+        self._condition = threading.Condition()
+
+    def acquire(self) -> int:
+        """Waits for a free slot and returns the round in which the request started"""
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+            self.requests += 1
+            return self._round
+
+    def release(self, started_round: int, throttled: bool = False) -> None:
+        with self._condition:
+            self.in_flight -= 1
+            if throttled:
+                self.throttled += 1
+                if started_round == self._round:
+                    self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+                    self._round += 1
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Returns the seconds to wait before a retry, the endpoint's Retry-After takes precedence"""
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+    def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Runs fn within the limit of the endpoint and retries it while it is throttled"""
+        for attempt in range(self.max_retries + 1):
+            started_round = self.acquire()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                throttled, retry_after = throttling(e)
+                self.release(started_round, throttled)
+                if not throttled or attempt == self.max_retries:
+                    raise
+            else:
+                throttled, retry_after = throttling(result)
+                self.release(started_round, throttled)
+                if not throttled or attempt == self.max_retries:
+                    return result
+            delay = self.backoff(attempt, retry_after)
+            with self._condition:
+                self.retries += 1
+            logger.warning(f"{self.name} is throttled, retry {attempt + 1} of {self.max_retries} in {delay:.2f}s")
+            self.sleep(delay)
+
+    def metrics(self) -> dict[str, float]:
+        with self._condition:
+            return {
+                "limit": round(self.limit, 3),
+                "in_flight": self.in_flight,
+                "requests": self.requests,
+                "retries": self.retries,
+                "throttled": self.throttled,
+            }
+
+
+@dataclass
+class ConcurrencyController:
+    """Data Class that hands out one AdaptiveLimiter per endpoint, shared by all threads and sessions of the process,
+    so all requests to an endpoint count against the same limit. The options apply to every new limiter.
+    """
+
+    options: dict = field(default_factory=dict)
+
+    def __post_init__(self):
+        self._lock = threading.Lock()
+        self._limiters: dict[str, AdaptiveLimiter] = {}
+
+    def limiter(self, endpoint: str) -> AdaptiveLimiter:
+        """Returns the limiter of an endpoint, e.g. "POST host/path" of a catalog endpoint or "blob <account name>" """
+        with self._lock:
+            limiter = self._limiters.get(endpoint)
+            if limiter is None:
+                limiter = self._limiters[endpoint] = AdaptiveLimiter(endpoint, **self.options)
+            return limiter
+
+    def metrics(self) -> dict[tuple[str, tuple], float]:
+        """Returns the metrics of every limiter, labelled with its endpoint"""
+        with self._lock:
+            limiters = list(self._limiters.values())
+        return {
+            (key, (("endpoint", limiter.name),)): value
+            for limiter in limiters
+            for key, value in limiter.metrics().items()
+        }
+
+
+# the process wide controller, shared by the catalog posts and the blob uploads of all streamlit sessions
+controller = ConcurrencyController(
+    {
+        "initial_limit": float(os.environ.get("ENDPOINT_INITIAL_CONCURRENCY", 8)),
+        "max_limit": float(os.environ.get("ENDPOINT_MAX_CONCURRENCY", 64)),
+        "max_retries": int(os.environ.get("ENDPOINT_MAX_RETRIES", 5)),
+    }
+)
+telemetry.register_gauges("endpoint_concurrency", controller.metrics)
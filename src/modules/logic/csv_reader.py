@@ -0,0 +1,303 @@
+"""This modules handles the reading of csv files of unknown dialect.
+The delimiter, the quoting and the encoding are sniffed from a small leading sample,
+the file is then parsed with the multithreaded pyarrow csv reader and only handed to pandas if pyarrow rejects it.
+A file whose sample is utf-8 but which holds other bytes further down is read again as latin-1.
+"""
+from __future__ import annotations
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import codecs
+import csv
+import datetime
+import importlib.util
+import logging
+from dataclasses import dataclass, replace
+from typing import IO, Callable, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+# bytes per block of the streaming reader, every block becomes one dataframe chunk
+STREAM_BLOCK_SIZE = 4 * 1024 * 1024
+
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_SIZE = 64 * 1024
+CANDIDATE_DELIMITERS = ",;\t|"
+# the data products come from european source systems, restricting the candidates keeps the detection
+# from guessing asian code pages on short samples
+CANDIDATE_ENCODINGS = ["cp1252", "latin_1", "iso8859_15", "cp1250", "iso8859_2"]
+# the encoding of files that are not utf-8 after all, latin-1 decodes every byte
+FALLBACK_ENCODING = "latin-1"
+
+# iso 8601 dates with an optional time and offset, string columns consisting only of these are date candidates
+ISO_DATE_PATTERN = r"\d{4}-\d{2}-\d{2}(?:[ T]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?)?(?:Z|[+-]\d{2}:?\d{2})?"
+# the name of the dtype pandas gives string columns ('str' with pandas 3, 'object' before)
+STRING_DTYPE = str(pd.Series(["text"]).dtype)
+
+
+@dataclass(frozen=True)
+class CsvDialect:
+    """Data Class that holds the sniffed dialect of a csv file"""
+
+    delimiter: str = ","
+    quotechar: str = '"'
+    encoding: str = "utf-8"
+
+
+def detect_encoding(sample: bytes) -> str:
+    """Detects the encoding of a leading sample of a file.
+    Byte order marks and valid utf-8 are recognised directly, everything else is handed to charset_normalizer
+    (if installed) restricted to the european code pages and falls back to latin-1, which never fails to decode.
+    """
+    if sample.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+    try:
+        # the sample may end in the middle of a multi-byte character, the incremental decoder tolerates that
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+    if importlib.util.find_spec("charset_normalizer") is not None:
+        from charset_normalizer import from_bytes
+
+        match = from_bytes(sample, cp_isolation=CANDIDATE_ENCODINGS).best()
+        if match is not None:
+            return match.encoding
+    return "latin-1"
+
+
+def sniff_dialect(data_io: IO[bytes], sample_size: int = SAMPLE_SIZE) -> CsvDialect:
+    """Sniffs the dialect of a csv file from its first sample_size bytes, the file position is restored afterwards"""
+    position = data_io.tell()
+    sample = data_io.read(sample_size)
+    data_io.seek(position)
+
+    encoding = detect_encoding(sample)
+    text = sample.decode(encoding, errors="ignore")
+    # only complete lines are sniffed, the last line of the sample is probably cut off
+    if len(sample) == sample_size and "\n" in text:
+        text = text[: text.rindex("\n")]
+    try:
+        dialect = csv.Sniffer().sniff(text, delimiters=CANDIDATE_DELIMITERS)
+        return CsvDialect(dialect.delimiter, dialect.quotechar or '"', encoding)
+    except csv.Error:
+        return CsvDialect(encoding=encoding)
+
+
+def _check_utf8(schema: pa.Schema, dialect: CsvDialect) -> None:
+    """Helper Function that raises ArrowInvalid if pyarrow read columns of a utf-8 file as binary,
+    which it does for bytes that are not utf-8 (instead of raising as it does for later blocks)"""
+    binary = [field.name for field in schema if pa.types.is_binary(field.type) or pa.types.is_large_binary(field.type)]
+    if binary and codecs.lookup(dialect.encoding).name == "utf-8":
+        raise pa.ArrowInvalid(f"invalid UTF8 data in the columns {binary}")
+
+
+def _is_invalid_utf8(error: pa.ArrowInvalid, dialect: CsvDialect) -> bool:
+    """Helper Function that tells whether pyarrow rejected a file because it is not utf-8 after its sniffed sample"""
+    return "invalid UTF8" in str(error) and codecs.lookup(dialect.encoding).name == "utf-8"
+
+
+def read_csv(data_io: IO[bytes]) -> pd.DataFrame:
+    """Reads a csv file of unknown dialect with a header in the first row.
+    pyarrow parses the file on multiple threads, pandas is only used if pyarrow rejects the file
+    """
+    dialect = sniff_dialect(data_io)
+    position = data_io.tell()
+    while True:
+        try:
+            table = pa_csv.read_csv(
+                data_io,
+                read_options=pa_csv.ReadOptions(use_threads=True, encoding=dialect.encoding),
+                parse_options=pa_csv.ParseOptions(
+                    delimiter=dialect.delimiter, quote_char=dialect.quotechar
+                ),
+            )
+            _check_utf8(table.schema, dialect)
+            return table.to_pandas()
+        except pa.ArrowInvalid as e:
+            data_io.seek(position)
+            if not _is_invalid_utf8(e, dialect):
+                logger.warning(f"pyarrow rejected the csv file, falling back to pandas: {e}")
+                break
+            logger.warning(f"The csv file is not utf-8 after the sniffed sample, reading it as {FALLBACK_ENCODING}")
+            dialect = replace(dialect, encoding=FALLBACK_ENCODING)
+    return pd.read_csv(
+        data_io,
+        sep=dialect.delimiter,
+        quotechar=dialect.quotechar,
+        encoding=dialect.encoding,
+        header=0,
+    )
+
+
+def iter_csv_chunks(
+    data_io: IO[bytes], block_size: Optional[int] = None, dialect: Optional[CsvDialect] = None
+) -> Iterator[pd.DataFrame]:
+    """Streams a csv file of unknown (or the given) dialect block by block, only one block is held in memory at a time.
+    The column types are inferred from the first block, pyarrow raises ArrowInvalid for later blocks that do not fit them
+    and for bytes that are not utf-8 in a utf-8 file. A file with only a header yields a single empty chunk of its columns.
+    """
+    dialect = dialect or sniff_dialect(data_io)
+    reader = pa_csv.open_csv(
+        data_io,
+        read_options=pa_csv.ReadOptions(block_size=block_size or STREAM_BLOCK_SIZE, encoding=dialect.encoding),
+        parse_options=pa_csv.ParseOptions(delimiter=dialect.delimiter, quote_char=dialect.quotechar),
+    )
+    _check_utf8(reader.schema, dialect)
+    empty = True
+    for batch in reader:
+        empty = False
+        yield batch.to_pandas()
+    if empty:
+        # a file with only a header has no blocks, its columns come from the schema of the reader (as pandas reads them)
+        yield reader.schema.empty_table().to_pandas()
+
+
+def consume_csv_chunks(
+    data_io: IO[bytes], consume: Callable[[Iterator[pd.DataFrame]], T], csv_engine: str = "pandas", chunk_rows: int = 50_000
+) -> T:
+    """Hands the chunks of a csv file to 'consume' and returns its result.
+    csv_engine 'pandas' reads comma separated utf-8 in chunks of chunk_rows rows, 'arrow' streams blocks of a sniffed dialect.
+    If the file is not utf-8 after the sniffed sample, consume is called again with the chunks read as latin-1,
+    if pyarrow rejects a later block, consume is called again with pandas chunks of the sniffed dialect.
+    """
+    if csv_engine == "pandas":
+        return consume(pd.read_csv(data_io, sep=",", encoding="utf-8", header=0, chunksize=chunk_rows))
+    position = data_io.tell()
+    dialect = sniff_dialect(data_io)
+    while True:
+        try:
+            return consume(iter_csv_chunks(data_io, dialect=dialect))
+        except pa.ArrowInvalid as e:
+            data_io.seek(position)
+            if not _is_invalid_utf8(e, dialect):
+                # pyarrow infers the types from the first block and rejects later blocks that do not fit them
+                logger.warning(f"pyarrow rejected a block of the csv file, falling back to pandas: {e}")
+                break
+            logger.warning(f"The csv file is not utf-8 after the sniffed sample, reading it as {FALLBACK_ENCODING}")
+            dialect = replace(dialect, encoding=FALLBACK_ENCODING)
+    return consume(
+        pd.read_csv(
+            data_io,
+            sep=dialect.delimiter,
+            quotechar=dialect.quotechar,
+            encoding=dialect.encoding,
+            header=0,
+            chunksize=chunk_rows,
+        )
+    )
+
+
+def _chunk_kind(series: pd.Series) -> str:
+    """Helper Function that classifies the non-null values of a column chunk as bool, int, float, date or string"""
+    if pd.api.types.is_bool_dtype(series):
+        return "bool"
+    if pd.api.types.is_integer_dtype(series):
+        return "int"
+    if pd.api.types.is_float_dtype(series):
+        return "float"
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return "date"
+    values = series.dropna()
+    first = values.iloc[0]
+    if isinstance(first, bool) and all(isinstance(value, bool) for value in values):
+        return "bool"
+    if isinstance(first, datetime.date) and all(isinstance(value, datetime.date) for value in values):
+        return "date"
+    if isinstance(first, str) and values.astype(str).str.fullmatch(ISO_DATE_PATTERN).all():
+        return "date"
+    return "string"
+
+
+def _promote(kind: str, other: str) -> str:
+    """Helper Function that returns the kind that holds the values of both kinds: int -> float -> string"""
+    if kind == other:
+        return kind
+    if {kind, other} == {"int", "float"}:
+        return "float"
+    return "string"
+
+
+@dataclass
+class CsvSchemaInference:
+    """Data Class that merges the dtypes of csv chunks into the dtypes of the whole file.
+    Chunks with only nulls in a column give no evidence for it, integers become floats once a null or a float is seen
+    (as pandas would read them), differing kinds become strings and columns holding only iso dates become datetime64.
+    With 'stable_chunks' the inference stops early once the dtypes did not change for that many chunks,
+    the row count is then unknown.
+    """
+
+    stable_chunks: Optional[int] = None
+
+    def __post_init__(self):
+        self.kinds: dict = {}
+        self.dtypes: dict = {}
+        self.has_nulls: dict = {}
+        self.num_rows = 0
+        self.complete = True
+        self._unchanged = 0
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        before = self.columns()
+        self.num_rows += len(chunk)
+        for column in chunk.columns:
+            series = chunk[column]
+            nulls = series.isna()
+            self.has_nulls[column] = self.has_nulls.get(column, False) or bool(nulls.any())
+            # the dtype of the first chunk is kept for columns that only ever hold nulls
+            self.dtypes.setdefault(column, str(series.dtype))
+            if nulls.all():
+                self.kinds.setdefault(column, None)
+                continue
+            kind = _chunk_kind(series)
+            if kind == "date" and pd.api.types.is_datetime64_any_dtype(series):
+                self.dtypes[column] = str(series.dtype)
+            previous = self.kinds.get(column)
+            self.kinds[column] = kind if previous is None else _promote(previous, kind)
+        self._unchanged = self._unchanged + 1 if self.columns() == before else 0
+
+    @property
+    def is_stable(self) -> bool:
+        return self.stable_chunks is not None and self._unchanged >= self.stable_chunks
+
+    def consume(self, chunks) -> CsvSchemaInference:
+        """Feeds the chunks into the inference until they are exhausted or the dtypes are stable"""
+        for chunk in chunks:
+            self.update(chunk)
+            if self.is_stable:
+                self.complete = False
+                break
+        return self
+
+    def columns(self) -> dict:
+        """Returns the name of the pandas dtype of every column"""
+        columns = {}
+        for column, kind in self.kinds.items():
+            has_nulls = self.has_nulls[column]
+            if kind is None:
+                columns[column] = self.dtypes[column]
+            elif kind == "int":
+                columns[column] = "float64" if has_nulls else "int64"
+            elif kind == "float":
+                columns[column] = "float64"
+            elif kind == "bool":
+                columns[column] = "object" if has_nulls else "bool"
+            elif kind == "date":
+                dtype = self.dtypes[column]
+                columns[column] = dtype if dtype.startswith("datetime64") else "datetime64[ns]"
+            else:
+                columns[column] = STRING_DTYPE
+        return columns
+
+
+def infer_csv_schema(
+    data_io: IO[bytes], csv_engine: str = "pandas", stable_chunks: Optional[int] = None, chunk_rows: int = 50_000
+) -> CsvSchemaInference:
+    """Infers the dtypes of a whole csv file chunk by chunk, only one chunk is held in memory at a time"""
+    return consume_csv_chunks(
+        data_io, lambda chunks: CsvSchemaInference(stable_chunks).consume(chunks), csv_engine, chunk_rows
+    )
@@ -4,10 +4,29 @@ from __future__ import annotations
 these classes include the data product itself, the data product tables and the data product columns 
 """
 import uuid
+import os
 import pandas as pd
 import json
+from collections.abc import Sequence
 from dataclasses import dataclass, field
-from typing import Optional
+from typing import IO, Any, Hashable, Iterator, Optional
+from src.modules.logic.data_reader import TableSchema
+
+COLUMN_OBJECT_TYPE = "DATA_PRODUCT_SAMPLE_DATA_COLUMN"
+
+
+def uuid4_batch(n: int) -> list[str]:
+    """Returns n random (version 4) uuid strings, the randomness of all of them is read from the os at once
+    and formatted from one hex string instead of creating a UUID object per id"""
+    random = bytearray(os.urandom(16 * n))
+    # set the version (4) and the variant (RFC 4122) bits of every uuid
+    random[6::16] = bytes((byte & 0x0F) | 0x40 for byte in random[6::16])
+    random[8::16] = bytes((byte & 0x3F) | 0x80 for byte in random[8::16])
+    h = random.hex()
+    return [
+        f"{h[i:i + 8]}-{h[i + 8:i + 12]}-{h[i + 12:i + 16]}-{h[i + 16:i + 20]}-{h[i + 20:i + 32]}"
+        for i in range(0, 32 * n, 32)
+    ]
 
 
 @dataclass
@@ -63,8 +82,7 @@ class DataProductDetails:
         # transform the accessdetails into a dictionary
         self.access_details = self.access_details.to_dict()
 
-        # create the flags
-        # TODO: didn't figure out how to provide the sample data, so its False for now
+        # create the flags, has_sample_data is set once the tables are registered
         self.flags = {
             "has_sample_data": False,
         }
@@ -83,10 +101,22 @@ class DataProductDetails:
         self.data_product_detail_sample_data_table = sample_data_tables
         self.data_product_detail_sample_data_column = []
 
-        # also save the columns in the data product class
+        # also save the columns in the data product class, as views onto the column stores of the tables
         for table in self.data_product_detail_sample_data_table:
             self.data_product_detail_sample_data_column.extend(table.columns)
 
+        self.flags["has_sample_data"] = any(
+            table.columns.has_sample_data for table in self.data_product_detail_sample_data_table
+        )
+
+    def column_dicts(self) -> list[dict[str, Any]]:
+        """Returns the dictionaries of all columns of all tables, built from the column stores without column objects"""
+        return [
+            column
+            for table in self.data_product_detail_sample_data_table
+            for column in table.columns.to_dicts()
+        ]
+
     def to_dict(self) -> dict[str, str | list[str]]:
         """Wrapper around the __dict__ method, returns all self variables as dictionary"""
         dp_data = {
@@ -111,76 +141,102 @@ class DataProductDetails:
 
         return dp_json
 
+    def iter_whole_data_product(self) -> Iterator[dict[str, Any]]:
+        """Yields the data product details, then every table and then every column as dictionary,
+        the columns are built table by table so only the columns of one table exist as dictionaries at a time"""
+        yield self.to_dict()
+        for table in self.data_product_detail_sample_data_table:
+            yield table.to_dict()
+        for table in self.data_product_detail_sample_data_table:
+            yield from table.columns.to_dicts()
+
     def whole_data_product_to_dict(self) -> list[dict[str, str | list[str]]]:
         """Returns the whole data product details, including the data product details, all tables ,and all columns as dictionary"""
-        dp_data = self.to_dict()
-        table_data = [
-            table.to_dict() for table in self.data_product_detail_sample_data_table
-        ]
-        column_data = [
-            column.to_dict() for column in self.data_product_detail_sample_data_column
-        ]
-
-        all_data = [dp_data] + table_data + column_data
-        return all_data
+        return list(self.iter_whole_data_product())
 
     def whole_data_product_to_json(self) -> str:
         """Returns the whole data product details, including the data product details, all tables ,and all columns as json strings"""
-
-        dp_data = self.to_dict()
-        table_data = [
-            table.to_dict() for table in self.data_product_detail_sample_data_table
-        ]
-        column_data = [
-            column.to_dict() for column in self.data_product_detail_sample_data_column
-        ]
-
-        all_data = [dp_data] + table_data + column_data
-
-        return json.dumps(all_data, indent=2)
+        return json.dumps(self.whole_data_product_to_dict(), indent=2)
+
+    def write_whole_data_product(self, file: IO[str], format: str = "ndjson") -> int:
+        """Writes the whole data product details item by item to a text file (or e.g. socket.makefile("w")),
+        only the dictionaries of one table's columns are held in memory at a time, not the whole catalog entry.
+        format 'ndjson' writes one compact json object per line, 'json' one compact json array.
+        Returns the number of written items.
+        """
+        if format not in ("ndjson", "json"):
+            raise ValueError(f"Export format {format!r} not supported, use 'ndjson' or 'json'")
+        encoder = json.JSONEncoder(separators=(",", ":"))
+        separator = "\n" if format == "ndjson" else ","
+
+        if format == "json":
+            file.write("[")
+        count = 0
+        for item in self.iter_whole_data_product():
+            if count:
+                file.write(separator)
+            file.write(encoder.encode(item))
+            count += 1
+        if format == "json":
+            file.write("]")
+        elif count:
+            file.write("\n")
+        return count
 
 
 @dataclass
 class DataProductDetailSampleDataTable:
     """Class holds all information about a data product detail sample data table including the
-    reference to its parent, the data product details"""
+    reference to its parent, the data product details.
+    The columns are either extracted from a loaded dataframe (df) or from an already read schema (schema).
+    'files' maps the kind of every stored file of the table ("original", "parquet") onto its blob name"""
 
     data_table_name: str
     schema_version: int
     parent_id: str
-    df: pd.DataFrame = field(repr=False)
+    df: Optional[pd.DataFrame] = field(default=None, repr=False)
+    schema: Optional[TableSchema] = field(default=None, repr=False)
+    files: dict[str, str] = field(default_factory=dict)
 
     def __post_init__(self):
+        if self.df is None and self.schema is None:
+            raise ValueError(
+                f"The Table {self.data_table_name!r} needs either a dataframe or a schema"
+            )
         self.object_type = "DATA_PRODUCT_SAMPLE_DATA_TABLE"
         self.id = str(uuid.uuid4())
 
         # init columns variable for later reference
         self.columns = self._extract_columns()
+        if self.schema is not None and self.schema.samples:
+            self.columns.register_sample_data(self.schema.samples)
+        if self.schema is not None and self.schema.profiles:
+            self.columns.register_profiles(self.schema.profiles)
+
+    def _extract_columns(self) -> ColumnStore:
+        """Extracts the columns of the schema or df class variable into a column store,
+        iterating over the store yields views that behave like data product detail sample data columns"""
+        column_types = self.column_types
+        # the schema version is always 1 for now
+        return ColumnStore(
+            names=list(column_types),
+            data_types=[
+                "string" if data_type == "object" else data_type
+                for data_type in column_types.values()
+            ],
+            schema_version=1,
+            parent_id=self.id,
+        )
 
-    def _extract_columns(self) -> list[DataProductDetailSampleDataColumn]:
-        """Extracts the columns of the df class variable and returns them as data product detail sample data column objects"""
-        sample_data_columns: list[DataProductDetailSampleDataColumn] = []
-        for column in self.df_columns:
-            # get the data_type information, the schema version is always 1 for now
-            schema_version = 1
-            parent_id = self.id
-            data_type = str(self.df[column].dtype)
-            if data_type == "object":
-                data_type = "string"
-
-            sample_data_columns.append(
-                DataProductDetailSampleDataColumn(
-                    column_name=column,
-                    data_type=data_type,
-                    schema_version=schema_version,
-                    parent_id=parent_id,
-                )
-            )
-        return sample_data_columns
+    def renew_ids(self) -> None:
+        """Gives the table and its columns new uuids, e.g. when an already parsed table is registered again"""
+        self.id = str(uuid.uuid4())
+        self.columns.parent_id = self.id
+        self.columns.ids = uuid4_batch(len(self.columns))
 
     def get_all_registered_column_ids(self) -> list[str]:
         """Returns all the uuids of the registered columns as list"""
-        return [column.id for column in self.columns]
+        return list(self.columns.ids)
 
     def to_dict(self) -> dict[str, str]:
         data = {
@@ -191,6 +247,8 @@ class DataProductDetailSampleDataTable:
             "id": self.id,
             "columns": self.get_all_registered_column_ids(),
         }
+        if self.files:
+            data["files"] = self.files
         return data
 
     def to_json(self) -> str:
@@ -200,9 +258,18 @@ class DataProductDetailSampleDataTable:
 
     @property
     def df_columns(self) -> list[str]:
-        """returns the columns of the df variable as list of strings"""
+        """returns the columns of the df variable (or of the schema) as list of strings"""
+        if self.schema is not None:
+            return list(self.schema.columns)
         return self.df.columns.tolist()
 
+    @property
+    def column_types(self) -> dict[Hashable, str]:
+        """returns the name of the dtype for every column, the schema takes precedence over the df"""
+        if self.schema is not None:
+            return self.schema.columns
+        return {column: str(self.df[column].dtype) for column in self.df_columns}
+
 
 @dataclass
 class DataProductDetailSampleDataColumn:
@@ -213,14 +280,15 @@ class DataProductDetailSampleDataColumn:
 
     def __post_init__(self):
         self.id = str(uuid.uuid4())
-        self.object_type = "DATA_PRODUCT_SAMPLE_DATA_COLUMN"
+        self.object_type = COLUMN_OBJECT_TYPE
 
         # init empty data variable, if we want to include sample data later on
         self.data = None
+        # statistics of the column values, only set if the column was profiled
+        self.profile = None
 
-    def register_sample_data(self, sample_data: list[str]) -> None:
-        """Registers Sample Data for the Data Product Column"""
-        # TODO definitely not ready yet, will be implemented later ;)
+    def register_sample_data(self, sample_data: list) -> None:
+        """Registers Sample Data (json compatible values) for the Data Product Column"""
         self.data = sample_data
 
     def to_dict(self) -> dict[str, str]:
@@ -231,15 +299,144 @@ class DataProductDetailSampleDataColumn:
             "data_type": self.data_type,
             "schema_version": self.schema_version,
             "object_type": self.object_type,
-            "data": list(),
+            "data": self.data if self.data is not None else list(),
         }
+        if self.profile is not None:
+            data["profile"] = self.profile
         return data
 
     def to_json(self) -> str:
         """Returns the data product detail sample data column information as json string"""
 
         data = self.to_dict()
-        # TODO Sample Data Flag needs to be added here
 
         data_json = json.dumps(data, indent=2)
         return data_json
+
+
+class DataProductDetailSampleDataColumnView:
+    """A data product detail sample data column that reads and writes its values in a ColumnStore,
+    it is created on access and holds nothing but the store and its position (it has no __dict__).
+    It offers the attributes and methods of DataProductDetailSampleDataColumn without being one of its instances"""
+
+    __slots__ = ("_store", "_index")
+
+    def __init__(self, store: ColumnStore, index: int):
+        self._store = store
+        self._index = index
+
+    def _get(name: str):
+        return property(
+            lambda self: getattr(self._store, name)[self._index],
+            lambda self, value: getattr(self._store, name).__setitem__(self._index, value),
+        )
+
+    column_name = _get("names")
+    data_type = _get("data_types")
+    id = _get("ids")
+    data = _get("data")
+    profile = _get("profiles")
+    del _get
+
+    @property
+    def schema_version(self) -> int:
+        return self._store.schema_version
+
+    @property
+    def parent_id(self) -> str:
+        return self._store.parent_id
+
+    @property
+    def object_type(self) -> str:
+        return COLUMN_OBJECT_TYPE
+
+    # the methods only use the attributes above, so they are shared with the column class
+    register_sample_data = DataProductDetailSampleDataColumn.register_sample_data
+    to_dict = DataProductDetailSampleDataColumn.to_dict
+    to_json = DataProductDetailSampleDataColumn.to_json
+
+    def __repr__(self) -> str:
+        return (
+            f"{type(self).__name__}(column_name={self.column_name!r}, data_type={self.data_type!r}, "
+            f"schema_version={self.schema_version!r}, parent_id={self.parent_id!r})"
+        )
+
+
+class ColumnStore(Sequence):
+    """Compact store of all columns of one table, the values are kept in one list per attribute
+    instead of one object per column, and all uuids are created in one batch.
+    The store is a sequence of column views (see DataProductDetailSampleDataColumnView) created on access,
+    while to_dicts and to_json serialize all columns without creating them.
+    """
+
+    def __init__(
+        self,
+        names: list[Hashable],
+        data_types: list[str],
+        schema_version: int,
+        parent_id: str,
+    ):
+        self.names = names
+        self.data_types = data_types
+        self.schema_version = schema_version
+        self.parent_id = parent_id
+        self.ids = uuid4_batch(len(names))
+        # sample data and statistics of every column, None until they are registered
+        self.data: list[Optional[list]] = [None] * len(names)
+        self.profiles: list[Optional[dict]] = [None] * len(names)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("column index out of range")
+        return DataProductDetailSampleDataColumnView(self, index)
+
+    def __iter__(self):
+        return (DataProductDetailSampleDataColumnView(self, i) for i in range(len(self)))
+
+    def to_dicts(self) -> list[dict[str, Any]]:
+        """Returns the dictionaries of all columns, equal to calling to_dict on every column"""
+        schema_version = self.schema_version
+        columns = [
+            {
+                "name": name,
+                "id": column_id,
+                "data_type": data_type,
+                "schema_version": schema_version,
+                "object_type": COLUMN_OBJECT_TYPE,
+                "data": data if data is not None else list(),
+            }
+            for name, column_id, data_type, data in zip(
+                self.names, self.ids, self.data_types, self.data
+            )
+        ]
+        for column, profile in zip(columns, self.profiles):
+            if profile is not None:
+                column["profile"] = profile
+        return columns
+
+    def register_sample_data(self, samples: dict[Hashable, list]) -> None:
+        """Registers the sample values of the columns contained in samples"""
+        for i, name in enumerate(self.names):
+            if name in samples:
+                self.data[i] = samples[name]
+
+    def register_profiles(self, profiles: dict[Hashable, dict]) -> None:
+        """Registers the statistics of the columns contained in profiles"""
+        for i, name in enumerate(self.names):
+            if name in profiles:
+                self.profiles[i] = profiles[name]
+
+    @property
+    def has_sample_data(self) -> bool:
+        return any(self.data)
+
+    def to_json(self) -> str:
+        """Returns all columns as one compact json array"""
+        return json.dumps(self.to_dicts(), separators=(",", ":"))
@@ -1,9 +1,119 @@
 from __future__ import annotations
 import pandas as pd 
+import pyarrow.parquet as pq
+import src.modules.logic.excel_reader as er
+import src.modules.logic.csv_reader as cr
+import src.modules.logic.sample_reader as sr
+import src.modules.logic.column_profiler as cp
 import io 
 from dataclasses import dataclass,field
 from enum import Enum 
 from functools import partial
+from typing import IO, Hashable, Optional
+
+
+@dataclass
+class TableSchema:
+    """Data Class that holds the schema of a table without holding the table data itself
+    the 'columns' variable maps every column name onto the name of its pandas dtype,
+    'samples' holds a few json compatible sample values per column if samples were read,
+    'profiles' the statistics of every column (as dictionaries) if the columns were profiled
+    """
+    columns: dict[Hashable,str]
+    num_rows: Optional[int] = None
+    row_groups: list[dict[str,int]] = field(default_factory=list)
+    samples: dict[Hashable,list] = field(default_factory=dict)
+    profiles: dict[Hashable,dict] = field(default_factory=dict)
+
+    @property
+    def num_row_groups(self)->int:
+        """Returns the number of row groups, files without row groups count as zero"""
+        return len(self.row_groups)
+
+    @classmethod
+    def from_dataframe(cls,df:pd.DataFrame)->TableSchema:
+        """Creates the schema of an already loaded dataframe"""
+        columns = {column:str(dtype) for column,dtype in df.dtypes.items()}
+        return cls(columns,num_rows=len(df))
+
+
+def read_parquet_schema(data_io:IO[bytes])->TableSchema:
+    """Reads the schema, the row count and the row group metadata from the footer of a parquet file.
+    No data pages are decoded, the dtypes are derived from an empty table so they match the ones pd.read_parquet would produce
+    """
+    parquet_file = pq.ParquetFile(data_io)
+    metadata = parquet_file.metadata
+    dtypes = parquet_file.schema_arrow.empty_table().to_pandas().dtypes
+
+    row_groups = []
+    for i in range(metadata.num_row_groups):
+        row_group = metadata.row_group(i)
+        row_groups.append({"num_rows":row_group.num_rows,"total_byte_size":row_group.total_byte_size})
+
+    columns = {column:str(dtype) for column,dtype in dtypes.items()}
+    return TableSchema(columns,num_rows=metadata.num_rows,row_groups=row_groups)
+
+
+def read_csv_schema(
+    data_io:IO[bytes],csv_engine:str="pandas",stable_chunks:Optional[int]=None,sample_rows:int=0,profile:bool=False,
+    sample_whole_file:bool=True,
+)->TableSchema:
+    """Infers the schema of a csv file chunk by chunk, only one chunk is held in memory at a time.
+    The dtypes of the chunks are promoted (int -> float -> string), so they describe the whole file,
+    with 'stable_chunks' the inference stops once the dtypes did not change for that many chunks and num_rows stays None.
+    With 'sample_rows' above 0 and 'profile' the same chunks are also sampled and profiled, the file is streamed only once
+    (to its end in that case, even if the inference stopped early).
+    Without 'sample_whole_file' the samples are only drawn from the chunks the inference read, the stream then stops with it
+    unless the columns are profiled
+    """
+    def consume(chunks)->TableSchema:
+        inference = cr.CsvSchemaInference(stable_chunks)
+        reservoir = sr.Reservoir(sample_rows) if sample_rows > 0 else None
+        profiler = cp.ChunkProfiler() if profile else None
+        for chunk in chunks:
+            if inference.complete:
+                inference.update(chunk)
+                inference.complete = not inference.is_stable
+            elif profiler is None and (reservoir is None or not sample_whole_file):
+                break
+            if reservoir is not None:
+                reservoir.update(chunk)
+            if profiler is not None:
+                profiler.update(chunk)
+        schema = TableSchema(inference.columns(),num_rows=inference.num_rows if inference.complete else None)
+        if reservoir is not None:
+            schema.samples = reservoir.sample()
+        if profiler is not None:
+            schema.profiles = {column:column_profile.to_dict() for column,column_profile in profiler.finish().items()}
+        return schema
+
+    return cr.consume_csv_chunks(data_io,consume,csv_engine)
+
+
+def read_excel(data_io:IO[bytes],file_type:str,sheet_name:Optional[str]=None,max_rows:Optional[int]=None)->pd.DataFrame:
+    """Reads a single sheet of an excel file, the first one if no sheet_name is given"""
+    df,_ = er.read_sheet(data_io,file_type,sheet_name,max_rows)
+    return df
+
+
+def read_excel_schema(data_io:IO[bytes],file_type:str,sheet_name:Optional[str]=None,max_rows:Optional[int]=None)->TableSchema:
+    """Reads the schema of a single sheet of an excel file, the dtypes are inferred from the first max_rows rows only"""
+    df,num_rows = er.read_sheet(data_io,file_type,sheet_name,max_rows)
+    schema = TableSchema.from_dataframe(df)
+    schema.num_rows = num_rows
+    return schema
+
+
+def as_file(data:bytes|IO[bytes])->IO[bytes]:
+    """Returns the data as a file-like object positioned at the start,
+    bytes are wrapped while already opened files (e.g. zip members) are used directly
+    """
+    if isinstance(data,(bytes,bytearray)):
+        return io.BytesIO(data)
+    if data.seekable():
+        data.seek(0)
+    return data
+
 
 class SupportedFileTypes(Enum):
     """Enumeration Class that displays all supported file types """
@@ -21,19 +131,38 @@ class SupportedFileTypes(Enum):
             if member.value == value.lower():
                 return member
         raise ValueError(f'File Type: {value!r} not supported!')
+
+    @property
+    def is_excel(self)->bool:
+        """True for all file types that are excel workbooks which may contain multiple sheets"""
+        return self in (SupportedFileTypes.XLS,SupportedFileTypes.XLSX,SupportedFileTypes.XLSM)
+
+    @property
+    def needs_random_access(self)->bool:
+        """True for file types whose readers seek through the file (parquet footers, excel zip parts),
+        csv files are read from start to end and can be parsed straight from a decompressing stream"""
+        return self is SupportedFileTypes.PARQUET or self.is_excel
             
             
-    def get_reader(value:SupportedFileTypes)->callable:
+    def get_reader(value:SupportedFileTypes,csv_engine:str="pandas")->callable:
         """Helper Function that can be called with a SupportFileType to get the associated
         function that can then be called later
+        csv_engine 'pandas' reads comma separated utf-8 files, 'arrow' sniffs the dialect and parses with pyarrow
         """
+        csv_readers = {
+            "pandas": partial(pd.read_csv,sep=",",encoding="utf-8",header=0),
+            "arrow": cr.read_csv,
+        }
+        if csv_engine not in csv_readers:
+            raise ValueError(f'CSV engine {csv_engine!r} not supported, use one of {list(csv_readers)}')
+
         # all read methods are in the dictionary that its easy to call 
         supported_read_methods = {
             SupportedFileTypes.PARQUET: pd.read_parquet,
-            SupportedFileTypes.CSV: partial(pd.read_csv,sep=",",encoding="utf-8",header=0),
-            SupportedFileTypes.XLS: partial(pd.read_excel,engine="openpyxl"),
-            SupportedFileTypes.XLSX: partial(pd.read_excel,engine="openpyxl"),
-            SupportedFileTypes.XLSM: partial(pd.read_excel,engine="openpyxl"),
+            SupportedFileTypes.CSV: csv_readers[csv_engine],
+            SupportedFileTypes.XLS: partial(read_excel,file_type="xls"),
+            SupportedFileTypes.XLSX: partial(read_excel,file_type="xlsx"),
+            SupportedFileTypes.XLSM: partial(read_excel,file_type="xlsm"),
 
         }
         
@@ -41,6 +170,42 @@ class SupportedFileTypes(Enum):
         if reader is None:
             raise ValueError(f'No reader method implemented for the particular Enumeration! Please contact the developers')
         return reader
+
+    def get_schema_reader(value:SupportedFileTypes,csv_engine:str="pandas",chunked_csv:bool=False,stable_chunks:Optional[int]=None)->Optional[callable]:
+        """Helper Function that returns a function which reads only the schema of a file type without loading its data
+        if the file type has no such function, None is returned and the whole file must be read to derive the schema
+        csv files only have one with 'chunked_csv', their schema is then inferred chunk by chunk
+        """
+        supported_schema_methods = {
+            SupportedFileTypes.PARQUET: read_parquet_schema,
+            SupportedFileTypes.CSV: partial(read_csv_schema,csv_engine=csv_engine,stable_chunks=stable_chunks) if chunked_csv else None,
+            SupportedFileTypes.XLS: partial(read_excel_schema,file_type="xls"),
+            SupportedFileTypes.XLSX: partial(read_excel_schema,file_type="xlsx"),
+            SupportedFileTypes.XLSM: partial(read_excel_schema,file_type="xlsm"),
+        }
+        return supported_schema_methods.get(value,None)
+
+    def get_sample_reader(value:SupportedFileTypes,csv_engine:str="pandas")->callable:
+        """Helper Function that returns a function which reads 'n' sample rows of a file type without loading the whole file"""
+        supported_sample_methods = {
+            SupportedFileTypes.PARQUET: sr.sample_parquet,
+            SupportedFileTypes.CSV: partial(sr.sample_csv,csv_engine=csv_engine),
+            SupportedFileTypes.XLS: partial(sr.sample_excel,file_type="xls"),
+            SupportedFileTypes.XLSX: partial(sr.sample_excel,file_type="xlsx"),
+            SupportedFileTypes.XLSM: partial(sr.sample_excel,file_type="xlsm"),
+        }
+        return supported_sample_methods[value]
+
+    def get_profiler(value:SupportedFileTypes,csv_engine:str="pandas")->callable:
+        """Helper Function that returns a function which profiles all columns of a file type in one pass"""
+        supported_profile_methods = {
+            SupportedFileTypes.PARQUET: cp.profile_parquet,
+            SupportedFileTypes.CSV: partial(cp.profile_csv,csv_engine=csv_engine),
+            SupportedFileTypes.XLS: partial(cp.profile_excel,file_type="xls"),
+            SupportedFileTypes.XLSX: partial(cp.profile_excel,file_type="xlsx"),
+            SupportedFileTypes.XLSM: partial(cp.profile_excel,file_type="xlsm"),
+        }
+        return supported_profile_methods[value]
             
 
 
@@ -51,17 +216,49 @@ class DataReader:
     """Data Class that is able to load specific files into memory as a pandas DataFrame
     the 'data' variable holds the read dataframe     
 
+    With 'schema_only' set, the 'data' variable stays None and only the 'schema' variable is filled,
+    file types that store their schema (parquet) are then never fully loaded into memory.
+
+    With 'chunked_schema' set, the schema of csv files is inferred chunk by chunk instead of loading the whole file,
+    the dtypes of the chunks are promoted so they match the whole file, columns holding only iso dates become datetime64.
+    'stable_chunks' stops that inference early once the dtypes did not change for that many chunks.
+    The samples and profiles of such csv files are taken from the same chunks, the file is streamed only once,
+    with 'sample_whole_file' unset the samples only come from the chunks read until the inference stopped.
+
+    Excel files are read one sheet at a time, 'sheet_name' selects the sheet (default: the first one)
+    and 'max_rows' stops the reading after that many rows, e.g. to infer the schema from the first rows only.
+
+    With 'sample_rows' above 0, that many sample rows are stored in schema.samples: a uniform sample of csv files
+    (streamed in chunks), the first rows of the first row group of parquet files and the first rows of excel sheets.
+    With 'profile' set, every column is profiled (nulls, min/max, approximate distinct count and quantiles) into schema.profiles,
+    parquet files take null counts, min and max from their footer, their distinct count and quantiles are then None.
+
     Important Note: 
-    For CSV Files we always assume that the delimiter is a comma (,). Furthermore, the encoding must be utf-8 and the header must start in the first position (position 0),
+    For CSV Files read with the default 'pandas' csv_engine we always assume that the delimiter is a comma (,). Furthermore, the encoding must be utf-8 and the header must start in the first position (position 0),
     otherwise it will throw errors or produce wrong results.
+    The 'arrow' csv_engine sniffs delimiter, quoting and encoding, only the header must still be in the first row.
     """
     table_name:str 
-    data_as_bytes:bytes = field(repr=False)
+    data_as_bytes:bytes|IO[bytes] = field(repr=False)
+    schema_only:bool = False
+    sheet_name:Optional[str] = None
+    max_rows:Optional[int] = None
+    csv_engine:str = "pandas"
+    sample_rows:int = 0
+    profile:bool = False
+    chunked_schema:bool = False
+    stable_chunks:Optional[int] = None
+    sample_whole_file:bool = True
 
 
     def __post_init__(self):
         self.table_name = self.table_name.lower()
-        self.data = self._read()
+        if self.schema_only:
+            self.data = None
+            self.schema = self._read_schema()
+        else:
+            self.data = self._read()
+            self.schema = self._dataframe_schema(self.data)
 
 
 
@@ -72,12 +269,68 @@ class DataReader:
         # two step approach, get the right enumeration and then use the get_reader method to get the right pandas datareader function 
 
         supported_file_enum = SupportedFileTypes.get_enum_member(self.file_type)
-        reader = SupportedFileTypes.get_reader(supported_file_enum)
+        reader = SupportedFileTypes.get_reader(supported_file_enum,self.csv_engine)
         
-        # convert the bytes data to a file-like object that can then be called be the pandas read methods 
-        data_io = io.BytesIO(self.data_as_bytes)
+        return reader(self._as_file(),**self._reader_options(supported_file_enum))
+
+    def _read_schema(self)->TableSchema:
+        """Helper Function that reads only the schema from a bytes array,
+        file types without a schema reader fall back to reading the whole dataframe
+        """
+        supported_file_enum = SupportedFileTypes.get_enum_member(self.file_type)
+        if supported_file_enum is SupportedFileTypes.CSV and self.chunked_schema:
+            # the samples and profiles are taken from the chunks the schema is inferred from
+            return read_csv_schema(
+                self._as_file(),self.csv_engine,self.stable_chunks,self.sample_rows,self.profile,self.sample_whole_file
+            )
+
+        schema_reader = SupportedFileTypes.get_schema_reader(
+            supported_file_enum,self.csv_engine,self.chunked_schema,self.stable_chunks
+        )
+        if schema_reader is None:
+            # the dataframe is only dropped once the samples and profiles are taken from it
+            return self._dataframe_schema(self._read())
+
+        schema = schema_reader(self._as_file(),**self._reader_options(supported_file_enum))
+        if self.sample_rows > 0:
+            schema.samples = self._read_sample()
+        if self.profile:
+            schema.profiles = {column:profile.to_dict() for column,profile in self._read_profiles().items()}
+        return schema
+
+    def _dataframe_schema(self,df:pd.DataFrame)->TableSchema:
+        """Helper Function that derives the schema of a loaded dataframe, its samples and profiles are taken from the dataframe as well"""
+        schema = TableSchema.from_dataframe(df)
+        if self.sample_rows > 0:
+            schema.samples = sr.reservoir_sample([df],self.sample_rows)
+        if self.profile:
+            schema.profiles = {column:profile.to_dict() for column,profile in cp.profile_dataframe(df).items()}
+        return schema
+
+    def _read_sample(self)->dict[Hashable,list]:
+        """Helper Function that reads the sample rows without loading the whole file"""
+        supported_file_enum = SupportedFileTypes.get_enum_member(self.file_type)
+        sample_reader = SupportedFileTypes.get_sample_reader(supported_file_enum,self.csv_engine)
+        options = {"sheet_name":self.sheet_name} if supported_file_enum.is_excel else {}
+        return sample_reader(self._as_file(),self.sample_rows,**options)
+
+    def _read_profiles(self)->dict[Hashable,cp.ColumnProfile]:
+        """Helper Function that profiles the columns without loading the whole file"""
+        supported_file_enum = SupportedFileTypes.get_enum_member(self.file_type)
+        profiler = SupportedFileTypes.get_profiler(supported_file_enum,self.csv_engine)
+        options = {"sheet_name":self.sheet_name} if supported_file_enum.is_excel else {}
+        return profiler(self._as_file(),**options)
+
+    def _reader_options(self,supported_file_enum:SupportedFileTypes)->dict:
+        """Helper Function that returns the sheet options for excel files, other file types take no options"""
+        if supported_file_enum.is_excel:
+            return {"sheet_name":self.sheet_name,"max_rows":self.max_rows}
+        return {}
+
+    def _as_file(self)->IO[bytes]:
+        """Helper Function that returns the data as a file-like object that can then be called be the pandas read methods"""
+        return as_file(self.data_as_bytes)
 
-        return reader(data_io)
     @property
     def file_type(self)->str:
         """Returns the extracted file type derived from the name of the file"""
@@ -85,3 +338,11 @@ class DataReader:
         return self.table_name.split(".")[-1]
 
 
+def table_sheets(table_name:str,data:bytes|IO[bytes])->list[Optional[str]]:
+    """Returns the sheet names of an excel file, every sheet becomes its own table,
+    all other file types hold exactly one table which is returned as [None]
+    """
+    file_type = table_name.lower().split(".")[-1]
+    if not SupportedFileTypes.get_enum_member(file_type).is_excel:
+        return [None]
+    return er.sheet_names(as_file(data),file_type)
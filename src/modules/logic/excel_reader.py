@@ -0,0 +1,80 @@
+"""This modules handles the reading of excel workbooks sheet by sheet.
+A native engine (python-calamine) is used when it is installed, otherwise the sheets are streamed
+with openpyxl in read-only mode, which never builds the whole workbook in memory.
+Legacy .xls files need either python-calamine or xlrd.
+"""
+from __future__ import annotations
+import pandas as pd
+import importlib.util
+from typing import IO, Optional
+
+
+def _is_installed(module_name: str) -> bool:
+    return importlib.util.find_spec(module_name) is not None
+
+
+def excel_engine(file_type: str) -> str:
+    """Returns the fastest installed engine that is able to read the given excel file type ('xls', 'xlsx' or 'xlsm')"""
+    if _is_installed("python_calamine"):
+        return "calamine"
+    if file_type == "xls":
+        if _is_installed("xlrd"):
+            return "xlrd"
+        raise ValueError(
+            "Legacy .xls files can only be read with xlrd or python-calamine installed, please contact the developers"
+        )
+    return "openpyxl"
+
+
+def sheet_names(data_io: IO[bytes], file_type: str) -> list[str]:
+    """Returns the names of all sheets of a workbook without reading any cells"""
+    engine = excel_engine(file_type)
+    if engine == "openpyxl":
+        workbook = _open_read_only(data_io)
+        try:
+            return list(workbook.sheetnames)
+        finally:
+            workbook.close()
+    with pd.ExcelFile(data_io, engine=engine) as excel_file:
+        return list(excel_file.sheet_names)
+
+
+def read_sheet(
+    data_io: IO[bytes],
+    file_type: str,
+    sheet_name: Optional[str] = None,
+    max_rows: Optional[int] = None,
+) -> tuple[pd.DataFrame, Optional[int]]:
+    """Reads a single sheet (the first one if no sheet_name is given) into a dataframe,
+    the reading stops after max_rows data rows. The header is expected in the first row.
+    Returns the dataframe and the number of data rows of the whole sheet, if the engine knows it without reading them.
+    """
+    engine = excel_engine(file_type)
+    if engine != "openpyxl":
+        df = pd.read_excel(data_io, sheet_name=sheet_name or 0, engine=engine, nrows=max_rows)
+        return df, (len(df) if max_rows is None else None)
+
+    workbook = _open_read_only(data_io)
+    try:
+        worksheet = workbook[sheet_name] if sheet_name else workbook.worksheets[0]
+        rows = worksheet.iter_rows(
+            values_only=True, max_row=None if max_rows is None else max_rows + 1
+        )
+        header = next(rows, ())
+        columns = [
+            column if column is not None else f"Unnamed: {i}"
+            for i, column in enumerate(header)
+        ]
+        df = pd.DataFrame(list(rows), columns=columns)
+        # the dimension stored in the sheet tells the row count without reading the rows
+        num_rows = None if worksheet.max_row is None else max(worksheet.max_row - 1, 0)
+        return df, num_rows
+    finally:
+        workbook.close()
+
+
+def _open_read_only(data_io: IO[bytes]):
+    """Helper Function that opens a workbook in openpyxl's read-only streaming mode"""
+    import openpyxl
+
+    return openpyxl.load_workbook(data_io, read_only=True, data_only=True)
@@ -0,0 +1,60 @@
+"""This modules provides lazy module imports to keep the cold start of the app small.
+The parsing, storage and http modules pull in pandas, pyarrow, openpyxl, azure-storage-blob and requests,
+none of which are needed to render the first page.
+The first attribute access executes the module under a lock, so threads that use a module at the same time
+(e.g. the upload workers) wait until it is fully executed instead of seeing a half-initialised module.
+"""
+from types import ModuleType
+import importlib
+import importlib.util
+import sys
+import threading
+
+
+_locks_lock = threading.Lock()
+_locks: dict[str, threading.RLock] = {}
+
+
+def _module_lock(name: str) -> threading.RLock:
+    with _locks_lock:
+        return _locks.setdefault(name, threading.RLock())
+
+
+class _LazyModule(ModuleType):
+    """Module that executes its code on the first attribute access and then turns into a plain module"""
+
+    def __getattribute__(self, attr):
+        name = ModuleType.__getattribute__(self, "__name__")
+        with _module_lock(name):
+            # the executing thread itself may access the module while it runs, it is not executed a second time
+            if type(self) is _LazyModule and not ModuleType.__getattribute__(self, "__dict__").get("__lazy_loading__"):
+                namespace = ModuleType.__getattribute__(self, "__dict__")
+                namespace["__lazy_loading__"] = True
+                try:
+                    ModuleType.__getattribute__(self, "__spec__").loader.exec_module(self)
+                    self.__class__ = ModuleType
+                finally:
+                    namespace.pop("__lazy_loading__", None)
+        return ModuleType.__getattribute__(self, attr)
+
+
+def lazy_import(name: str) -> ModuleType:
+    """Returns the module with the given name, the module is only executed on its first attribute access.
+    Already imported modules are returned as they are.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+
+    parent_name, _, child_name = name.rpartition(".")
+    parent = importlib.import_module(parent_name) if parent_name else None
+
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    module.__class__ = _LazyModule
+    if parent is not None:
+        setattr(parent, child_name, module)
+    return module
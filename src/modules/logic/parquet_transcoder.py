@@ -0,0 +1,161 @@
+"""This modules transcodes the tabular data product items (csv files and excel sheets) into compressed parquet files,
+so the consumers of the data product do not have to parse the original files again.
+The schema inferred by the DataReader is applied to every chunk, csv files are streamed chunk by chunk
+and written in row groups of ROW_GROUP_ROWS rows, only one row group is held in memory at a time.
+The schema must describe the whole table: a chunk that does not fit it raises instead of being cast lossily,
+excel sheets are read as a whole anyway and take the dtypes of the whole sheet.
+"""
+from __future__ import annotations
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import src.modules.logic.csv_reader as cr
+import src.modules.logic.excel_reader as er
+from typing import IO, Hashable, Iterable, Optional
+from src.modules.logic.data_reader import SupportedFileTypes, TableSchema
+
+
+ROW_GROUP_ROWS = 128 * 1024
+COMPRESSION = "zstd"
+
+
+def can_transcode(file_name: str) -> bool:
+    """True for the data product items that are transcoded, parquet files are uploaded as they are"""
+    return SupportedFileTypes.get_enum_member(file_name.split(".")[-1]) is not SupportedFileTypes.PARQUET
+
+
+def parquet_blob_name(blob_name: str) -> str:
+    """Returns the blob name of the transcoded table, the original extension is kept so e.g. sales.csv and sales.xlsx do not collide"""
+    return f"{blob_name}.parquet"
+
+
+def _datetime_unit(dtype: str) -> str:
+    return dtype[len("datetime64[") : -1].split(",")[0] if dtype.startswith("datetime64[") else "ns"
+
+
+def arrow_schema(schema: TableSchema) -> pa.Schema:
+    """Returns the parquet schema of a table schema, columns of other dtypes than numbers, bools and dates become strings"""
+    fields = []
+    for column, dtype in schema.columns.items():
+        if dtype == "int64":
+            arrow_type = pa.int64()
+        elif dtype == "float64":
+            arrow_type = pa.float64()
+        elif dtype == "bool":
+            arrow_type = pa.bool_()
+        elif dtype.startswith("datetime64"):
+            arrow_type = pa.timestamp(_datetime_unit(dtype))
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(str(column), arrow_type))
+    return pa.schema(fields)
+
+
+def needs_complete_schema(file_name: str, schema: TableSchema) -> bool:
+    """True for csv files whose schema inference stopped early (stable_chunks), later rows may not fit its dtypes"""
+    file_type = SupportedFileTypes.get_enum_member(file_name.split(".")[-1])
+    return file_type is SupportedFileTypes.CSV and schema.num_rows is None
+
+
+def _cast(series: pd.Series, column: Hashable, dtype: str) -> pd.Series:
+    """Helper Function that casts the values of a column to a number or bool dtype,
+    values that would change by the cast (e.g. 0.5 or a null in an int64 column) raise a ValueError"""
+    if dtype == "bool":
+        if not series.isin([True, False]).all():
+            raise ValueError(f"The column {column!r} holds values that are not bools")
+        return series.astype(dtype)
+    try:
+        numbers = pd.to_numeric(series)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"The column {column!r} holds values that are not numbers") from e
+    if dtype == "int64" and (numbers.isna().any() or not (numbers == numbers.round()).all()):
+        raise ValueError(f"The column {column!r} holds values that are not integers")
+    return numbers.astype(dtype)
+
+
+def _conform(chunk: pd.DataFrame, columns: dict[Hashable, str]) -> pd.DataFrame:
+    """Helper Function that casts a chunk to the dtypes of the whole table,
+    dates with an offset are converted to utc, values that are neither numbers, bools nor dates to strings.
+    Values that do not fit the dtype of their column raise a ValueError"""
+    conformed = {}
+    for column, dtype in columns.items():
+        series = chunk[column]
+        if dtype in ("int64", "float64", "bool"):
+            conformed[column] = _cast(series, column, dtype)
+        elif dtype.startswith("datetime64"):
+            dates = pd.to_datetime(series, format="ISO8601", utc=True).dt.tz_localize(None)
+            conformed[column] = dates.astype(f"datetime64[{_datetime_unit(dtype)}]")
+        else:
+            # astype(str) turns every value into a string (object columns of older pandas keep numbers as they are),
+            # missing values stay missing so they are written as nulls
+            conformed[column] = series.astype(str).where(series.notna(), None)
+    return pd.DataFrame(conformed, index=chunk.index)
+
+
+def write_row_groups(
+    tables: Iterable[pa.Table], target: IO[bytes], schema: pa.Schema,
+    row_group_rows: int = ROW_GROUP_ROWS, compression: str = COMPRESSION,
+) -> int:
+    """Writes a stream of arrow tables as parquet with row groups of row_group_rows rows,
+    smaller tables are collected until a row group is full. Returns the number of rows written
+    """
+    pending: list[pa.Table] = []
+    pending_rows = 0
+    rows = 0
+    with pq.ParquetWriter(target, schema, compression=compression) as writer:
+        for table in tables:
+            pending.append(table)
+            pending_rows += table.num_rows
+            while pending_rows >= row_group_rows:
+                combined = pa.concat_tables(pending)
+                writer.write_table(combined.slice(0, row_group_rows), row_group_size=row_group_rows)
+                rest = combined.slice(row_group_rows)
+                pending, pending_rows = [rest], rest.num_rows
+                rows += row_group_rows
+        if pending_rows:
+            writer.write_table(pa.concat_tables(pending), row_group_size=row_group_rows)
+            rows += pending_rows
+    return rows
+
+
+def transcode_to_parquet(
+    file_name: str,
+    data_io: IO[bytes],
+    schema: TableSchema,
+    target: IO[bytes],
+    sheet_name: Optional[str] = None,
+    csv_engine: str = "pandas",
+    row_group_rows: int = ROW_GROUP_ROWS,
+    compression: str = COMPRESSION,
+) -> int:
+    """Transcodes a csv file or an excel sheet into a parquet file written to target, using the already inferred schema.
+    The schema of a csv file must be complete (see needs_complete_schema), excel sheets take the dtypes of the whole sheet.
+    Returns the number of rows written
+    """
+    file_type = SupportedFileTypes.get_enum_member(file_name.split(".")[-1])
+    if needs_complete_schema(file_name, schema):
+        raise ValueError(f"The schema of {file_name!r} was inferred from the first chunks only, it may not fit later rows")
+
+    def to_tables(chunks: Iterable[pd.DataFrame], schema: TableSchema) -> Iterable[pa.Table]:
+        parquet_schema = arrow_schema(schema)
+        for chunk in chunks:
+            chunk = _conform(chunk, schema.columns)
+            chunk.columns = parquet_schema.names
+            yield pa.Table.from_pandas(chunk, schema=parquet_schema, preserve_index=False)
+
+    if file_type is SupportedFileTypes.CSV:
+        start = target.tell()
+
+        def write_csv(chunks: Iterable[pd.DataFrame]) -> int:
+            # the chunks start over if pyarrow rejects a later block, the rows written until then are dropped
+            target.seek(start)
+            target.truncate()
+            return write_row_groups(to_tables(chunks, schema), target, arrow_schema(schema), row_group_rows, compression)
+
+        return cr.consume_csv_chunks(data_io, write_csv, csv_engine, row_group_rows)
+    if file_type.is_excel:
+        # the schema of a sheet may be inferred from its first rows only (max_rows), the whole sheet is at hand here
+        df, _ = er.read_sheet(data_io, file_type.value, sheet_name)
+        sheet_schema = TableSchema.from_dataframe(df)
+        return write_row_groups(to_tables([df], sheet_schema), target, arrow_schema(sheet_schema), row_group_rows, compression)
+    raise ValueError(f"The item {file_name!r} is already a parquet file")
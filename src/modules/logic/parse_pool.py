@@ -0,0 +1,107 @@
+"""This modules holds the process pool that parses data product items outside of the streamlit script thread.
+pandas and openpyxl parsing holds the GIL, running it in worker processes lets a data product use all cores.
+Only the bytes of an item are sent to a worker and only the compact schema is sent back.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from src.modules.logic.data_reader import DataReader, TableSchema
+from typing import Optional
+import atexit
+import logging
+import multiprocessing
+import os
+import threading
+
+
+logger = logging.getLogger(__name__)
+
+# the pool is created once per process and shared by all sessions and reruns, so the workers stay warm
+_parse_pool: Optional[ProcessPoolExecutor] = None
+_parse_pool_workers = 0
+_parse_pool_lock = threading.Lock()
+
+
+def _warm_up() -> None:
+    """Initializer of every worker process, imports the parsing libraries before the first item arrives"""
+    import pandas  # noqa: F401
+    import pyarrow.parquet  # noqa: F401
+    import openpyxl  # noqa: F401
+
+
+def _ready() -> int:
+    return os.getpid()
+
+
+def get_parse_pool(max_workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """Returns the process wide parse pool, the pool is created and warmed up on the first call
+    (and again after a broken pool was reset). Later calls return the existing pool regardless of max_workers,
+    parse_pool_workers returns the number of workers it actually has.
+    The workers are started with forkserver (or spawn), forking the multi-threaded streamlit server is not safe.
+    """
+    global _parse_pool, _parse_pool_workers
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            max_workers = max_workers or os.cpu_count() or 1
+            start_methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context(
+                "forkserver" if "forkserver" in start_methods else "spawn"
+            )
+            _parse_pool = ProcessPoolExecutor(
+                max_workers, mp_context=context, initializer=_warm_up
+            )
+            # start all workers now instead of on the first data product
+            for future in [_parse_pool.submit(_ready) for _ in range(max_workers)]:
+                future.result()
+            _parse_pool_workers = max_workers
+            logger.info(f"Started parse pool with {max_workers} worker processes")
+            atexit.register(_shutdown_parse_pool)
+        return _parse_pool
+
+
+def parse_pool_workers() -> int:
+    """Returns the number of worker processes of the parse pool, 0 if there is no pool"""
+    with _parse_pool_lock:
+        return _parse_pool_workers if _parse_pool is not None else 0
+
+
+def reset_parse_pool(broken: ProcessPoolExecutor) -> None:
+    """Discards a broken parse pool (e.g. after a worker was killed for running out of memory),
+    the next get_parse_pool starts a new one. A pool that was already replaced is left alone.
+    """
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is broken:
+            logger.warning("The parse pool is broken, a new pool is started for the next data product")
+            _parse_pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def _shutdown_parse_pool() -> None:
+    """Stops the worker processes before the interpreter tears down the modules the pool relies on"""
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is not None:
+            _parse_pool.shutdown(wait=True)
+            _parse_pool = None
+
+
+def parse_table_schema(
+    file_name: str,
+    data: bytes,
+    sheet_name: Optional[str] = None,
+    reader_options: Optional[dict] = None,
+) -> TableSchema:
+    """Reads the schema of a data product item (or of one of its sheets), runs inside the worker processes"""
+    return DataReader(
+        file_name, data, schema_only=True, sheet_name=sheet_name, **(reader_options or {})
+    ).schema
+
+
+def parse_item_schemas(
+    file_name: str,
+    data: bytes,
+    sheet_names: list[Optional[str]],
+    reader_options: Optional[dict] = None,
+) -> list[TableSchema]:
+    """Reads the schemas of the given sheets of a data product item in one task, runs inside the worker processes.
+    The bytes of a workbook are sent to the worker once instead of once for every sheet"""
+    return [parse_table_schema(file_name, data, sheet_name, reader_options) for sheet_name in sheet_names]
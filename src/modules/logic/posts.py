@@ -1,11 +1,151 @@
 """This modules handles the parsing to the various APIS."""
 import requests
-from src.modules.logic.data_product_details import DataProductDetails
+from src.modules.logic.data_product_details import (
+    DataProductDetails,
+    DataProductDetailSampleDataTable,
+)
+from src.modules.logic.worker_pool import BoundedWorkerPool
+from src.modules.logic.resources import registry
+from src.modules.logic.telemetry import http_target, telemetry
+from src.modules.logic.concurrency import AdaptiveLimiter, controller
+from dataclasses import dataclass, field
+from typing import Any, Optional
+import gzip
+import json
 import logging
 
 
 logger = logging.getLogger(__name__)
 
+# status codes with which an endpoint tells us that it does not accept a list of items in one request,
+# other errors (e.g. 400 or 422 for invalid items) are raised instead of posting the items one by one
+BATCH_NOT_SUPPORTED_STATUS_CODES = {404, 405, 415}
+
+
+@dataclass
+class CatalogPoster:
+    """Data Class that posts catalog items (tables or columns) to one endpoint over a pooled session,
+    by default the process wide session of the endpoint's host.
+
+    With a batch_size above 1 the items are sent as gzip compressed JSON lists of batch_size items.
+    If the endpoint rejects the first batch, the poster falls back to posting every item on its own,
+    with at most max_concurrency requests in flight.
+    All requests also pass the adaptive limiter of the endpoint (shared by the process),
+    which lowers the requests in flight and retries them when the endpoint throttles.
+    """
+
+    endpoint_url: str
+    batch_size: int = 1
+    compress: bool = True
+    max_concurrency: int = 8
+    session: Optional[requests.Session] = field(default=None, repr=False)
+    limiter: Optional[AdaptiveLimiter] = field(default=None, repr=False)
+
+    def __post_init__(self):
+        if self.session is None:
+            self.session = registry.http_session(self.endpoint_url)
+        if self.limiter is None:
+            self.limiter = controller.limiter(http_target("POST", self.endpoint_url))
+        self.supports_batches = self.batch_size > 1
+
+    def post_items(self, items: list[dict[str, Any]]) -> None:
+        """Posts all items to the endpoint, batched if possible, otherwise concurrently one by one"""
+        if not items:
+            return
+        if self.supports_batches:
+            remaining = self._post_batches(items)
+            if not remaining:
+                return
+            items = remaining
+        self._post_concurrently(items)
+
+    def _post_batches(self, items: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """Helper Function that posts the items in batches, returns the items that still need to be posted
+        if the endpoint does not support batches"""
+        for start in range(0, len(items), self.batch_size):
+            batch = items[start : start + self.batch_size]
+            r = self._post_batch(batch)
+            if start == 0 and r.status_code in BATCH_NOT_SUPPORTED_STATUS_CODES:
+                logger.warning(
+                    f"Endpoint {self.endpoint_url!r} rejected a batch with status {r.status_code}, posting items one by one"
+                )
+                self.supports_batches = False
+                return items
+            r.raise_for_status()
+        return []
+
+    def _post_batch(self, batch: list[dict[str, Any]]) -> requests.Response:
+        """Helper Function that posts a list of items as one (optionally gzip compressed) JSON body"""
+        body = json.dumps(batch).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        if self.compress:
+            body = gzip.compress(body)
+            headers["Content-Encoding"] = "gzip"
+        return self.limiter.call(self._post, data=body, headers=headers)
+
+    def _post_concurrently(self, items: list[dict[str, Any]]) -> None:
+        """Helper Function that posts every item on its own, the first failing post cancels the remaining ones"""
+        with BoundedWorkerPool(self.max_concurrency) as pool:
+            for item in items:
+                pool.submit(self._post_item, item)
+            pool.wait()
+
+    def _post_item(self, item: dict[str, Any]) -> None:
+        self.limiter.call(self._post, json=item).raise_for_status()
+
+    def _post(self, **kwargs) -> requests.Response:
+        """Helper Function that sends one post to the endpoint and records its latency"""
+        with telemetry.timed_call(http_target("POST", self.endpoint_url)):
+            return self.session.post(self.endpoint_url, **kwargs)
+
+
+@dataclass
+class TablePublisher:
+    """Data Class that posts tables and their columns to the catalog on background threads,
+    so the posts of several tables overlap. Every table is posted before its columns.
+    The publisher is called with every table and must be waited for afterwards,
+    the first failing post fails the publisher and cancels the outstanding ones.
+    """
+
+    table_poster: CatalogPoster
+    column_poster: CatalogPoster
+    max_workers: int = 2
+
+    def __post_init__(self):
+        self.pool = BoundedWorkerPool(self.max_workers)
+
+    def __call__(self, table: DataProductDetailSampleDataTable) -> None:
+        self.pool.submit(self._publish, table)
+
+    def _publish(self, table: DataProductDetailSampleDataTable) -> None:
+        """Helper Function that posts the table before its columns"""
+        with telemetry.span("post_table", table.data_table_name):
+            self.table_poster.post_items([table.to_dict()])
+        with telemetry.span("post_columns", table.data_table_name, columns=len(table.columns)):
+            self.column_poster.post_items(table.columns.to_dicts())
+
+    def wait(self) -> None:
+        """Waits until all tables and columns are posted"""
+        self.pool.wait()
+        logger.info("Posting Done")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.pool.__exit__(exc_type, exc, tb)
+
+
+def _limited_post(endpoint_url: str, **kwargs) -> requests.Response:
+    """Helper Function that posts to an endpoint over its shared session, within the endpoint's adaptive limit"""
+    target = http_target("POST", endpoint_url)
+
+    def post() -> requests.Response:
+        with telemetry.timed_call(target):
+            return registry.http_session(endpoint_url).post(endpoint_url, **kwargs)
+
+    return controller.limiter(target).call(post)
+
 
 def post_data_product_details(
     dp_details: DataProductDetails, endpoint_url: str
@@ -16,7 +156,7 @@ def post_data_product_details(
     # get data product details to dict
     logger.info("Pushing Data Product Details in Data Shop Store")
     data = dp_details.to_dict()
-    r = requests.post(endpoint_url, json=data)
+    r = _limited_post(endpoint_url, json=data)
     try:
         r.raise_for_status()
     except requests.exceptions.HTTPError as e:
@@ -26,33 +166,49 @@ def post_data_product_details(
 
 
 def post_data_product_data_table_details(
-    dp_details: DataProductDetails, endpoint_url: str
+    dp_details: DataProductDetails,
+    endpoint_url: str,
+    poster: Optional[CatalogPoster] = None,
 ) -> None:
     """Posts the Data Product Data Details Table Information to the REST-API that handles
     the data product details"""
 
     # the tables are in the data_prodcut_detail_sample_data_table object
     logger.info("Pushing Data Product Table Details in Data Shop Store")
+    poster = poster or CatalogPoster(endpoint_url)
     tables = dp_details.data_product_detail_sample_data_table
-    for table in tables:
-        data = table.to_dict()
-        r = requests.post(endpoint_url, json=data)
-        r.raise_for_status()
+    poster.post_items([table.to_dict() for table in tables])
 
     logger.info("Posting Done")
 
 
 def post_data_product_data_column_details(
-    dp_details: DataProductDetails, endpoint_url: str
+    dp_details: DataProductDetails,
+    endpoint_url: str,
+    poster: Optional[CatalogPoster] = None,
 ) -> None:
     """Posts the Data Product Data Details ColumnInformation to the REST-API that handles
     the data product details"""
     # the columns are in the data_rpdocut_details_sample_data_column object
     logger.info("Pushing Data Product Column Details in Data Shop Store")
-    columns = dp_details.data_product_detail_sample_data_column
-    for column in columns:
-        data = column.to_dict()
-        r = requests.post(endpoint_url, json=data)
-        r.raise_for_status()
+    poster = poster or CatalogPoster(endpoint_url)
+    poster.post_items(dp_details.column_dicts())
 
     logger.info("Posting Done")
+
+
+def post_data_product_to_backend(
+    dp_details: DataProductDetails, endpoint_url: str, admin_pw: str
+) -> None:
+    """Posts the minimal data product information to the api back-end, which creates the data product there"""
+    dp_dict = dp_details.to_dict()
+    data_body = {
+        "name": dp_dict["name"],
+        "data_owner": dp_dict["information"]["data_owner"],
+        "schema_version": dp_dict["schema_version"],
+        "restriction_type": dp_dict["access_details"]["restriction_type"],
+        "data_product_id": dp_dict["id"],
+        "password": admin_pw,
+    }
+    logger.info("Start Posting to Backend API")
+    _limited_post(endpoint_url, data=data_body).raise_for_status()
@@ -0,0 +1,119 @@
+"""This modules holds the process wide registry of network clients.
+Streamlit runs the app script once per session and rerun, the registry makes sure the blob service client
+and the http sessions (with their connection pools) are created once per process and reused by all of them.
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+from urllib.parse import urlsplit
+from src.modules.logic.concurrency import THROTTLE_STATUS_CODES
+from src.modules.logic.lazy_import import lazy_import
+from src.modules.logic.telemetry import telemetry
+import functools
+import os
+import threading
+
+if TYPE_CHECKING:
+    from azure.storage.blob import BlobServiceClient
+
+# the clients are only imported when the first one is created
+azure_blob = lazy_import("azure.storage.blob")
+requests = lazy_import("requests")
+
+
+@functools.cache
+def _transient_error_retry() -> type:
+    """Helper Function that creates the retry policy class on first use, so the azure sdk is only imported then"""
+
+    class TransientErrorRetry(azure_blob.ExponentialRetry):
+        """The exponential retry of the azure sdk for connection errors, timeouts and server errors (500, 502, 504, ...),
+        throttled responses (429, 503) are not retried but raised, the adaptive limiter of the storage account retries them
+        """
+
+        def increment(self, settings, request, response=None, error=None) -> bool:
+            if response is not None and response.status_code in THROTTLE_STATUS_CODES:
+                return False
+            return super().increment(settings, request, response, error)
+
+    return TransientErrorRetry
+
+
+def blob_retry_policy(**kwargs):
+    """Returns the retry policy of the blob service clients, kwargs are the options of the sdk's ExponentialRetry"""
+    return _transient_error_retry()(**kwargs)
+
+
+def create_session(pool_size: int = 10) -> requests.Session:
+    """Creates a requests session that keeps up to pool_size connections per host open for reuse"""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+@dataclass
+class ResourceRegistry:
+    """Data Class that creates the blob service clients (one per connection string) and the http sessions
+    (one per endpoint host) on first use and hands out the same instances afterwards.
+    Both are safe to share between threads for the requests this application sends,
+    every session keeps up to pool_size connections open.
+    """
+
+    pool_size: int = 16
+
+    def __post_init__(self):
+        self._lock = threading.Lock()
+        self._blob_service_clients: dict[str, BlobServiceClient] = {}
+        self._http_sessions: dict[str, requests.Session] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def blob_service_client(self, connection_string: str) -> BlobServiceClient:
+        """Returns the shared blob service client of a storage account"""
+        return self._get_or_create(
+            self._blob_service_clients,
+            connection_string,
+            # the adaptive limiter of the storage account retries throttled requests, the sdk only retries the other
+            # transient errors, so throttling is neither hidden from the limiter nor retried by both
+            lambda: azure_blob.BlobServiceClient.from_connection_string(
+                connection_string, retry_policy=blob_retry_policy()
+            ),
+        )
+
+    def http_session(self, url: str) -> requests.Session:
+        """Returns the shared http session of the host of the url, all endpoints of a host share its connections"""
+        parts = urlsplit(url)
+        return self._get_or_create(
+            self._http_sessions,
+            f"{parts.scheme}://{parts.netloc}",
+            lambda: create_session(self.pool_size),
+        )
+
+    def _get_or_create(self, resources: dict, key: str, create):
+        """Helper Function that returns an existing resource or creates it while holding the lock"""
+        with self._lock:
+            resource = resources.get(key)
+            if resource is not None:
+                self.hits += 1
+                return resource
+            self.misses += 1
+            resource = create()
+            resources[key] = resource
+            return resource
+
+    def metrics(self) -> dict[str, int]:
+        """Returns the number of shared clients, the connection pool size and how often a client was reused"""
+        with self._lock:
+            return {
+                "blob_service_clients": len(self._blob_service_clients),
+                "http_sessions": len(self._http_sessions),
+                "http_pool_size": self.pool_size,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+# the process wide registry, shared by all streamlit sessions and threads
+registry = ResourceRegistry(pool_size=int(os.environ.get("HTTP_POOL_SIZE", 16)))
+telemetry.register_gauges("shared_resources", registry.metrics)
@@ -0,0 +1,138 @@
+"""This modules extracts a few sample rows of a data product item for the catalog without loading the whole table.
+csv files are streamed in chunks and sampled uniformly with reservoir sampling, parquet files only read their first
+row group and excel sheets only their first rows. The samples of all items of a data product share a byte budget.
+"""
+from __future__ import annotations
+import json
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import src.modules.logic.csv_reader as cr
+import src.modules.logic.excel_reader as er
+from dataclasses import dataclass
+from typing import IO, Hashable, Iterable, Optional
+
+
+DEFAULT_SAMPLE_ROWS = 10
+CSV_CHUNK_ROWS = 50_000
+
+
+def _json_rows(df: pd.DataFrame) -> list[list]:
+    """Helper Function that turns the rows of a dataframe into json compatible lists,
+    missing values become None and dates iso strings"""
+    return json.loads(df.to_json(orient="values", date_format="iso"))
+
+
+def _to_columns(columns: list[Hashable], rows: list[list]) -> dict[Hashable, list]:
+    return {column: [row[i] for row in rows] for i, column in enumerate(columns)}
+
+
+@dataclass
+class Reservoir:
+    """Data Class that samples n rows uniformly from dataframe chunks that are fed one by one,
+    only the sampled rows are held in memory"""
+
+    n: int
+    rng: Optional[np.random.Generator] = None
+
+    def __post_init__(self):
+        self.rng = self.rng or np.random.default_rng()
+        self.columns: Optional[list[Hashable]] = None
+        self.rows: list[list] = []
+        self.seen = 0
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        if self.columns is None:
+            self.columns = list(chunk.columns)
+        n = self.n
+        positions = np.arange(self.seen, self.seen + len(chunk))
+        self.seen += len(chunk)
+        # the first n rows fill the reservoir, every later row j replaces a random slot with probability n / (j + 1)
+        slots = np.where(positions < n, positions, self.rng.integers(0, positions + 1))
+        keep = slots < n
+        # a slot hit twice within the chunk keeps the later row
+        picked = dict(zip(slots[keep].tolist(), np.flatnonzero(keep).tolist()))
+        if not picked:
+            return
+        for slot, row in zip(picked, _json_rows(chunk.iloc[list(picked.values())])):
+            if slot < len(self.rows):
+                self.rows[slot] = row
+            else:
+                self.rows.append(row)
+
+    def sample(self) -> dict[Hashable, list]:
+        """Returns the sampled values per column"""
+        return _to_columns(self.columns or [], self.rows)
+
+
+def reservoir_sample(
+    chunks: Iterable[pd.DataFrame], n: int, rng: Optional[np.random.Generator] = None
+) -> dict[Hashable, list]:
+    """Samples n rows uniformly from a stream of dataframe chunks, holding only one chunk and the sample in memory.
+    Returns the sampled values per column.
+    """
+    reservoir = Reservoir(n, rng)
+    for chunk in chunks:
+        reservoir.update(chunk)
+    return reservoir.sample()
+
+
+def sample_csv(data_io: IO[bytes], n: int, csv_engine: str = "pandas") -> dict[Hashable, list]:
+    """Samples n rows of a csv file, the file is streamed in chunks of CSV_CHUNK_ROWS rows"""
+    return cr.consume_csv_chunks(
+        data_io, lambda chunks: reservoir_sample(chunks, n), csv_engine, CSV_CHUNK_ROWS
+    )
+
+
+def sample_parquet(data_io: IO[bytes], n: int) -> dict[Hashable, list]:
+    """Returns the first n rows of a parquet file, only the first row group is read"""
+    parquet_file = pq.ParquetFile(data_io)
+    columns = list(parquet_file.schema_arrow.names)
+    if parquet_file.metadata.num_row_groups == 0:
+        return _to_columns(columns, [])
+    batch = next(parquet_file.iter_batches(batch_size=n, row_groups=[0]), None)
+    if batch is None:
+        return _to_columns(columns, [])
+    df = batch.to_pandas()
+    return _to_columns(list(df.columns), _json_rows(df))
+
+
+def sample_excel(
+    data_io: IO[bytes], n: int, file_type: str, sheet_name: Optional[str] = None
+) -> dict[Hashable, list]:
+    """Returns the first n rows of an excel sheet, no further rows are read"""
+    df, _ = er.read_sheet(data_io, file_type, sheet_name, max_rows=n)
+    return _to_columns(list(df.columns), _json_rows(df))
+
+
+@dataclass
+class SampleBudget:
+    """Data Class that caps the size of the sample data of a data product at max_bytes (measured as json).
+    Tables take their share in the order they are fitted, every table keeps as many of its sample rows as fit
+    into the remaining budget, later tables get fewer or no rows once it is used up.
+    """
+
+    max_bytes: int
+
+    def __post_init__(self):
+        self.used = 0
+
+    @property
+    def remaining(self) -> int:
+        return max(self.max_bytes - self.used, 0)
+
+    def fit(self, samples: dict[Hashable, list]) -> dict[Hashable, list]:
+        """Returns the samples cut to the rows that fit into the remaining budget and charges them to the budget"""
+        num_rows = max((len(values) for values in samples.values()), default=0)
+        rows = 0
+        size = 0
+        for i in range(num_rows):
+            row_size = len(json.dumps([values[i] for values in samples.values()]))
+            if size + row_size > self.remaining:
+                break
+            size += row_size
+            rows += 1
+        self.used += size
+        if rows == 0:
+            return {}
+        return {column: values[:rows] for column, values in samples.items()}
@@ -0,0 +1,58 @@
+"""This modules handles data products that are already staged in a blob container (e.g. a landing container),
+instead of being uploaded as a zip file. The items are copied server-side into the data products container,
+the app only downloads the ranges of the items its readers need to infer the schemas.
+"""
+from dataclasses import dataclass,field
+from typing import IO
+from src.modules.logic.blob_storage import BlobStorage
+import src.modules.logic.zip_handler as zh
+
+
+@dataclass
+class StagedProduct:
+    """Data Class that lists and checks the items under a prefix of a staging container,
+    it offers the same item operations as the ZipHandler, so register_product can process it in its place.
+    Like in the zip file, the prefix must directly contain the data product items, no further folders.
+    """
+    staging: BlobStorage = field(repr=False)
+    prefix: str
+    max_memory: int = field(default=zh.DEFAULT_SPOOL_SIZE,repr=False)
+    max_item_size: int = field(default=zh.DEFAULT_MAX_ITEM_SIZE,repr=False)
+
+    def __post_init__(self):
+        self.prefix = self.prefix.strip("/")
+        blobs = self.staging.list_blobs(f"{self.prefix}/")
+        if not blobs:
+            raise ValueError(f"The staging container holds no data under {self.prefix!r}!")
+
+        self.item_sizes: dict[str,int] = {}
+        self.estimate = zh.IngestEstimate()
+        for blob_name,size in blobs.items():
+            item_name = blob_name[len(self.prefix) + 1:]
+            if "/" in item_name:
+                raise ValueError(f"The staged data product {self.prefix!r} must only contain files, found the folder in {blob_name!r}")
+            # staged items are not compressed, only the file type and the size are checked
+            file_type = zh.check_item(blob_name,size,size,self.max_item_size)
+            self.estimate.add(file_type,size,size)
+            self.item_sizes[item_name] = size
+        self.data_product_items = list(self.item_sizes)
+        self.data_product_name = self.prefix.split("/")[-1]
+
+    @property
+    def size(self)->int:
+        """Returns the size of all items in bytes"""
+        return sum(self.item_sizes.values())
+
+    def item_size(self,item_name:str)->int:
+        return self.item_sizes[item_name]
+
+    def open_dp_item(self,item_name:str)->IO[bytes]:
+        """Opens a staged item as a seekable file object, only the ranges that are read are downloaded"""
+        return self.staging.open_blob(f"{self.prefix}/{item_name}",self.item_sizes[item_name])
+
+    # ranged reads allow random access without any copy
+    open_seekable_dp_item = open_dp_item
+
+    def copy_dp_item(self,item_name:str,blob_name:str,blob_handler:BlobStorage)->None:
+        """Copies a staged item server-side to the blob_name in the container of the blob_handler"""
+        blob_handler.copy_from_url(self.staging.blob_url(f"{self.prefix}/{item_name}"),blob_name)
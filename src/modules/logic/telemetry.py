@@ -0,0 +1,276 @@
+"""This modules records how long the stages of a registration take and how much data they move.
+Every stage (zip, parse, upload, post) and every data product item runs inside a span that carries its bytes, rows,
+columns, duration and throughput. Finished spans are written as one JSON log line each and aggregated into
+latency histograms, which are served in the prometheus text format by an optional metrics endpoint.
+Only the standard library is used, so the module can be imported without slowing down the first page.
+"""
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Iterator, Optional
+from urllib.parse import urlsplit
+import bisect
+import json
+import logging
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+# upper bounds in seconds, covering a single catalog post up to the upload of a large item
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+
+@dataclass
+class Span:
+    """Data Class that holds the measurements of one stage, 'name' identifies the item (e.g. the table name).
+    bytes, rows and columns are filled in by the code running inside the span, as far as it knows them.
+    """
+
+    stage: str
+    name: Optional[str] = None
+    bytes: Optional[int] = None
+    rows: Optional[int] = None
+    columns: Optional[int] = None
+    status: str = "ok"
+    start: float = field(default_factory=time.perf_counter, repr=False)
+    duration: Optional[float] = None
+
+    def set(self, **measurements) -> None:
+        """Sets bytes, rows or columns once the code inside the span knows them"""
+        for key, value in measurements.items():
+            if key not in ("bytes", "rows", "columns"):
+                raise ValueError(f"Unknown span measurement {key!r}")
+            setattr(self, key, value)
+
+    def finish(self) -> None:
+        if self.duration is None:
+            self.duration = time.perf_counter() - self.start
+
+    @property
+    def mb_per_s(self) -> Optional[float]:
+        """Returns the throughput in megabytes per second, None if the bytes or the duration are unknown"""
+        if self.bytes is None or not self.duration:
+            return None
+        return self.bytes / self.duration / 1_000_000
+
+    def to_dict(self) -> dict:
+        span = {
+            "stage": self.stage,
+            "name": self.name,
+            "status": self.status,
+            "duration": round(self.duration, 6) if self.duration is not None else None,
+            "bytes": self.bytes,
+            "rows": self.rows,
+            "columns": self.columns,
+            "mb_per_s": round(self.mb_per_s, 3) if self.mb_per_s is not None else None,
+        }
+        return {key: value for key, value in span.items() if value is not None}
+
+
+@dataclass
+class Histogram:
+    """Data Class that counts observations into cumulative buckets like a prometheus histogram"""
+
+    buckets: tuple[float, ...] = DEFAULT_BUCKETS
+
+    def __post_init__(self):
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative_counts(self) -> list[int]:
+        """Returns the number of observations at or below every bucket bound"""
+        counts, total = [], 0
+        for count in self.counts:
+            total += count
+            counts.append(total)
+        return counts
+
+
+def http_target(method: str, url: str) -> str:
+    """Returns the target name of an http call, the query string is left out so secrets and ids do not end up in labels"""
+    parts = urlsplit(url)
+    return f"{method} {parts.netloc}{parts.path}"
+
+
+def _labels(labels: tuple[tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in labels
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+@dataclass
+class Telemetry:
+    """Data Class that collects the spans of all registrations of the process and the latencies of external calls.
+
+    Stage durations are aggregated per stage (item names would make the metrics unbounded, they are only logged),
+    external calls per target, e.g. "blob.stage_block" or the host and path of a catalog endpoint.
+    Other components can add their own gauges with register_gauges, they are read on every scrape.
+    """
+
+    buckets: tuple[float, ...] = DEFAULT_BUCKETS
+
+    def __post_init__(self):
+        self._lock = threading.Lock()
+        self._histograms: dict[tuple[str, tuple], Histogram] = {}
+        self._counters: dict[tuple[str, tuple], float] = {}
+        self._gauges: dict[str, Callable[[], dict]] = {}
+
+    @contextmanager
+    def span(self, stage: str, name: Optional[str] = None, **measurements) -> Iterator[Span]:
+        """Measures the code inside the with block as a span of the given stage,
+        a raised exception marks the span as failed and is passed on
+        """
+        span = Span(stage, name)
+        span.set(**measurements)
+        try:
+            yield span
+        except BaseException:
+            span.status = "error"
+            raise
+        finally:
+            self.record(span)
+
+    def record(self, span: Span) -> None:
+        """Finishes a span, logs it and adds it to the stage metrics"""
+        span.finish()
+        logger.info(json.dumps({"span": span.to_dict()}))
+        labels = (("stage", span.stage), ("status", span.status))
+        with self._lock:
+            self._observe("registration_stage_duration_seconds", labels, span.duration)
+            for measurement in ("bytes", "rows"):
+                value = getattr(span, measurement)
+                if value is not None:
+                    self._increment(f"registration_stage_{measurement}_total", labels, value)
+
+    def observe_call(self, target: str, seconds: float, status: str = "ok") -> None:
+        """Adds the latency of one call to an external service (blob storage, catalog, backend)"""
+        with self._lock:
+            self._observe(
+                "external_call_duration_seconds", (("target", target), ("status", status)), seconds
+            )
+
+    @contextmanager
+    def timed_call(self, target: str) -> Iterator[None]:
+        """Measures the call to an external service inside the with block"""
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            yield
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            self.observe_call(target, time.perf_counter() - start, status)
+
+    def register_gauges(self, prefix: str, collect: Callable[[], dict]) -> None:
+        """Registers a function whose values are exported as gauges named '<prefix>_<key>',
+        a key can also be a (name, labels) tuple to export the same gauge for several label values"""
+        with self._lock:
+            self._gauges[prefix] = collect
+
+    def _observe(self, metric: str, labels: tuple, value: float) -> None:
+        histogram = self._histograms.get((metric, labels))
+        if histogram is None:
+            histogram = self._histograms[(metric, labels)] = Histogram(self.buckets)
+        histogram.observe(value)
+
+    def _increment(self, metric: str, labels: tuple, value: float) -> None:
+        self._counters[(metric, labels)] = self._counters.get((metric, labels), 0) + value
+
+    def histogram(self, metric: str, **labels) -> Optional[Histogram]:
+        """Returns the histogram of a metric for the given labels, None if nothing was observed yet"""
+        with self._lock:
+            return self._histograms.get((metric, tuple(labels.items())))
+
+    def render(self) -> str:
+        """Returns all metrics in the prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            typed = set()
+            for (metric, labels), histogram in sorted(self._histograms.items()):
+                if metric not in typed:
+                    lines.append(f"# TYPE {metric} histogram")
+                    typed.add(metric)
+                for bound, count in zip(histogram.buckets, histogram.cumulative_counts()):
+                    lines.append(f"{metric}_bucket{_labels(labels + (('le', str(bound)),))} {count}")
+                lines.append(f"{metric}_bucket{_labels(labels + (('le', '+Inf'),))} {histogram.count}")
+                lines.append(f"{metric}_sum{_labels(labels)} {histogram.sum}")
+                lines.append(f"{metric}_count{_labels(labels)} {histogram.count}")
+            for (metric, labels), value in sorted(self._counters.items()):
+                if metric not in typed:
+                    lines.append(f"# TYPE {metric} counter")
+                    typed.add(metric)
+                lines.append(f"{metric}{_labels(labels)} {value}")
+            gauges = list(self._gauges.items())
+
+        for prefix, collect in gauges:
+            for key, value in collect().items():
+                name, labels = key if isinstance(key, tuple) else (key, ())
+                metric = f"{prefix}_{name}"
+                if metric not in typed:
+                    lines.append(f"# TYPE {metric} gauge")
+                    typed.add(metric)
+                lines.append(f"{metric}{_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.server.telemetry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class MetricsServer(ThreadingHTTPServer):
+    """Serves the metrics of a Telemetry object under /metrics on a background thread"""
+
+    daemon_threads = True
+
+    def __init__(self, telemetry: Telemetry, port: int, host: str = "0.0.0.0"):
+        super().__init__((host, port), _MetricsHandler)
+        self.telemetry = telemetry
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+# the process wide telemetry and metrics endpoint, shared by all streamlit sessions and threads
+telemetry = Telemetry()
+_metrics_server: Optional[MetricsServer] = None
+_metrics_server_lock = threading.Lock()
+
+
+def start_metrics_server(port: int, host: str = "0.0.0.0") -> MetricsServer:
+    """Starts the process wide metrics endpoint on the first call, later calls (e.g. streamlit reruns) return it"""
+    global _metrics_server
+    with _metrics_server_lock:
+        if _metrics_server is None:
+            _metrics_server = MetricsServer(telemetry, port, host)
+            logger.info(f"Serving metrics on {host}:{_metrics_server.server_address[1]}/metrics")
+        return _metrics_server
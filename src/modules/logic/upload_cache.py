@@ -0,0 +1,84 @@
+"""This modules memoises the parsed tables of a data product upload,
+streamlit reruns the whole script on every widget interaction and would otherwise re-open and re-parse the same zip file.
+Only the parsing is memoised, the items are uploaded on every registration: a failed registration deletes its blobs again
+and a successful one is not registered twice.
+"""
+from __future__ import annotations
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import IO, MutableMapping, Optional
+from src.modules.logic.data_product_details import DataProductDetailSampleDataTable
+import hashlib
+import logging
+import pickle
+
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass
+class CachedRegistration:
+    """Data Class that holds the parsed tables of an upload"""
+
+    tables: list[DataProductDetailSampleDataTable] = field(repr=False)
+    size: int
+
+    def reuse(self, data_product_id: str) -> list[DataProductDetailSampleDataTable]:
+        """Returns the tables attached to the current data product, its id changes on every rerun.
+        The tables and columns get new ids, so a retried registration does not post the ids of an earlier attempt again"""
+        for table in self.tables:
+            table.parent_id = data_product_id
+            table.renew_ids()
+        return self.tables
+
+
+@dataclass
+class UploadCache:
+    """Data Class that keeps the registrations of the latest uploads in a mapping, e.g. st.session_state.
+    The entries are keyed by the content hash of the upload and the data product name,
+    the least recently used entries are evicted once the entries together exceed max_bytes.
+    """
+
+    store: MutableMapping = field(repr=False)
+    max_bytes: int = 64 * 1024 * 1024
+    store_key: str = "upload_cache"
+
+    def __post_init__(self):
+        if self.store_key not in self.store:
+            self.store[self.store_key] = OrderedDict()
+        self.entries: OrderedDict[str, CachedRegistration] = self.store[self.store_key]
+
+    @staticmethod
+    def cache_key(file: IO[bytes], data_product_name: str) -> str:
+        """Hashes the content of the upload together with the data product name, the file position is reset afterwards"""
+        digest = hashlib.blake2b(digest_size=16)
+        file.seek(0)
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+        file.seek(0)
+        digest.update(data_product_name.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[CachedRegistration]:
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            logger.info(f"Reusing the registration of upload {key}")
+        return entry
+
+    def put(self, key: str, tables: list[DataProductDetailSampleDataTable]) -> CachedRegistration:
+        """Stores the tables of an upload and evicts the least recently used entries if the cache is too big"""
+        entry = CachedRegistration(tables, size=len(pickle.dumps(tables)))
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > 1 and self.size > self.max_bytes:
+            evicted_key, _ = self.entries.popitem(last=False)
+            logger.info(f"Evicted the registration of upload {evicted_key} from the cache")
+        return entry
+
+    @property
+    def size(self) -> int:
+        """Returns the approximate size of all entries in bytes"""
+        return sum(entry.size for entry in self.entries.values())
@@ -0,0 +1,73 @@
+"""This modules holds a bounded thread pool that is used to overlap network I/O,
+e.g. uploading data product items to the blob storage while the next item is read.
+"""
+from concurrent.futures import FIRST_COMPLETED, FIRST_EXCEPTION, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BoundedWorkerPool:
+    """Data Class that runs submitted functions on a fixed number of worker threads.
+    At most 'max_pending' functions are queued or running at the same time, 'submit' blocks until a slot is free,
+    so the arguments of the functions (e.g. bytes) do not pile up in memory.
+
+    Error semantics: the first failing function fails the whole pool, all outstanding functions are cancelled
+    and the exception is re-raised by 'submit' or 'wait'.
+    """
+
+    max_workers: int = 4
+    max_pending: Optional[int] = None
+
+    def __post_init__(self):
+        if self.max_workers < 1:
+            raise ValueError(f"max_workers must be at least 1, received {self.max_workers}")
+        if self.max_pending is None:
+            self.max_pending = 2 * self.max_workers
+        self.executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="dp-worker")
+        self.futures: list[Future] = []
+        self._pending: set[Future] = set()
+
+    def submit(self, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        """Submits a function to the pool, blocks while the pool is full and raises
+        as soon as an already finished function failed"""
+        while len(self._pending) >= self.max_pending:
+            done, self._pending = wait(self._pending, return_when=FIRST_COMPLETED)
+            self._raise_first_error(done)
+        future = self.executor.submit(fn, *args, **kwargs)
+        self.futures.append(future)
+        self._pending.add(future)
+        return future
+
+    def wait(self) -> list[Any]:
+        """Waits for all submitted functions and returns their results in submission order"""
+        done, self._pending = wait(self._pending, return_when=FIRST_EXCEPTION)
+        self._raise_first_error(done)
+        return [future.result() for future in self.futures]
+
+    def cancel(self) -> None:
+        """Cancels all functions that have not started yet, running functions are finished"""
+        for future in self._pending:
+            future.cancel()
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+    def _raise_first_error(self, done: set[Future]) -> None:
+        """Helper Function that cancels the outstanding functions and re-raises the first error"""
+        for future in done:
+            if not future.cancelled() and future.exception() is not None:
+                logger.error(f"A worker failed, cancelling {len(self._pending)} outstanding tasks")
+                self.cancel()
+                raise future.exception()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.cancel()
+        else:
+            self.executor.shutdown(wait=True)
@@ -1,9 +1,134 @@
 """This modules handles the operations the zipfile that hold the data product information"""
 from dataclasses import dataclass,field
 from streamlit.runtime.uploaded_file_manager import UploadedFile
+from src.modules.logic.lazy_import import lazy_import
+import io
+import mmap
+import os
+import shutil
+import struct
+import tempfile
 import zipfile 
 import json 
-from typing import Iterator
+from typing import IO, Iterator, Optional
+
+pa = lazy_import("pyarrow")
+dr = lazy_import("src.modules.logic.data_reader")
+
+# items (and non seekable uploads) larger than this are written to a temporary file instead of being held in memory
+DEFAULT_SPOOL_SIZE = int(os.environ.get("SPOOL_SIZE_MB", 64)) * 1024 * 1024
+COPY_CHUNK_SIZE = 1024 * 1024
+# fixed part of a local file header: signature, versions, flags, method, time, date, crc, sizes and the two name lengths
+_LOCAL_HEADER = struct.Struct("<4s5H3L2H")
+# the pre-flight rejects items that decompress to more than MAX_ITEM_SIZE_MB
+# or whose uncompressed size exceeds MAX_COMPRESSION_RATIO times their compressed size (zip bombs)
+DEFAULT_MAX_ITEM_SIZE = int(os.environ.get("MAX_ITEM_SIZE_MB", 4096)) * 1024 * 1024
+DEFAULT_MAX_COMPRESSION_RATIO = float(os.environ.get("MAX_COMPRESSION_RATIO", 100))
+# many items that each stay below the limits can still add up, all items together may decompress to MAX_TOTAL_SIZE_MB
+DEFAULT_MAX_TOTAL_SIZE = int(os.environ.get("MAX_TOTAL_SIZE_MB", 16384)) * 1024 * 1024
+# small items may compress very well without being a threat, their ratio is not checked
+MIN_RATIO_CHECK_SIZE = 1024 * 1024
+# rough parse and upload throughput per file type in megabytes per second, used to estimate the processing time
+ESTIMATED_MB_PER_S = {"parquet": 200.0, "csv": 40.0, "xls": 4.0, "xlsx": 4.0, "xlsm": 4.0}
+
+
+@dataclass
+class IngestEstimate:
+    """Data Class that holds the expected cost of registering a data product, derived from the zip's central directory only"""
+    members: int = 0
+    compressed_bytes: int = 0
+    uncompressed_bytes: int = 0
+    seconds: float = 0.0
+
+    def add(self,file_type:str,compressed_size:int,file_size:int)->None:
+        """Adds the cost of one data product item"""
+        self.members += 1
+        self.compressed_bytes += compressed_size
+        self.uncompressed_bytes += file_size
+        self.seconds += file_size / 1_000_000 / ESTIMATED_MB_PER_S.get(file_type,ESTIMATED_MB_PER_S["csv"])
+
+    def __str__(self)->str:
+        return (
+            f"{self.members:,} data product items, {self.compressed_bytes / 1_000_000:,.1f} MB compressed, "
+            f"{self.uncompressed_bytes / 1_000_000:,.1f} MB uncompressed, expected processing time about {self.seconds:,.0f} s"
+        )
+
+
+def check_item(
+    file_name:str,
+    file_size:int,
+    compressed_size:int,
+    max_item_size:int=DEFAULT_MAX_ITEM_SIZE,
+    max_compression_ratio:float=DEFAULT_MAX_COMPRESSION_RATIO,
+)->str:
+    """Raises a ValueError for items of unsupported file types, items larger than max_item_size
+    and items with a compression ratio above max_compression_ratio. Returns the file type of the item
+    """
+    file_type = file_name.split("/")[-1].split(".")[-1].lower()
+    try:
+        dr.SupportedFileTypes.get_enum_member(file_type)
+    except ValueError:
+        raise ValueError(f"The item {file_name!r} has the unsupported file type {file_type!r}, supported are: {list(ESTIMATED_MB_PER_S)}")
+    if file_size > max_item_size:
+        raise ValueError(f"The item {file_name!r} is {file_size / 1_000_000:,.1f} MB uncompressed, the limit is {max_item_size / 1_000_000:,.1f} MB")
+    if file_size >= MIN_RATIO_CHECK_SIZE and file_size > max_compression_ratio * max(compressed_size,1):
+        raise ValueError(f"The item {file_name!r} has a suspicious compression ratio of {file_size / max(compressed_size,1):,.0f}, the limit is {max_compression_ratio:,.0f}")
+    return file_type
+
+
+def preflight(
+    zip_file:zipfile.ZipFile,
+    max_item_size:int=DEFAULT_MAX_ITEM_SIZE,
+    max_compression_ratio:float=DEFAULT_MAX_COMPRESSION_RATIO,
+    max_total_size:int=DEFAULT_MAX_TOTAL_SIZE,
+)->IngestEstimate:
+    """Checks every item of a zip file against its central directory entry before anything is decompressed (see check_item),
+    the declared sizes can be trusted, zipfile never decompresses more than them.
+    Directory entries are no data product items and are skipped. Raises a ValueError once all items together
+    decompress to more than max_total_size. Returns the estimated cost of processing the items.
+    """
+    estimate = IngestEstimate()
+    for info in _file_infos(zip_file):
+        file_type = check_item(info.filename,info.file_size,info.compress_size,max_item_size,max_compression_ratio)
+        estimate.add(file_type,info.compress_size,info.file_size)
+        if estimate.uncompressed_bytes > max_total_size:
+            raise ValueError(f"The items decompress to more than {max_total_size / 1_000_000:,.1f} MB, which is the limit for a data product")
+    return estimate
+
+
+def _file_infos(zip_file:zipfile.ZipFile)->list[zipfile.ZipInfo]:
+    """Helper Function that returns the central directory entries of all files, without the directory entries"""
+    return [info for info in zip_file.infolist() if not info.is_dir()]
+
+
+def spool(stream:IO[bytes],size:Optional[int]=None,max_memory:int=DEFAULT_SPOOL_SIZE)->IO[bytes]:
+    """Copies a stream chunk by chunk into a seekable file positioned at the start.
+    Up to max_memory bytes are kept in memory, larger (or unknown) sizes go to a temporary file on disk
+    which is removed when it is closed.
+    """
+    target = io.BytesIO() if size is not None and size <= max_memory else tempfile.TemporaryFile()
+    shutil.copyfileobj(stream,target,COPY_CHUNK_SIZE)
+    target.seek(0)
+    return target
+
+
+def _map_file(file:IO[bytes]):
+    """Helper Function that returns the content of a file as a buffer without copying it,
+    in-memory files share their bytes and files on disk are memory-mapped, None for everything else
+    """
+    if isinstance(file,io.BytesIO):
+        # getvalue shares the bytes with the BytesIO (which copies them on its next write) instead of exporting its buffer,
+        # an exported buffer would make close(), truncate() and writes of the upload raise BufferError while it is mapped
+        return file.getvalue()
+    try:
+        fileno = file.fileno()
+    except (AttributeError,OSError,io.UnsupportedOperation):
+        return None
+    try:
+        return mmap.mmap(fileno,0,access=mmap.ACCESS_READ)
+    except (OSError,ValueError):
+        # e.g. pipes or empty files
+        return None
 
 
 
@@ -14,17 +139,47 @@ class ZipHandler:
     """
     uploaded_file: UploadedFile = field(repr=False)
     data_product_name: str
+    max_memory: int = field(default=DEFAULT_SPOOL_SIZE,repr=False)
+    max_item_size: int = field(default=DEFAULT_MAX_ITEM_SIZE,repr=False)
+    max_compression_ratio: float = field(default=DEFAULT_MAX_COMPRESSION_RATIO,repr=False)
+    max_total_size: int = field(default=DEFAULT_MAX_TOTAL_SIZE,repr=False)
+
+    @classmethod
+    def preflight(
+        cls,
+        uploaded_file:UploadedFile,
+        max_item_size:int=DEFAULT_MAX_ITEM_SIZE,
+        max_compression_ratio:float=DEFAULT_MAX_COMPRESSION_RATIO,
+        max_total_size:int=DEFAULT_MAX_TOTAL_SIZE,
+    )->IngestEstimate:
+        """Checks an uploaded zip file from its central directory only (see preflight), before a ZipHandler is created for it.
+        Raises a ValueError for uploads that are no zip file or cannot be registered, the upload is rewound afterwards
+        """
+        try:
+            with zipfile.ZipFile(uploaded_file,'r') as zip_file:
+                return preflight(zip_file,max_item_size,max_compression_ratio,max_total_size)
+        except zipfile.BadZipFile as e:
+            raise ValueError(f"The uploaded file is no valid ZipFile: {e}") from e
+        finally:
+            uploaded_file.seek(0)
 
     def __post_init__(self):
+        # zipfile needs random access, streams that cannot seek are spooled (to disk above max_memory) first
+        if not self.uploaded_file.seekable():
+            self.uploaded_file = spool(self.uploaded_file,max_memory=self.max_memory)
+        self._mapped_file = None
+
         # open file and store information 
         self.zip_file = zipfile.ZipFile(self.uploaded_file,'r')
-        self.items = self.zip_file.namelist()
+        # directory entries (e.g. "sales/" written by most zip tools) hold no data, like in the preflight
+        self.items = [info.filename for info in _file_infos(self.zip_file)]
         if len(self.items) < 1:
             # we have an empty zipfile
             raise ValueError('The provided zipFile contains no data!')
         
         # check if the structure is okay 
         self._ensure_structural_integrity()
+        self.estimate = preflight(self.zip_file,self.max_item_size,self.max_compression_ratio,self.max_total_size)
 
         self.data_product_name = self._get_dp_name()
         self.data_product_items = self._get_dp_items()
@@ -38,6 +193,48 @@ class ZipHandler:
         for path,item_name in zip(self.items,self.data_product_items):
             yield self.zip_file.read(path),item_name
 
+    def open_dp_item(self,item_name:str)->IO[bytes]:
+        """Opens a single data product item as a file-like object that decompresses the data while it is read,
+        the item is never held in memory as a whole
+        """
+        path = self.items[self.data_product_items.index(item_name)]
+        return self.zip_file.open(path,'r')
+
+    def open_seekable_dp_item(self,item_name:str)->IO[bytes]:
+        """Opens a data product item for random access, e.g. for the footer of a parquet file or the parts of an excel file.
+        Uncompressed items are read straight from the buffer (or memory map) of the zip without any copy,
+        compressed items are decompressed into memory, or into a temporary file if they are larger than max_memory.
+        """
+        mapped = self.map_dp_item(item_name)
+        if mapped is not None:
+            return mapped
+        with self.open_dp_item(item_name) as item:
+            return spool(item,self.item_size(item_name),self.max_memory)
+
+    def map_dp_item(self,item_name:str)->Optional[IO[bytes]]:
+        """Returns a zero-copy reader over an uncompressed (stored) data product item,
+        None if the item is compressed or encrypted or the zip is neither in memory nor on disk
+        """
+        info = self.zip_file.getinfo(self.items[self.data_product_items.index(item_name)])
+        if info.compress_type != zipfile.ZIP_STORED or info.flag_bits & 0x1:
+            return None
+        if self._mapped_file is None:
+            self._mapped_file = _map_file(self.uploaded_file)
+            if self._mapped_file is None:
+                return None
+        buffer = pa.py_buffer(self._mapped_file)
+
+        # the data starts after the local header, whose name and extra field lengths may differ from the central directory
+        header = _LOCAL_HEADER.unpack(buffer[info.header_offset:info.header_offset + _LOCAL_HEADER.size].to_pybytes())
+        name_length,extra_length = header[-2:]
+        start = info.header_offset + _LOCAL_HEADER.size + name_length + extra_length
+        return pa.BufferReader(buffer.slice(start,info.file_size))
+
+    def item_size(self,item_name:str)->int:
+        """Returns the uncompressed size of a data product item in bytes, read from the central directory of the zip"""
+        path = self.items[self.data_product_items.index(item_name)]
+        return self.zip_file.getinfo(path).file_size
+
 
 
 
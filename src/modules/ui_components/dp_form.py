@@ -1,12 +1,37 @@
 """This modules holds all functions and components that make up the 
 data product registration form
 """
+from __future__ import annotations
 import streamlit as st
-import src.modules.logic.data_reader as dr
-import src.modules.logic.data_product_details as dp
+import logging
+import tempfile
+from collections import deque
+from concurrent.futures import Executor, Future
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from typing import IO, Callable, Iterator, Optional
 from streamlit.runtime.uploaded_file_manager import UploadedFile
-import src.modules.logic.zip_handler as zh
-import src.modules.logic.blob_storage as bs
+from src.modules.logic.lazy_import import lazy_import
+
+# the logic modules pull in pandas, pyarrow, openpyxl and azure, they are loaded on first use
+# so the form renders without waiting for them
+dr = lazy_import("src.modules.logic.data_reader")
+dp = lazy_import("src.modules.logic.data_product_details")
+zh = lazy_import("src.modules.logic.zip_handler")
+bs = lazy_import("src.modules.logic.blob_storage")
+wp = lazy_import("src.modules.logic.worker_pool")
+pp = lazy_import("src.modules.logic.parse_pool")
+uc = lazy_import("src.modules.logic.upload_cache")
+sr = lazy_import("src.modules.logic.sample_reader")
+tm = lazy_import("src.modules.logic.telemetry")
+pt = lazy_import("src.modules.logic.parquet_transcoder")
+sp = lazy_import("src.modules.logic.staged_product")
+
+logger = logging.getLogger(__name__)
+
+# staged csv items are read in ranges from the staging container, their schema inference stops once the dtypes
+# did not change for that many chunks (unless the reader_options set their own stable_chunks)
+STAGED_STABLE_CHUNKS = 2
 
 
 def data_product_form(blob_handler: bs.BlobStorage) -> dp.DataProductDetails:
@@ -158,62 +183,535 @@ def upload_data_product() -> UploadedFile:
     if zip_file is None:
         st.stop()
 
+    # the central directory is checked before the registration starts, a bad upload is rejected right away
+    try:
+        estimate = zh.ZipHandler.preflight(zip_file)
+    except ValueError as e:
+        st.error(f"The uploaded ZipFile cannot be registered: {e}")
+        st.stop()
+    st.info(f"The upload contains {estimate}")
+
     return zip_file
 
 
+def select_data_product(staging: Optional[bs.BlobStorage] = None) -> UploadedFile | sp.StagedProduct:
+    """Function that lets the user choose between uploading a zip file and a data product staged in the staging container,
+    without a staging container the zip file upload is the only source"""
+    if staging is None:
+        return upload_data_product()
+    source = st.radio(
+        "Data Product Source",
+        ["Upload a ZipFile", "Staged in the landing container"],
+        horizontal=True,
+        help="Large Data Products can be staged in the landing container and are then copied without passing through the browser",
+    )
+    if source == "Upload a ZipFile":
+        return upload_data_product()
+
+    prefix = st.text_input(
+        "Staged Folder",
+        placeholder="e.g., landing/sales",
+        help=f"The folder in the container {staging.container_name!r} that directly contains all data product items",
+    )
+    if not prefix:
+        st.stop()
+    try:
+        staged_product = sp.StagedProduct(staging, prefix)
+    except ValueError as e:
+        st.error(f"The staged Data Product cannot be registered: {e}")
+        st.stop()
+    st.info(f"The staged folder contains {staged_product.estimate}")
+    return staged_product
+
+
 def register_product(
-    file: UploadedFile, data_product_details: dp.DataProductDetails, blob_handler
+    file: UploadedFile | sp.StagedProduct,
+    data_product_details: dp.DataProductDetails,
+    blob_handler,
+    stream_upload: bool = False,
+    max_workers: int = 1,
+    max_concurrency: int = 1,
+    parse_workers: int = 0,
+    reader_options: Optional[dict] = None,
+    cache: Optional[uc.UploadCache] = None,
+    sample_budget: Optional[int] = None,
+    to_parquet: bool = False,
+    keep_original: bool = True,
 ) -> dp.DataProductDetails:
     """Function handles the extraction of the zip data.
     It returns the data one by one to be uploaded and also be analysed for the catalog which is needed in the front-end
+    With stream_upload the items are never fully decompressed into memory, they are read and uploaded block by block.
+    The uploads run on 'max_workers' threads while the next items are parsed, every blob itself is uploaded with
+    'max_concurrency' parallel connections. If one upload fails, the outstanding uploads are cancelled, the blobs that were
+    already uploaded are deleted again (so the name stays free for a retry) and the error is raised.
+    The tables are registered once all items are parsed and uploaded, posting them to the catalog is up to the caller.
+    With parse_workers above 0 the items are parsed in the process wide parse pool instead of the script thread,
+    the item bytes are sent to the workers, so stream_upload then only affects the upload.
+    If the pool breaks, the registration fails and the pool is replaced for the next one.
+    Every sheet of an excel file becomes its own table. reader_options are passed on to the DataReader,
+    e.g. max_rows to infer excel schemas from the first rows only or the csv_engine.
+    With a cache, a rerun with the same upload and data product name reuses the parsed tables (with new ids),
+    the items are uploaded again.
+    Sample rows are read with reader_options["sample_rows"], sample_budget caps the bytes of the samples of all tables.
+    With to_parquet every csv file and excel sheet is additionally transcoded into a compressed parquet file with the
+    inferred schema and uploaded as "<item name>.parquet" (sheets as "<item name>/<sheet_name>.parquet"),
+    the original is only uploaded with keep_original. The files of every table are recorded in its catalog entry.
+    A StagedProduct in place of the zip file is registered from its staging container: its items are copied server-side
+    and parsed in the script thread from ranged reads (no cache, no parse pool), so the app only downloads what the readers read.
+    Staged csv items are only read up to the chunks their schema inference needs (see staged_reader_options),
+    profiling their columns or transcoding them still downloads the whole item (the transcode needs a complete schema).
     """
-
-    # will hold all tables extracted from the zipFile (including the column information)
-    tables: list[dp.DataProductDetailSampleDataTable] = []
+    staged = isinstance(file, sp.StagedProduct)
+    if staged:
+        cache = None
+        parse_workers = 0
+    csv_engine = (reader_options or {}).get("csv_engine", "pandas")
+
+    cache_key = None
+    if cache is not None:
+        cache_key = cache.cache_key(file, data_product_details.data_product_name)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            tables = cached.reuse(data_product_details.id)
+            upload_items(
+                zh.ZipHandler(file, data_product_details.data_product_name),
+                data_product_details.data_product_name,
+                blob_handler,
+                max_workers,
+                max_concurrency,
+                tables,
+                csv_engine,
+            )
+            data_product_details.register_product_detail_sample_data_tables(tables)
+            return data_product_details
 
     # init the zip file
-    zip_file = zh.ZipHandler(file, data_product_details.data_product_name)
-
-    # loop over the zip content
-    for bytes_data, file_name in zip_file.extract_dp_items():
-        # get the Table & Column information for the front-end catalog
-        table = create_table_n_column_details(
-            file_name, data_product_details, bytes_data, dr.DataReader
+    with tm.telemetry.span("zip_open", data_product_details.data_product_name) as span:
+        zip_file = file if staged else zh.ZipHandler(file, data_product_details.data_product_name)
+        span.set(bytes=getattr(file, "size", None))
+
+    # the blobs of the finished uploads, they are deleted again if the registration fails
+    uploaded: list[str] = []
+    with _delete_uploads_on_failure(blob_handler, uploaded), wp.BoundedWorkerPool(max_workers) as pool:
+        registration = _Registration(
+            zip_file,
+            data_product_details,
+            blob_handler,
+            pool,
+            uploaded,
+            stream_upload=stream_upload or staged,
+            max_concurrency=max_concurrency,
+            parse_pool=pp.get_parse_pool(parse_workers) if parse_workers > 0 else None,
+            reader_options=reader_options,
+            sample_budget=sample_budget,
+            to_parquet=to_parquet,
+            keep_original=keep_original,
         )
-        tables.append(table)
+        tables = registration.run()
+        if cache is not None:
+            cache.put(cache_key, tables)
+        pool.wait()
 
-        # upload the data to the blob
-        # the file_name must be combined with the data product name with a forward flash to create a "folder" in the container
-        file_name = f"{data_product_details.data_product_name}/{file_name}"
-
-        upload_data(file_name, bytes_data, blob_handler)
-
-    # register all tables and columns
-
-    data_product_details.register_product_detail_sample_data_tables(tables)
     return data_product_details
 
 
-def upload_data(item_name: str, data: bytes, blob_handler: bs.BlobStorage) -> None:
+class _Registration:
+    """The parse and upload pipeline of one registration: every item is parsed in item order, its uploads are
+    submitted to the worker pool right away, the tables are finished in item (and sheet) order as their schemas
+    are ready and registered once the last one is
+    """
+
+    def __init__(
+        self,
+        zip_file: zh.ZipHandler | sp.StagedProduct,
+        data_product_details: dp.DataProductDetails,
+        blob_handler: bs.BlobStorage,
+        pool: wp.BoundedWorkerPool,
+        uploaded: list[str],
+        stream_upload: bool,
+        max_concurrency: int,
+        parse_pool: Optional[Executor],
+        reader_options: Optional[dict],
+        sample_budget: Optional[int],
+        to_parquet: bool,
+        keep_original: bool,
+    ):
+        self.zip_file = zip_file
+        self.data_product_details = data_product_details
+        self.blob_handler = blob_handler
+        self.pool = pool
+        self.uploaded = uploaded
+        self.stream_upload = stream_upload
+        self.max_concurrency = max_concurrency
+        self.parse_pool = parse_pool
+        self.reader_options = reader_options
+        self.csv_engine = (reader_options or {}).get("csv_engine", "pandas")
+        self.to_parquet = to_parquet
+        self.keep_original = keep_original
+        # at most 2 items per worker of the pool wait for their schemas, which bounds the bytes held by the parse pool
+        self.max_pending_items = 2 * pp.parse_pool_workers() if parse_pool is not None else 0
+        # parsed schemas in item (and sheet) order, the tables are created as soon as the oldest schema is ready
+        # every schema has its parse span, which ends when the schema is taken (in the pool this includes the wait for a worker)
+        self.pending_schemas: deque[tuple[str, Future, tm.Span]] = deque()
+        # the number of tables of every item whose schemas are pending, a workbook is parsed as one task
+        self.pending_items: deque[int] = deque()
+        # the tables take their share of the sample budget in item order
+        self.budget = sr.SampleBudget(sample_budget) if sample_budget is not None else None
+        # the blob names of the original and the transcoded files of every table, recorded in the catalog
+        self.table_files: dict[str, dict[str, str]] = {}
+        # will hold all tables extracted from the zipFile (including the column information)
+        self.tables: list[dp.DataProductDetailSampleDataTable] = []
+
+    def run(self) -> list[dp.DataProductDetailSampleDataTable]:
+        """Parses and uploads all items and registers their tables, the uploads may still be running afterwards"""
+        try:
+            for file_name in self.zip_file.data_product_items:
+                # the file_name must be combined with the data product name with a forward flash to create a "folder" in the container
+                blob_name = f"{self.data_product_details.data_product_name}/{file_name}"
+                transcode = self.to_parquet and pt.can_transcode(file_name)
+                item_schemas, bytes_data = self.parse(file_name, blob_name, transcode)
+                self.upload(file_name, blob_name, transcode, item_schemas, bytes_data)
+            return self.finalize()
+        except BrokenProcessPool:
+            # a worker died (e.g. killed for running out of memory), later registrations get a new pool
+            pp.reset_parse_pool(self.parse_pool)
+            raise
+        finally:
+            for _, schema, _ in self.pending_schemas:
+                schema.cancel()
+
+    def parse(
+        self, file_name: str, blob_name: str, transcode: bool
+    ) -> tuple[list[tuple[str, Optional[str], Future]], Optional[bytes]]:
+        """Reads the schemas of the tables (sheets) of an item, in sheet order, and queues them.
+        Returns them with the bytes of the item, if it was read into memory"""
+        item_schemas: list[tuple[str, Optional[str], Future]] = []
+        if self.stream_upload and self.parse_pool is None:
+            # the reader and the upload each get their own handle, no item is copied into a bytes object
+            with open_item_for_reading(self.zip_file, file_name) as item:
+                for table_name, sheet_name in item_tables(file_name, item):
+                    span = tm.Span("parse", table_name, bytes=self.zip_file.item_size(file_name))
+                    schema = _run_now(read_table_schema, file_name, item, sheet_name, self.item_options(transcode))
+                    item_schemas.append((table_name, sheet_name, schema))
+                    self.queue_schema(table_name, schema, span, blob_name, transcode)
+            self.queue_item(len(item_schemas))
+            return item_schemas, None
+
+        with self.zip_file.open_dp_item(file_name) as item:
+            bytes_data = item.read()
+        # get the Table & Column information for the front-end catalog, every sheet of an excel file is its own table
+        tables = item_tables(file_name, bytes_data)
+        spans = [tm.Span("parse", table_name, bytes=len(bytes_data)) for table_name, _ in tables]
+        if self.parse_pool is not None:
+            # the whole item is one task, the bytes of a workbook are sent to a worker once for all of its sheets
+            item = self.parse_pool.submit(
+                pp.parse_item_schemas, file_name, bytes_data, [sheet_name for _, sheet_name in tables], self.reader_options
+            )
+            schemas = [_ItemSchema(item, index) for index in range(len(tables))]
+        else:
+            schemas = [
+                _run_now(read_table_schema, file_name, bytes_data, sheet_name, self.reader_options)
+                for _, sheet_name in tables
+            ]
+        for (table_name, sheet_name), schema, span in zip(tables, schemas, spans):
+            item_schemas.append((table_name, sheet_name, schema))
+            self.queue_schema(table_name, schema, span, blob_name, transcode)
+        self.queue_item(len(item_schemas))
+        return item_schemas, bytes_data
+
+    def item_options(self, transcode: bool) -> Optional[dict]:
+        """The reader_options of a streamed item, staged items are only read as far as their schema needs.
+        The transcode reads the whole item anyway, the schema of a staged item is then inferred from all of it"""
+        if isinstance(self.zip_file, sp.StagedProduct) and not transcode:
+            return staged_reader_options(self.reader_options)
+        return self.reader_options
+
+    def upload(
+        self,
+        file_name: str,
+        blob_name: str,
+        transcode: bool,
+        item_schemas: list[tuple[str, Optional[str], Future]],
+        bytes_data: Optional[bytes],
+    ) -> None:
+        """Submits the uploads of an item: the parquet files of its tables and the original"""
+        if transcode:
+            # the parquet files are written by the upload workers once the schema of their table is known
+            for table_name, sheet_name, schema in item_schemas:
+                parquet_blob_name = self.table_files[table_name]["parquet"]
+                self.pool.submit(
+                    _record_upload, self.uploaded, parquet_blob_name,
+                    upload_parquet, self.zip_file, file_name, sheet_name, schema, parquet_blob_name,
+                    self.blob_handler, self.max_concurrency, self.csv_engine,
+                )
+        if self.keep_original or not transcode:
+            if bytes_data is None or self.stream_upload:
+                upload = (upload_item, self.zip_file, file_name, blob_name, self.blob_handler, self.max_concurrency)
+            else:
+                upload = (upload_data, blob_name, bytes_data, self.blob_handler, self.max_concurrency)
+            self.pool.submit(_record_upload, self.uploaded, blob_name, *upload)
+
+    def queue_schema(self, table_name: str, schema: Future, span: tm.Span, blob_name: str, transcode: bool) -> None:
+        """Queues the schema of a table together with its files"""
+        if transcode:
+            self.table_files[table_name] = {
+                "parquet": pt.parquet_blob_name(f"{self.data_product_details.data_product_name}/{table_name}")
+            }
+            if self.keep_original:
+                self.table_files[table_name]["original"] = blob_name
+        self.pending_schemas.append((table_name, schema, span))
+
+    def queue_item(self, num_tables: int) -> None:
+        """Marks the queued schemas of an item as one pending item, the tables of the oldest items are finished
+        as long as more than max_pending_items wait"""
+        self.pending_items.append(num_tables)
+        while len(self.pending_items) > self.max_pending_items:
+            for _ in range(self.pending_items.popleft()):
+                self.finish_oldest_table()
+
+    def finish_oldest_table(self) -> None:
+        """Turns the oldest queued schema into a table, waiting for it if it is still parsed"""
+        table_name, schema, span = self.pending_schemas.popleft()
+        try:
+            table_schema = schema.result()
+        except BaseException:
+            span.status = "error"
+            tm.telemetry.record(span)
+            raise
+        span.set(rows=table_schema.num_rows, columns=len(table_schema.columns))
+        tm.telemetry.record(span)
+        if self.budget is not None:
+            table_schema.samples = self.budget.fit(table_schema.samples)
+        table = create_table_from_schema(table_name, self.data_product_details, table_schema)
+        table.files = self.table_files.get(table_name, {})
+        self.tables.append(table)
+
+    def finalize(self) -> list[dp.DataProductDetailSampleDataTable]:
+        """Finishes the remaining tables and registers all tables and columns"""
+        while self.pending_schemas:
+            self.finish_oldest_table()
+        self.pending_items.clear()
+        self.data_product_details.register_product_detail_sample_data_tables(self.tables)
+        return self.tables
+
+
+@contextmanager
+def _delete_uploads_on_failure(blob_handler: bs.BlobStorage, uploaded: list[str]) -> Iterator[None]:
+    """Helper Function that deletes the uploaded blobs if the block raises, a failed registration leaves no partial data product"""
+    try:
+        yield
+    except BaseException:
+        if uploaded:
+            logger.warning(f"Registration failed, deleting {len(uploaded)} uploaded blobs")
+            try:
+                blob_handler.delete_blobs(uploaded)
+            except Exception:
+                logger.exception("The uploaded blobs of the failed registration could not be deleted")
+        raise
+
+
+def _record_upload(uploaded: list[str], blob_name: str, upload: Callable, *args) -> None:
+    """Helper Function that runs an upload and records its blob once it succeeded"""
+    upload(*args)
+    uploaded.append(blob_name)
+
+
+def _run_now(fn: Callable, *args) -> Future:
+    """Helper Function that runs fn right away and returns its result (or its exception) as a finished Future"""
+    future = Future()
+    try:
+        future.set_result(fn(*args))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+class _ItemSchema:
+    """The schema of one table of an item that is parsed as a whole in the parse pool,
+    it is taken like a Future of the table's schema"""
+
+    def __init__(self, item: Future, index: int):
+        self.item = item
+        self.index = index
+
+    def result(self, timeout: Optional[float] = None) -> dr.TableSchema:
+        return self.item.result(timeout)[self.index]
+
+    def cancel(self) -> bool:
+        return self.item.cancel()
+
+
+def open_item_for_reading(zip_file: zh.ZipHandler, file_name: str) -> IO[bytes]:
+    """Opens a data product item for its reader: csv files are parsed while they are decompressed,
+    parquet and excel files need random access and are mapped (stored items) or spooled (compressed items)
+    """
+    file_type = dr.SupportedFileTypes.get_enum_member(file_name.split(".")[-1])
+    if file_type.needs_random_access:
+        return zip_file.open_seekable_dp_item(file_name)
+    return zip_file.open_dp_item(file_name)
+
+
+def upload_items(
+    zip_file: zh.ZipHandler,
+    data_product_name: str,
+    blob_handler: bs.BlobStorage,
+    max_workers: int = 1,
+    max_concurrency: int = 1,
+    tables: Optional[list[dp.DataProductDetailSampleDataTable]] = None,
+    csv_engine: str = "pandas",
+) -> None:
+    """Streams all data product items of the zip file to the BlobStorage without parsing them,
+    the files recorded in the already parsed tables decide which originals and parquet files are uploaded.
+    If an upload fails, the already uploaded blobs are deleted again
+    """
+    uploaded: list[str] = []
+    with _delete_uploads_on_failure(blob_handler, uploaded), wp.BoundedWorkerPool(max_workers) as pool:
+        for file_name in zip_file.data_product_items:
+            blob_name = f"{data_product_name}/{file_name}"
+            item_files = [
+                table for table in tables or []
+                if table.data_table_name == file_name or table.data_table_name.startswith(f"{file_name}/")
+            ]
+            for table in item_files:
+                if "parquet" in table.files:
+                    sheet_name = table.data_table_name[len(file_name) + 1 :] or None
+                    pool.submit(
+                        _record_upload, uploaded, table.files["parquet"],
+                        upload_parquet, zip_file, file_name, sheet_name, _run_now(lambda t=table: t.schema),
+                        table.files["parquet"], blob_handler, max_concurrency, csv_engine,
+                    )
+            if not item_files or any("parquet" not in table.files or "original" in table.files for table in item_files):
+                pool.submit(
+                    _record_upload, uploaded, blob_name,
+                    upload_item, zip_file, file_name, blob_name, blob_handler, max_concurrency,
+                )
+        pool.wait()
+
+
+def upload_item(
+    zip_file: zh.ZipHandler,
+    file_name: str,
+    item_name: str,
+    blob_handler: bs.BlobStorage,
+    max_concurrency: int = 1,
+) -> None:
+    """Opens a data product item of the zip file and streams it to the BlobStorage under the item_name,
+    staged items are copied server-side instead"""
+    if isinstance(zip_file, sp.StagedProduct):
+        with tm.telemetry.span("copy", item_name, bytes=zip_file.item_size(file_name)):
+            zip_file.copy_dp_item(file_name, item_name, blob_handler)
+        return
+    with zip_file.open_dp_item(file_name) as item:
+        upload_data(item_name, item, blob_handler, max_concurrency)
+
+
+def upload_parquet(
+    zip_file: zh.ZipHandler,
+    file_name: str,
+    sheet_name: Optional[str],
+    schema: Future,
+    item_name: str,
+    blob_handler: bs.BlobStorage,
+    max_concurrency: int = 1,
+    csv_engine: str = "pandas",
+) -> None:
+    """Transcodes a csv file or an excel sheet of the zip file into parquet with its parsed schema and uploads it under the item_name,
+    the parquet file is spooled to disk above the zip's max_memory.
+    A csv schema that stopped early (stable_chunks) is inferred again from the whole file first, which costs an extra pass
+    """
+    table_schema = schema.result()
+    if pt.needs_complete_schema(file_name, table_schema):
+        with open_item_for_reading(zip_file, file_name) as item:
+            table_schema = dr.read_csv_schema(item, csv_engine)
+    with tm.telemetry.span("transcode", item_name) as span:
+        with open_item_for_reading(zip_file, file_name) as item:
+            target = tempfile.SpooledTemporaryFile(max_size=zip_file.max_memory)
+            rows = pt.transcode_to_parquet(file_name, item, table_schema, target, sheet_name, csv_engine)
+        span.set(rows=rows, bytes=target.tell())
+    with target:
+        target.seek(0)
+        upload_data(item_name, target, blob_handler, max_concurrency)
+
+
+def upload_data(
+    item_name: str,
+    data: bytes | IO[bytes],
+    blob_handler: bs.BlobStorage,
+    max_concurrency: int = 1,
+) -> None:
     """Uploads a item to the BlobStorage specified in the blob_handler
     the item_name must consist of the full path, including folders indicated with "/"
+    file-like objects are uploaded block by block instead of as one buffer
     """
-    blob_handler.upload_a_file(data, item_name)
+    with tm.telemetry.span("upload", item_name) as span:
+        if isinstance(data, (bytes, bytearray)):
+            span.set(bytes=len(data))
+            blob_handler.upload_a_file(data, item_name, max_concurrency=max_concurrency)
+        else:
+            blob_handler.upload_a_stream(data, item_name, max_concurrency=max_concurrency)
+            span.set(bytes=data.tell())
 
 
 def create_table_n_column_details(
     file_name: str,
     data_product_details: dp.DataProductDetails,
-    data: bytes,
+    data: bytes | IO[bytes],
     data_reader: dr.DataReader,
 ) -> dp.DataProductDetailSampleDataTable:
-    """Reads the byte code in and turns it into a Data Product Detail Sample Data Table, with Data Columns already registered"""
+    """Reads the byte code in and turns it into a Data Product Detail Sample Data Table, with Data Columns already registered
+    only the schema is read, parquet files are therefore never fully loaded
+    """
+
+    data_r = data_reader(file_name, data, schema_only=True)
+    return create_table_from_schema(file_name, data_product_details, data_r.schema)
+
+
+def item_tables(
+    file_name: str, data: bytes | IO[bytes]
+) -> list[tuple[str, Optional[str]]]:
+    """Returns the table name and the sheet name of every table in a data product item.
+    Only excel files with more than one sheet contain multiple tables, they are named "<file_name>/<sheet_name>"
+    """
+    sheets = dr.table_sheets(file_name, data)
+    if len(sheets) == 1:
+        return [(file_name, sheets[0])]
+    return [(f"{file_name}/{sheet_name}", sheet_name) for sheet_name in sheets]
+
+
+def staged_reader_options(reader_options: Optional[dict] = None) -> dict:
+    """Returns the reader_options for a staged item, whose every read downloads ranges of the staging container.
+    The csv schema is inferred chunk by chunk and stops once it is stable (the row count is then unknown),
+    the samples come from the chunks read until then instead of the whole file"""
+    options = dict(reader_options or {})
+    options["chunked_schema"] = True
+    if options.get("stable_chunks") is None:
+        options["stable_chunks"] = STAGED_STABLE_CHUNKS
+    options["sample_whole_file"] = False
+    return options
+
+
+def read_table_schema(
+    file_name: str,
+    data: bytes | IO[bytes],
+    sheet_name: Optional[str] = None,
+    reader_options: Optional[dict] = None,
+) -> dr.TableSchema:
+    """Reads only the schema of a data product item (or of one of its sheets)"""
+    return dr.DataReader(
+        file_name, data, schema_only=True, sheet_name=sheet_name, **(reader_options or {})
+    ).schema
+
 
-    data_r = data_reader(file_name, data)
+def create_table_from_schema(
+    file_name: str,
+    data_product_details: dp.DataProductDetails,
+    schema: dr.TableSchema,
+) -> dp.DataProductDetailSampleDataTable:
+    """Turns an already read schema into a Data Product Detail Sample Data Table, with Data Columns already registered"""
     table = dp.DataProductDetailSampleDataTable(
         file_name,
         data_product_details.schema_version,
         data_product_details.id,
-        data_r.data,
+        schema=schema,
     )
     return table
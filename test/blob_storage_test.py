@@ -0,0 +1,96 @@
+import io
+import time
+import src.modules.logic.blob_storage as bs
+import src.modules.logic.concurrency as cc
+from test.conftest import ThrottledError
+
+
+def test_upload_a_file(blob_storage):
+    blob_storage.upload_a_file(b"abc", "dp/data.csv")
+    assert blob_storage.blob_service_client.blobs["dp/data.csv"] == b"abc"
+
+
+def test_upload_a_stream_stages_blocks(blob_storage):
+    data = bytes(range(256)) * 40
+    blob_storage.upload_a_stream(io.BytesIO(data), "dp/data.csv", block_size=1000)
+
+    client = blob_storage.blob_service_client.clients["dp/data.csv"]
+    assert blob_storage.blob_service_client.blobs["dp/data.csv"] == data
+    assert max(client.staged_sizes) == 1000
+    assert len(client.staged_sizes) == 11
+
+
+def test_block_ids_have_equal_length():
+    assert len({len(bs.BlobStorage._block_id(i)) for i in (0, 9, 10, 12345)}) == 1
+
+
+def test_data_product_exists_is_case_insensitive(blob_storage):
+    blob_storage.upload_a_file(b"abc", "Sales/data.csv")
+    blob_storage.upload_a_file(b"abc", "stock/data.csv")
+    assert blob_storage.data_product_exists("SALES")
+    assert not blob_storage.data_product_exists("sale")
+    assert sorted(blob_storage.data_products) == ["sales", "stock"]
+
+
+def test_data_product_exists_walks_all_folders_only_after_a_miss(blob_storage):
+    blob_storage.upload_a_file(b"abc", "sales/data.csv")
+    container_client = blob_storage.blob_service_client.container_client
+    assert blob_storage.data_product_exists("sales")
+    assert container_client.listed_prefixes == ["sales/"]
+    assert not blob_storage.data_product_exists("stock")
+    assert container_client.listed_prefixes == ["sales/", "stock/", None]
+
+
+def test_only_existing_names_are_cached(blob_storage):
+    container_client = blob_storage.blob_service_client.container_client
+    assert not blob_storage.data_product_exists("sales")
+    assert not blob_storage.data_product_exists("sales")
+    assert len(container_client.listed_prefixes) == 4
+
+    blob_storage.mark_data_product_registered("Sales")
+    assert blob_storage.data_product_exists("sales")
+    assert len(container_client.listed_prefixes) == 4
+
+
+def test_product_name_cache_expires():
+    cache = bs.ProductNameCache(ttl=0.0)
+    cache.add("sales")
+    time.sleep(0.001)
+    assert "sales" not in cache
+
+
+def test_open_blob_downloads_only_the_read_ranges(blob_storage):
+    blob_storage.blob_service_client.blobs["dp/data.bin"] = bytes(range(256)) * 4096
+    with blob_storage.open_blob("dp/data.bin", buffer_size=1024) as blob:
+        blob.seek(-4, io.SEEK_END)
+        assert blob.read() == bytes(range(252, 256))
+        blob.seek(10)
+        assert blob.read(2) == bytes([10, 11])
+    assert blob_storage.blob_service_client.downloaded["dp/data.bin"] <= 2 * 1024
+
+
+def test_throttled_range_reads_are_retried_by_the_limiter(blob_storage):
+    blob_storage.blob_service_client.blobs["dp/data.bin"] = b"abcdef"
+    blob_storage.limiter = cc.AdaptiveLimiter("blob test", sleep=lambda seconds: None)
+    blob_client = blob_storage.blob_service_client.get_blob_client("data-products", "dp/data.bin")
+    reader = bs.BlobRangeReader(blob_client, 6, blob_storage.limiter)
+    download_blob = blob_client.download_blob
+    calls = []
+
+    def throttled_once(**kwargs):
+        calls.append(kwargs)
+        if len(calls) == 1:
+            raise ThrottledError(503)
+        return download_blob(**kwargs)
+
+    blob_client.download_blob = throttled_once
+    assert reader.readall() == b"abcdef"
+    assert len(calls) == 2 and blob_storage.limiter.metrics()["retries"] == 1
+
+
+def test_copy_from_url(blob_storage, make_blob_storage):
+    staging = make_blob_storage("landing")
+    staging.blob_service_client.blobs["sales/data.csv"] = b"a,b\n1,2\n"
+    blob_storage.copy_from_url(staging.blob_url("sales/data.csv"), "sales/data.csv")
+    assert blob_storage.blob_service_client.blobs["sales/data.csv"] == b"a,b\n1,2\n"
+    assert staging.list_blobs("sales/") == {"sales/data.csv": 8}
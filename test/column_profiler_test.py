@@ -0,0 +1,87 @@
+import io
+import numpy as np
+import pandas as pd
+import pytest
+import src.modules.logic.column_profiler as cp
+import src.modules.logic.data_product_details as dp
+import src.modules.logic.data_reader as dr
+
+
+@pytest.fixture
+def df() -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    return pd.DataFrame(
+        {
+            "amount": rng.integers(0, 10_000, 100_000),
+            "city": rng.choice(["Wien", "Graz", None], 100_000),
+        }
+    )
+
+
+def test_hyperloglog_estimates_distinct_counts():
+    for distinct in (10, 1_000, 100_000):
+        sketch = cp.HyperLogLog()
+        sketch.add_hashes(pd.util.hash_pandas_object(pd.Series(np.arange(distinct)), index=False).to_numpy())
+        assert sketch.estimate() == pytest.approx(distinct, rel=0.05)
+
+
+def test_profile_chunks_streams_a_single_pass(df):
+    chunks = (df.iloc[start : start + 10_000] for start in range(0, len(df), 10_000))
+    profiles = cp.profile_chunks(chunks)
+
+    amount = profiles["amount"]
+    assert (amount.count, amount.null_count) == (100_000, 0)
+    assert (amount.min, amount.max) == (df.amount.min(), df.amount.max())
+    assert amount.distinct_count == pytest.approx(df.amount.nunique(), rel=0.05)
+    assert amount.quantiles["p50"] == pytest.approx(df.amount.median(), rel=0.05)
+
+    city = profiles["city"].to_dict()
+    assert city["null_count"] == df.city.isna().sum()
+    assert (city["min"], city["max"], city["distinct_count"]) == ("Graz", "Wien", 2)
+    assert city["quantiles"] is None
+
+
+def test_mixed_types_across_chunks_have_no_min_max():
+    profiles = cp.profile_chunks([pd.DataFrame({"a": [1, 2]}), pd.DataFrame({"a": ["x"]})])
+    profile = profiles["a"].to_dict()
+    assert profile["min"] is None and profile["max"] is None
+    assert (profile["count"], profile["distinct_count"]) == (3, 3)
+
+
+def test_profile_parquet_uses_the_footer(df, monkeypatch):
+    data = io.BytesIO()
+    df.to_parquet(data, row_group_size=25_000)
+    monkeypatch.setattr(cp, "profile_chunks", lambda chunks: pytest.fail("the footer statistics suffice"))
+
+    profiles = cp.profile_parquet(data)
+    assert profiles["amount"].source == "parquet_footer"
+    assert profiles["amount"].to_dict()["min"] == df.amount.min()
+    assert profiles["city"].null_count == df.city.isna().sum()
+
+
+def test_profiles_are_attached_to_the_column_payload(df):
+    data = df.to_csv(index=False).encode()
+    reader = dr.DataReader("data.csv", data, schema_only=True, profile=True)
+    table = dp.DataProductDetailSampleDataTable("data.csv", 1, "parent", schema=reader.schema)
+
+    columns = table.columns.to_dicts()
+    assert columns[0]["profile"]["count"] == 100_000
+    assert table.columns[1].to_dict()["profile"]["distinct_count"] == 2
+
+
+def test_profiles_have_the_same_keys_for_every_file_type():
+    df = pd.DataFrame({"a": [1, 2, 3], "b": ["x", "y", None]})
+    files = {"data.csv": df.to_csv(index=False).encode()}
+    for file_name, write in [("data.parquet", df.to_parquet), ("data.xlsx", lambda f: df.to_excel(f, index=False))]:
+        with io.BytesIO() as f:
+            write(f)
+            files[file_name] = f.getvalue()
+
+    keys = {"count", "null_count", "min", "max", "distinct_count", "quantiles", "source"}
+    for file_name, data in files.items():
+        profiles = dr.DataReader(file_name, data, schema_only=True, profile=True).schema.profiles
+        assert all(set(profile) == keys for profile in profiles.values()), file_name
+
+    parquet = dr.DataReader("data.parquet", files["data.parquet"], schema_only=True, profile=True).schema.profiles
+    assert parquet["a"]["source"] == "parquet_footer"
+    assert parquet["a"]["distinct_count"] is None and parquet["a"]["quantiles"] is None
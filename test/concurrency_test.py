@@ -0,0 +1,64 @@
+import email.utils
+import time
+import pytest
+import src.modules.logic.concurrency as cc
+from src.modules.logic.telemetry import Telemetry
+from test.conftest import FakeResponse, ThrottledError
+
+
+@pytest.fixture
+def limiter() -> cc.AdaptiveLimiter:
+    sleeps = []
+    limiter = cc.AdaptiveLimiter("POST catalog/columns", initial_limit=4, max_retries=3, sleep=sleeps.append)
+    limiter.sleeps = sleeps
+    return limiter
+
+
+def test_limit_increases_additively_and_halves_once_per_round(limiter):
+    for _ in range(4):
+        limiter.release(limiter.acquire())
+    assert limiter.limit == pytest.approx(5, abs=0.2)
+
+    # two requests of the same round are throttled, the limit is only halved once
+    first, second = limiter.acquire(), limiter.acquire()
+    limiter.release(first, throttled=True)
+    limiter.release(second, throttled=True)
+    assert limiter.limit == pytest.approx(2.5, abs=0.1)
+    assert limiter.metrics()["throttled"] == 2 and limiter.metrics()["in_flight"] == 0
+
+
+def test_throttled_responses_are_retried_after_retry_after(limiter):
+    responses = iter([FakeResponse(429, {"Retry-After": "1.5"}), FakeResponse(503), FakeResponse(201)])
+    assert limiter.call(lambda: next(responses)).status_code == 201
+    assert limiter.sleeps[0] == 1.5
+    assert 0 <= limiter.sleeps[1] <= limiter.base_delay * 2
+    assert limiter.metrics()["retries"] == 2
+
+
+def test_retries_end_after_max_retries(limiter):
+    assert limiter.call(lambda: FakeResponse(429)).status_code == 429
+    with pytest.raises(ThrottledError):
+        limiter.call(lambda: (_ for _ in ()).throw(ThrottledError(503)))
+    assert limiter.sleeps[-1] == 2.0
+    assert limiter.metrics()["retries"] == 6
+    # other errors are not retried
+    with pytest.raises(ValueError):
+        limiter.call(lambda: (_ for _ in ()).throw(ValueError("bad")))
+    assert limiter.metrics()["retries"] == 6
+
+
+def test_parse_retry_after():
+    assert cc.parse_retry_after("3") == 3.0
+    assert cc.parse_retry_after(None) is None
+    http_date = email.utils.formatdate(time.time() + 10, usegmt=True)
+    assert 8 <= cc.parse_retry_after(http_date) <= 10
+
+
+def test_limits_are_exported_per_endpoint():
+    controller = cc.ConcurrencyController({"initial_limit": 2})
+    assert controller.limiter("blob devaccount") is controller.limiter("blob devaccount")
+    telemetry = Telemetry()
+    telemetry.register_gauges("endpoint_concurrency", controller.metrics)
+    rendered = telemetry.render()
+    assert 'endpoint_concurrency_limit{endpoint="blob devaccount"} 2.0' in rendered
+    assert rendered.count("# TYPE endpoint_concurrency_retries gauge") == 1
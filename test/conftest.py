@@ -0,0 +1,167 @@
+"""Fixtures and stand-ins shared by the test modules"""
+import io
+import zipfile
+import pandas as pd
+import pytest
+import requests
+from types import SimpleNamespace
+from typing import Callable
+import src.modules.logic.blob_storage as bs
+import src.modules.logic.data_product_details as dp
+
+
+CONNECTION_STRING = "DefaultEndpointsProtocol=https;AccountName=devaccount;AccountKey=a2V5;EndpointSuffix=core.windows.net"
+
+
+class FakeBlobClient:
+    """Stand-in for an azure blob client that keeps all blocks in memory"""
+
+    # the blobs behind every handed out url, so copies between fake service clients find their source
+    sources = {}
+
+    def __init__(self, blobs: dict, name: str, downloaded: dict = None):
+        self.blobs = blobs
+        self.name = name
+        self.staged = {}
+        self.staged_sizes = []
+        self.downloaded = downloaded if downloaded is not None else {}
+
+    @property
+    def url(self):
+        url = f"https://devaccount.blob.core.windows.net/{id(self.blobs)}/{self.name}"
+        FakeBlobClient.sources[url] = (self.blobs, self.name)
+        return url
+
+    def get_blob_properties(self):
+        return SimpleNamespace(size=len(self.blobs[self.name]), copy=SimpleNamespace(status="success"))
+
+    def download_blob(self, offset=0, length=None):
+        data = self.blobs[self.name][offset : None if length is None else offset + length]
+        self.downloaded[self.name] = self.downloaded.get(self.name, 0) + len(data)
+        return SimpleNamespace(readall=lambda: data)
+
+    def start_copy_from_url(self, source_url, **kwargs):
+        blobs, name = FakeBlobClient.sources[source_url]
+        self.blobs[self.name] = blobs[name]
+        return {"copy_status": "success"}
+
+    def upload_blob(self, data, **kwargs):
+        self.blobs[self.name] = bytes(data)
+
+    def delete_blob(self, **kwargs):
+        del self.blobs[self.name]
+
+    def stage_block(self, block_id, data, **kwargs):
+        self.staged[block_id] = bytes(data)
+        self.staged_sizes.append(len(data))
+
+    def commit_block_list(self, block_list, **kwargs):
+        self.blobs[self.name] = b"".join(self.staged[block.id] for block in block_list)
+
+
+class FakeContainerClient:
+    def __init__(self, blobs: dict):
+        self.blobs = blobs
+        self.listed_prefixes = []
+
+    def walk_blobs(self, name_starts_with=None, delimiter="/"):
+        self.listed_prefixes.append(name_starts_with)
+        folders = set()
+        for name in self.blobs:
+            if name_starts_with and not name.startswith(name_starts_with):
+                continue
+            folders.add(name.split(delimiter)[0] + delimiter)
+        return [FakeBlob(folder) for folder in sorted(folders)]
+
+    def list_blobs(self, name_starts_with=None):
+        return [
+            SimpleNamespace(name=name, size=len(data))
+            for name, data in sorted(self.blobs.items())
+            if not name_starts_with or name.startswith(name_starts_with)
+        ]
+
+
+class FakeBlob:
+    def __init__(self, name: str):
+        self.name = name
+
+
+class FakeBlobServiceClient:
+    def __init__(self):
+        self.blobs = {}
+        self.clients = {}
+        self.downloaded = {}
+        self.container_client = FakeContainerClient(self.blobs)
+
+    def get_blob_client(self, container, blob):
+        client = FakeBlobClient(self.blobs, blob, self.downloaded)
+        self.clients[blob] = client
+        return client
+
+    def get_container_client(self, container):
+        return self.container_client
+
+
+class FakeResponse:
+    """Stand-in for a requests response"""
+
+    def __init__(self, status_code: int, headers: dict = None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"status {self.status_code}")
+
+    def json(self):
+        return {}
+
+
+class ThrottledError(Exception):
+    """Stand-in for the azure sdk's HttpResponseError"""
+
+    def __init__(self, status_code: int):
+        self.status_code = status_code
+        self.response = FakeResponse(status_code, {"Retry-After": "2"})
+
+
+@pytest.fixture
+def make_blob_storage() -> Callable[[str], bs.BlobStorage]:
+    """Fixture that creates BlobStorages whose service clients never leave the process,
+    the process wide product name caches are cleared first"""
+    bs._product_name_caches.clear()
+
+    def make(container_name: str) -> bs.BlobStorage:
+        storage = bs.BlobStorage(CONNECTION_STRING, container_name)
+        storage.blob_service_client = FakeBlobServiceClient()
+        return storage
+
+    return make
+
+
+@pytest.fixture
+def blob_storage(make_blob_storage) -> bs.BlobStorage:
+    return make_blob_storage("data-products")
+
+
+@pytest.fixture
+def dp_zip() -> io.BytesIO:
+    """Fixture that creates a data product zip with a csv, a parquet and an excel item"""
+    df = pd.DataFrame({'a':[1,2,3],'b':['x','y','z']})
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, 'w', zipfile.ZIP_DEFLATED) as zip_:
+        zip_.writestr("sales/table.csv", df.to_csv(index=False))
+        with io.BytesIO() as f:
+            df.to_parquet(f)
+            zip_.writestr("sales/table.parquet", f.getvalue())
+        with io.BytesIO() as f:
+            df.to_excel(f, index=False)
+            zip_.writestr("sales/table.xlsx", f.getvalue())
+    data.seek(0)
+    return data
+
+
+@pytest.fixture
+def dp_details() -> dp.DataProductDetails:
+    information = dp.DataProductDetailsInformation("ODS", "Sales", "Jana Doe", ["en"])
+    return dp.DataProductDetails("sales", 1, dp.AccessDetails("private", "http/json"), information)
@@ -0,0 +1,65 @@
+import io
+import json
+import uuid
+import pytest
+import pandas as pd
+import src.modules.logic.data_product_details as dp
+import src.modules.logic.data_reader as dr
+
+
+def test_table_from_schema():
+    schema = dr.TableSchema({'a':'int64','b':'object'},num_rows=10)
+    table = dp.DataProductDetailSampleDataTable("data.parquet", 1, "parent", schema=schema)
+    assert table.df is None
+    assert [column.column_name for column in table.columns] == ['a','b']
+    assert [column.data_type for column in table.columns] == ['int64','string']
+    assert all(column.parent_id == table.id for column in table.columns)
+
+def test_table_from_dataframe():
+    df = pd.DataFrame({'a':[1,2],'b':[0.5,1.5]})
+    table = dp.DataProductDetailSampleDataTable("data.csv", 1, "parent", df)
+    assert [column.data_type for column in table.columns] == ['int64','float64']
+
+def test_table_needs_df_or_schema():
+    with pytest.raises(ValueError):
+        dp.DataProductDetailSampleDataTable("data.csv", 1, "parent")
+
+def test_uuid4_batch_creates_valid_unique_uuids():
+    ids = dp.uuid4_batch(1000)
+    assert len(set(ids)) == 1000
+    assert all(uuid.UUID(i).version == 4 and str(uuid.UUID(i)) == i for i in ids)
+
+def test_column_store_views_match_the_store():
+    schema = dr.TableSchema({'a':'int64','b':'object'})
+    table = dp.DataProductDetailSampleDataTable("data.parquet", 1, "parent", schema=schema)
+    assert [column.to_dict() for column in table.columns] == table.columns.to_dicts()
+    assert json.loads(table.columns.to_json()) == table.columns.to_dicts()
+    assert table.to_dict()["columns"] == [column.id for column in table.columns]
+
+    column = table.columns[-1]
+    assert isinstance(column, dp.DataProductDetailSampleDataColumnView)
+    assert not hasattr(column, "__dict__")
+    column.register_sample_data(['x','y'])
+    assert table.columns.data == [None, ['x','y']]
+    assert table.columns[1:][0].data == ['x','y']
+
+@pytest.fixture
+def dp_details() -> dp.DataProductDetails:
+    information = dp.DataProductDetailsInformation("ODS", "Sales", "Jana Doe", ["en"])
+    details = dp.DataProductDetails("sales", 1, dp.AccessDetails("private", "http/json"), information)
+    schema = dr.TableSchema({'a':'int64','b':'object'})
+    details.register_product_detail_sample_data_tables(
+        [dp.DataProductDetailSampleDataTable(name, 1, details.id, schema=schema) for name in ("t1.csv", "t2.csv")]
+    )
+    return details
+
+@pytest.mark.parametrize("format", ["ndjson", "json"])
+def test_write_whole_data_product(dp_details, format):
+    file = io.StringIO()
+    assert dp_details.write_whole_data_product(file, format) == 7
+    if format == "ndjson":
+        items = [json.loads(line) for line in file.getvalue().splitlines()]
+    else:
+        items = json.loads(file.getvalue())
+    assert items == dp_details.whole_data_product_to_dict()
+    assert json.loads(dp_details.whole_data_product_to_json()) == items
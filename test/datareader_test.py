@@ -2,6 +2,7 @@ import pytest
 import io 
 import pandas as pd
 import src.modules.logic.data_reader as dr 
+import src.modules.logic.csv_reader as cr
 
 
 @pytest.fixture
@@ -60,4 +61,153 @@ def test_post_init(csv_data):
 def test_data_attribute(csv_data):
     reader = dr.DataReader("data.csv", csv_data)
     assert isinstance(reader.data, pd.DataFrame)
-    assert reader.data.shape == (3, 4)
\ No newline at end of file
+    assert reader.data.shape == (3, 4)
+@pytest.fixture
+def parquet_data()->bytes:
+    """Fixture that creates some parquet data with two row groups and returns it as a byte array"""
+    df = pd.DataFrame({'a':[1,2,3,4],'b':[1.5,2.5,3.5,None]})
+    with io.BytesIO() as f:
+        df.to_parquet(f,index=False,row_group_size=2)
+        data_bytes = f.getvalue()
+    return data_bytes
+
+def test_read_parquet_schema_only(parquet_data):
+    reader = dr.DataReader("data.parquet", parquet_data, schema_only=True)
+    assert reader.data is None
+    assert reader.schema.columns == {'a':'int64','b':'float64'}
+    assert reader.schema.num_rows == 4
+    assert reader.schema.num_row_groups == 2
+
+def test_schema_only_matches_full_read(parquet_data,csv_data):
+    for name,data in (("data.parquet",parquet_data),("data.csv",csv_data)):
+        full = dr.DataReader(name, data)
+        schema = dr.DataReader(name, data, schema_only=True)
+        assert schema.schema.columns == full.schema.columns
+
+@pytest.fixture
+def multi_sheet_excel_data()->bytes:
+    """Fixture that creates an excel workbook with two sheets of different shapes"""
+    with io.BytesIO() as f:
+        with pd.ExcelWriter(f) as writer:
+            pd.DataFrame({'a':range(100),'b':[0.5]*100}).to_excel(writer,sheet_name='Numbers',index=False)
+            pd.DataFrame({'c':['A','B']}).to_excel(writer,sheet_name='Letters',index=False)
+        data_bytes = f.getvalue()
+    return data_bytes
+
+def test_table_sheets(multi_sheet_excel_data,csv_data):
+    assert dr.table_sheets("data.xlsx", multi_sheet_excel_data) == ['Numbers','Letters']
+    assert dr.table_sheets("data.csv", csv_data) == [None]
+
+def test_read_excel_sheet(multi_sheet_excel_data):
+    reader = dr.DataReader("data.xlsx", multi_sheet_excel_data, sheet_name='Letters')
+    assert reader.data.shape == (2, 1)
+
+def test_read_excel_schema_stops_after_max_rows(multi_sheet_excel_data):
+    reader = dr.DataReader("data.xlsx", multi_sheet_excel_data, schema_only=True, max_rows=10)
+    assert reader.schema.columns == {'a':'int64','b':'float64'}
+    assert reader.schema.num_rows == 100
+    assert dr.DataReader("data.xlsx", multi_sheet_excel_data, max_rows=10).data.shape == (10, 2)
+
+def test_read_csv_arrow_engine_sniffs_dialect():
+    data = "name;city\nJörg;Wien\n\"Doe; Jana\";Graz\n".encode("latin-1")
+    reader = dr.DataReader("data.csv", data, csv_engine="arrow")
+    assert reader.data.columns.tolist() == ['name','city']
+    assert reader.data['name'].tolist() == ['Jörg','Doe; Jana']
+
+def test_read_csv_arrow_engine_falls_back_to_pandas(csv_data):
+    reader = dr.DataReader("data.csv", csv_data, csv_engine="arrow")
+    assert reader.data.shape == (3, 4)
+
+def test_read_csv_arrow_engine_reads_latin_1_after_the_sample():
+    data = b"name,value\n" + b"".join(f"Gruen{i},{i}\n".encode() for i in range(10_000)) + "Grün,1\n".encode("latin-1")
+    assert len(data) > cr.SAMPLE_SIZE
+    reader = dr.DataReader("data.csv", data, csv_engine="arrow")
+    assert reader.data['name'].iloc[-1] == 'Grün'
+    chunks = cr.consume_csv_chunks(io.BytesIO(data), list, "arrow")
+    assert all(isinstance(value, str) for chunk in chunks for value in chunk['name'])
+
+def test_unknown_csv_engine(csv_data):
+    with pytest.raises(ValueError):
+        dr.DataReader("data.csv", csv_data, csv_engine="polars")
+
+@pytest.fixture
+def drifting_csv_data()->bytes:
+    """Fixture that creates csv data whose dtypes only change after the first rows"""
+    rows = ["ints,floats,mixed,empty,dates"]
+    rows += [f"{i},{i},{i},,2024-01-{i % 28 + 1:02d}" for i in range(6)]
+    rows += ["6,6.5,7.5,,2024-02-01", "7,8,text,,2024-02-02"]
+    return ("\n".join(rows) + "\n").encode("utf-8")
+
+def test_csv_schema_promotes_dtypes_across_chunks(drifting_csv_data):
+    inference = cr.infer_csv_schema(io.BytesIO(drifting_csv_data), chunk_rows=2)
+    full = pd.read_csv(io.BytesIO(drifting_csv_data))
+    columns = inference.columns()
+    assert columns['ints'] == 'int64'
+    assert columns['floats'] == 'float64'
+    assert columns['mixed'] == cr.STRING_DTYPE
+    assert columns['empty'] == str(full['empty'].dtype)
+    assert columns['dates'].startswith('datetime64')
+    assert inference.num_rows == 8 and inference.complete
+
+def test_csv_schema_only_reflects_whole_file(drifting_csv_data,monkeypatch):
+    monkeypatch.setattr(cr, "STREAM_BLOCK_SIZE", 32)
+    for csv_engine in ("pandas","arrow"):
+        full = dr.DataReader("data.csv", drifting_csv_data, csv_engine=csv_engine)
+        schema = dr.DataReader("data.csv", drifting_csv_data, schema_only=True, chunked_schema=True, csv_engine=csv_engine)
+        assert schema.data is None
+        assert schema.schema.num_rows == 8
+        assert schema.schema.columns['ints'] == str(full.data['ints'].dtype) == 'int64'
+        assert schema.schema.columns['floats'] == str(full.data['floats'].dtype) == 'float64'
+        # the first chunks of 'mixed' hold numbers, the whole file promotes it to strings
+        assert schema.schema.columns['mixed'] == cr.STRING_DTYPE
+
+def test_csv_schema_stops_once_stable():
+    rows = ["a,b"] + [f"{i},x" for i in range(20)] + ["0.5,y"]
+    data = ("\n".join(rows) + "\n").encode("utf-8")
+    stopped = cr.infer_csv_schema(io.BytesIO(data), stable_chunks=2, chunk_rows=2)
+    assert not stopped.complete
+    assert stopped.num_rows == 6
+    assert stopped.columns()['a'] == 'int64'
+    assert dr.read_csv_schema(io.BytesIO(data), stable_chunks=2).num_rows == 21
+    assert cr.infer_csv_schema(io.BytesIO(data), chunk_rows=2).columns()['a'] == 'float64'
+
+def test_csv_schema_inference_of_nullable_bools():
+    inference = cr.CsvSchemaInference()
+    inference.update(pd.DataFrame({'flag':[True,False]}))
+    inference.update(pd.DataFrame({'flag':pd.Series([True,None],dtype=object)}))
+    assert inference.columns() == {'flag':'object'}
+
+def test_csv_schema_samples_and_profiles_in_one_pass(monkeypatch):
+    passes = []
+    consume_csv_chunks = cr.consume_csv_chunks
+    monkeypatch.setattr(cr, "consume_csv_chunks", lambda *args: passes.append(args) or consume_csv_chunks(*args))
+    rows = ["a,b"] + [f"{i},x" for i in range(20)] + ["0.5,y"]
+    data = ("\n".join(rows) + "\n").encode("utf-8")
+    for csv_engine in ("pandas","arrow"):
+        passes.clear()
+        reader = dr.DataReader(
+            "data.csv", data, schema_only=True, chunked_schema=True, csv_engine=csv_engine, sample_rows=30, profile=True
+        )
+        assert len(passes) == 1
+        assert reader.schema.num_rows == 21
+        assert reader.schema.columns['a'] == 'float64'
+        assert reader.schema.samples['b'][-1] == 'y'
+        assert reader.schema.profiles['a']['max'] == 19
+
+def test_csv_schema_stops_once_stable_but_samples_the_whole_file(monkeypatch):
+    monkeypatch.setattr(cr, "STREAM_BLOCK_SIZE", 16)
+    data = ("a\n" + "".join(f"{i}\n" for i in range(100))).encode("utf-8")
+    reader = dr.DataReader(
+        "data.csv", data, schema_only=True, chunked_schema=True, csv_engine="arrow", stable_chunks=2, sample_rows=100, profile=True
+    )
+    assert reader.schema.num_rows is None
+    assert reader.schema.columns == {'a':'int64'}
+    assert len(reader.schema.samples['a']) == 100
+    assert reader.schema.profiles['a']['count'] == 100
+
+@pytest.mark.parametrize("csv_engine", ["pandas","arrow"])
+def test_csv_schema_of_a_header_only_file(csv_engine):
+    reader = dr.DataReader("data.csv", b"a,b\n", schema_only=True, chunked_schema=True, csv_engine=csv_engine, sample_rows=5)
+    assert reader.schema.columns == {'a':'object','b':'object'}
+    assert reader.schema.num_rows == 0
+    assert reader.schema.samples == {'a':[],'b':[]}
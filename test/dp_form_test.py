@@ -0,0 +1,192 @@
+import pytest
+import io
+import os
+import zipfile
+import pandas as pd
+import src.modules.logic.data_product_details as dp
+import src.modules.ui_components.dp_form as dp_form
+import src.modules.logic.upload_cache as uc
+import src.modules.logic.parse_pool as pp
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        {},
+        {"stream_upload": True, "max_workers": 2, "max_concurrency": 2},
+        {"parse_workers": 2, "max_workers": 2},
+    ],
+)
+def test_register_product(dp_zip, blob_storage, dp_details, options):
+    dp_form.register_product(dp_zip, dp_details, blob_storage, **options)
+
+    tables = dp_details.data_product_detail_sample_data_table
+    assert [table.data_table_name for table in tables] == ["table.csv", "table.parquet", "table.xlsx"]
+    assert all([column.column_name for column in table.columns] == ['a','b'] for table in tables)
+    assert sorted(blob_storage.blob_service_client.blobs) == ["sales/table.csv", "sales/table.parquet", "sales/table.xlsx"]
+
+
+def test_failed_upload_deletes_the_uploaded_blobs(dp_zip, blob_storage, dp_details, monkeypatch):
+    upload_a_stream = blob_storage.upload_a_stream
+
+    def failing_upload(stream, file_name, **kwargs):
+        if file_name.endswith(".xlsx"):
+            raise IOError("connection reset")
+        upload_a_stream(stream, file_name, **kwargs)
+
+    monkeypatch.setattr(blob_storage, "upload_a_stream", failing_upload)
+    with pytest.raises(IOError):
+        dp_form.register_product(dp_zip, dp_details, blob_storage, stream_upload=True)
+    assert blob_storage.blob_service_client.blobs == {}
+    assert not blob_storage.data_product_exists("sales")
+
+
+def test_broken_parse_pool_is_replaced(dp_zip, blob_storage, dp_details):
+    pool = pp.get_parse_pool(2)
+    with pytest.raises(BrokenProcessPool):
+        pool.submit(os._exit, 1).result()
+
+    with pytest.raises(BrokenProcessPool):
+        dp_form.register_product(dp_zip, dp_details, blob_storage, parse_workers=2)
+    assert blob_storage.blob_service_client.blobs == {}
+
+    dp_zip.seek(0)
+    dp_form.register_product(dp_zip, dp_details, blob_storage, parse_workers=2)
+    assert pp.get_parse_pool() is not pool
+    assert len(dp_details.data_product_detail_sample_data_table) == 3
+
+
+def test_register_product_creates_one_table_per_sheet(blob_storage, dp_details):
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, 'w') as zip_:
+        with io.BytesIO() as f:
+            with pd.ExcelWriter(f) as writer:
+                pd.DataFrame({'a':[1]}).to_excel(writer, sheet_name='First', index=False)
+                pd.DataFrame({'b':[1]}).to_excel(writer, sheet_name='Second', index=False)
+            zip_.writestr("sales/book.xlsx", f.getvalue())
+    data.seek(0)
+
+    dp_form.register_product(data, dp_details, blob_storage, parse_workers=2, reader_options={"max_rows": 5})
+    tables = dp_details.data_product_detail_sample_data_table
+    assert [table.data_table_name for table in tables] == ["book.xlsx/First", "book.xlsx/Second"]
+    assert list(blob_storage.blob_service_client.blobs) == ["sales/book.xlsx"]
+
+
+class LazyPool:
+    """Stand-in for the parse pool that runs a submitted function only when its result is taken,
+    it records how many submitted workbooks were outstanding at every submit"""
+
+    def __init__(self):
+        self.futures = []
+        self.outstanding = []
+
+    def submit(self, fn, *args):
+        self.outstanding.append(sum(not future.done() for future in self.futures))
+        future = Future()
+        original_result = future.result
+
+        def result(timeout=None):
+            if not future.done():
+                future.set_result(fn(*args))
+            return original_result(timeout)
+
+        future.result = result
+        self.futures.append(future)
+        return future
+
+
+def test_workbooks_wait_for_free_parse_workers(blob_storage, dp_details, monkeypatch):
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, 'w') as zip_:
+        for book in range(4):
+            with io.BytesIO() as f:
+                with pd.ExcelWriter(f) as writer:
+                    for i in range(3):
+                        pd.DataFrame({'a':[i]}).to_excel(writer, sheet_name=f'Sheet{i}', index=False)
+                zip_.writestr(f"sales/book{book}.xlsx", f.getvalue())
+    data.seek(0)
+    pool = LazyPool()
+    monkeypatch.setattr(pp, "get_parse_pool", lambda max_workers=None: pool)
+    monkeypatch.setattr(pp, "parse_pool_workers", lambda: 1)
+
+    dp_form.register_product(data, dp_details, blob_storage, parse_workers=1)
+    tables = dp_details.data_product_detail_sample_data_table
+    assert [table.data_table_name for table in tables] == [
+        f"book{book}.xlsx/Sheet{i}" for book in range(4) for i in range(3)
+    ]
+    # every workbook is a single task with all of its sheets
+    assert len(pool.futures) == 4
+    assert max(pool.outstanding) == 2
+
+
+def test_register_product_reuses_cached_registration(dp_zip, blob_storage, dp_details, monkeypatch):
+    cache = uc.UploadCache({})
+    dp_form.register_product(dp_zip, dp_details, blob_storage, cache=cache)
+    first_tables = dp_details.data_product_detail_sample_data_table
+    first_ids = [table.id for table in first_tables]
+    blobs = dict(blob_storage.blob_service_client.blobs)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("cached uploads must not be parsed again")
+
+    monkeypatch.setattr(dp_form, "read_table_schema", fail)
+    # e.g. a retry after a failed registration, whose blobs were deleted again
+    blob_storage.blob_service_client.blobs.clear()
+    rerun_details = dp.DataProductDetails(
+        "sales", 1, dp.AccessDetails("private", "http/json"),
+        dp.DataProductDetailsInformation("ODS", "Sales", "Jana Doe", ["en"]),
+    )
+    dp_form.register_product(dp_zip, rerun_details, blob_storage, cache=cache)
+    assert rerun_details.data_product_detail_sample_data_table == first_tables
+    assert all(table.parent_id == rerun_details.id for table in first_tables)
+    assert not set(first_ids) & {table.id for table in first_tables}
+    assert blob_storage.blob_service_client.blobs == blobs
+
+
+@pytest.mark.parametrize("options", [{"stream_upload": True, "max_workers": 2}, {"parse_workers": 2}])
+def test_register_product_transcodes_to_parquet(dp_zip, blob_storage, dp_details, options):
+    dp_form.register_product(
+        dp_zip, dp_details, blob_storage, to_parquet=True, keep_original=False,
+        reader_options={"chunked_schema": True}, **options,
+    )
+    blobs = blob_storage.blob_service_client.blobs
+    assert sorted(blobs) == ["sales/table.csv.parquet", "sales/table.parquet", "sales/table.xlsx.parquet"]
+    for name in ("sales/table.csv.parquet", "sales/table.xlsx.parquet"):
+        df = pd.read_parquet(io.BytesIO(blobs[name]))
+        assert df.to_dict("list") == {'a':[1,2,3],'b':['x','y','z']}
+
+    files = [table.files for table in dp_details.data_product_detail_sample_data_table]
+    assert files == [{"parquet": "sales/table.csv.parquet"}, {}, {"parquet": "sales/table.xlsx.parquet"}]
+    assert dp_details.data_product_detail_sample_data_table[0].to_dict()["files"] == files[0]
+
+
+def test_register_product_keeps_originals_next_to_parquet(dp_zip, blob_storage, dp_details):
+    cache = uc.UploadCache({})
+    dp_form.register_product(dp_zip, dp_details, blob_storage, to_parquet=True, cache=cache)
+    blobs = sorted(blob_storage.blob_service_client.blobs)
+    assert blobs == [
+        "sales/table.csv", "sales/table.csv.parquet", "sales/table.parquet", "sales/table.xlsx", "sales/table.xlsx.parquet"
+    ]
+    assert dp_details.data_product_detail_sample_data_table[0].files == {
+        "parquet": "sales/table.csv.parquet", "original": "sales/table.csv"
+    }
+
+    # a rerun uploads the same files again from the cached tables
+    blob_storage.blob_service_client.blobs.clear()
+    dp_form.register_product(dp_zip, dp_details, blob_storage, to_parquet=True, cache=cache)
+    assert sorted(blob_storage.blob_service_client.blobs) == blobs
+
+
+def test_transcoding_infers_a_stopped_csv_schema_again(blob_storage, dp_details):
+    # the inference stops after three chunks of 50_000 rows, the float comes later
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, 'w') as zip_:
+        zip_.writestr("sales/table.csv", "a\n" + "1\n" * 150_000 + "0.5\n")
+    dp_form.register_product(
+        data, dp_details, blob_storage, to_parquet=True, keep_original=False,
+        reader_options={"chunked_schema": True, "stable_chunks": 2, "csv_engine": "pandas"},
+    )
+    df = pd.read_parquet(io.BytesIO(blob_storage.blob_service_client.blobs["sales/table.csv.parquet"]))
+    assert len(df) == 150_001 and df["a"].iloc[-1] == 0.5
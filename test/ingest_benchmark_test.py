@@ -0,0 +1,22 @@
+import benchmarks.ingest as ingest
+from benchmarks.synthetic import SHAPES, scaled
+
+
+def test_run_shape_times_every_stage():
+    results = ingest.run_shape(scaled(SHAPES["many-small"], 0.02), repeat=1)
+    assert set(results) == {
+        "zip_bytes",
+        "zip_handler",
+        "data_reader",
+        "data_reader_schema_only",
+        "extract_columns",
+        "whole_data_product_to_json",
+        "register_product",
+    }
+    assert all(seconds >= 0 for seconds in results.values())
+
+
+def test_compare_reports_regressions():
+    baseline = {"results": {"csv": {"zip_bytes": 10, "zip_handler": 1.0, "data_reader": 1.0}}}
+    report = {"results": {"csv": {"zip_bytes": 10, "zip_handler": 1.1, "data_reader": 2.0}}}
+    assert ingest.compare(report, baseline) == ["csv/data_reader"]
@@ -0,0 +1,16 @@
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from src.modules.logic.lazy_import import lazy_import
+
+
+def test_module_is_executed_once_on_first_access(tmp_path, monkeypatch):
+    (tmp_path / "slow_module.py").write_text("import time\nEXECUTIONS = []\ntime.sleep(0.2)\nEXECUTIONS.append(1)\nVALUE = 42\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, "slow_module", raising=False)
+
+    module = lazy_import("slow_module")
+    with ThreadPoolExecutor(8) as pool:
+        values = list(pool.map(lambda _: module.VALUE, range(8)))
+    assert values == [42] * 8
+    assert module.EXECUTIONS == [1]
+    assert lazy_import("slow_module") is module
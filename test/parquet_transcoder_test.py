@@ -0,0 +1,72 @@
+import io
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+import src.modules.logic.csv_reader as cr
+import src.modules.logic.data_reader as dr
+import src.modules.logic.parquet_transcoder as pt
+
+
+def transcode(data: bytes, csv_engine: str = "pandas", row_group_rows: int = 4) -> io.BytesIO:
+    schema = dr.DataReader("data.csv", data, schema_only=True, chunked_schema=True, csv_engine=csv_engine).schema
+    target = io.BytesIO()
+    rows = pt.transcode_to_parquet("data.csv", io.BytesIO(data), schema, target, csv_engine=csv_engine, row_group_rows=row_group_rows)
+    assert rows == schema.num_rows
+    target.seek(0)
+    return target
+
+
+def test_csv_is_written_in_row_groups_with_the_inferred_schema():
+    rows = ["id,value,label,day"] + [f"{i},{i},x{i},2024-01-{i + 1:02d}" for i in range(9)] + ["9,9.5,,2024-01-10"]
+    for csv_engine in ("pandas", "arrow"):
+        target = transcode(("\n".join(rows) + "\n").encode("utf-8"), csv_engine)
+        parquet_file = pq.ParquetFile(target)
+        assert [parquet_file.metadata.row_group(i).num_rows for i in range(parquet_file.metadata.num_row_groups)] == [4, 4, 2]
+        assert parquet_file.metadata.row_group(0).column(0).compression == "ZSTD"
+        df = parquet_file.read().to_pandas()
+        assert str(df["id"].dtype) == "int64"
+        assert df["value"].tolist()[-2:] == [8.0, 9.5]
+        # pyarrow keeps empty strings, pandas reads them as missing values
+        assert df["label"].iloc[0] == "x0"
+        assert pd.isna(df["label"].iloc[-1]) or df["label"].iloc[-1] == ""
+        assert str(df["day"].dtype).startswith("datetime64")
+
+
+def test_values_that_do_not_fit_the_schema_raise():
+    data = b"a\n1\n0.5\n"
+    with pytest.raises(ValueError, match="not integers"):
+        pt.transcode_to_parquet("data.csv", io.BytesIO(data), dr.TableSchema({"a": "int64"}, num_rows=2), io.BytesIO())
+    # a schema that stopped early is not trusted at all
+    with pytest.raises(ValueError, match="first chunks"):
+        pt.transcode_to_parquet("data.csv", io.BytesIO(data), dr.TableSchema({"a": "int64"}), io.BytesIO())
+
+
+def test_excel_sheet_takes_the_dtypes_of_the_whole_sheet():
+    data = io.BytesIO()
+    pd.DataFrame({"a": [1, 2, 3, None], "b": [1, 2, "x", None]}).to_excel(data, index=False)
+    schema = dr.DataReader("book.xlsx", data.getvalue(), schema_only=True, max_rows=2).schema
+    assert schema.columns == {"a": "int64", "b": "int64"}
+    target = io.BytesIO()
+    assert pt.transcode_to_parquet("book.xlsx", data, schema, target) == 4
+    df = pd.read_parquet(target)
+    assert df["a"].tolist()[:3] == [1.0, 2.0, 3.0] and pd.isna(df["a"].iloc[3])
+    assert df["b"].tolist()[:3] == ["1", "2", "x"] and pd.isna(df["b"].iloc[3])
+
+
+def test_object_columns_are_written_as_strings_with_nulls():
+    chunk = pd.DataFrame({"mixed": pd.Series([1, "x", None], dtype=object)})
+    conformed = pt._conform(chunk, {"mixed": "object"})
+    assert conformed["mixed"].tolist()[:2] == ["1", "x"] and pd.isna(conformed["mixed"].iloc[2])
+
+
+def test_csv_rejected_by_arrow_is_written_once(monkeypatch):
+    monkeypatch.setattr(cr, "STREAM_BLOCK_SIZE", 16)
+    data = ("a\n" + "".join(f"{i}\n" for i in range(50)) + "text\n").encode("utf-8")
+    target = transcode(data, "arrow", row_group_rows=1_000)
+    df = pd.read_parquet(target)
+    assert df["a"].tolist() == [str(i) for i in range(50)] + ["text"]
+
+
+def test_can_transcode():
+    assert pt.can_transcode("data.csv") and pt.can_transcode("book.XLSX")
+    assert not pt.can_transcode("data.parquet")
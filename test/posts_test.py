@@ -0,0 +1,119 @@
+import pytest
+import gzip
+import json
+import threading
+import requests
+import src.modules.logic.posts as posts
+from test.conftest import FakeResponse
+
+
+class FakeSession:
+    """Stand-in for a requests session that records every posted item"""
+
+    def __init__(self, accepts_batches: bool = True, fail_on: int = None, batch_status: int = 415):
+        self.accepts_batches = accepts_batches
+        self.batch_status = batch_status
+        self.fail_on = fail_on
+        self.requests = []
+        self.items = []
+        self.lock = threading.Lock()
+
+    def post(self, url, json=None, data=None, headers=None):
+        with self.lock:
+            if data is not None:
+                self.requests.append(headers)
+                if not self.accepts_batches:
+                    return FakeResponse(self.batch_status)
+                self.items.extend(_decode(data, headers))
+                return FakeResponse(201)
+            self.requests.append(None)
+            if json["id"] == self.fail_on:
+                return FakeResponse(500)
+            self.items.append(json)
+            return FakeResponse(201)
+
+
+def _decode(data: bytes, headers: dict) -> list:
+    if headers.get("Content-Encoding") == "gzip":
+        data = gzip.decompress(data)
+    return json.loads(data)
+
+
+@pytest.fixture
+def items() -> list[dict]:
+    return [{"id": i, "name": f"column_{i}"} for i in range(25)]
+
+
+def test_post_items_in_gzip_batches(items):
+    session = FakeSession()
+    poster = posts.CatalogPoster("http://catalog", batch_size=10, session=session)
+    poster.post_items(items)
+    assert session.items == items
+    assert len(session.requests) == 3
+    assert all(headers["Content-Encoding"] == "gzip" for headers in session.requests)
+
+
+def test_fall_back_to_concurrent_posts(items):
+    session = FakeSession(accepts_batches=False)
+    poster = posts.CatalogPoster("http://catalog", batch_size=10, session=session)
+    poster.post_items(items)
+    assert sorted(item["id"] for item in session.items) == list(range(25))
+    assert not poster.supports_batches
+
+
+def test_invalid_batch_raises(items):
+    session = FakeSession(accepts_batches=False, batch_status=400)
+    poster = posts.CatalogPoster("http://catalog", batch_size=10, session=session)
+    with pytest.raises(requests.exceptions.HTTPError):
+        poster.post_items(items)
+    assert poster.supports_batches and len(session.requests) == 1
+
+
+def test_failing_item_raises(items):
+    session = FakeSession(fail_on=3)
+    poster = posts.CatalogPoster("http://catalog", max_concurrency=2, session=session)
+    with pytest.raises(requests.exceptions.HTTPError):
+        poster.post_items(items)
+
+
+def test_table_publisher_posts_tables_and_columns():
+    import src.modules.logic.data_product_details as dp
+    import src.modules.logic.data_reader as dr
+
+    table_session, column_session = FakeSession(), FakeSession()
+    table_poster = posts.CatalogPoster("http://tables", session=table_session)
+    column_poster = posts.CatalogPoster("http://columns", session=column_session)
+
+    tables = [
+        dp.DataProductDetailSampleDataTable(
+            f"t{i}.parquet", 1, "parent", schema=dr.TableSchema({"a": "int64", "b": "int64"})
+        )
+        for i in range(3)
+    ]
+    with posts.TablePublisher(table_poster, column_poster) as publish_table:
+        for table in tables:
+            publish_table(table)
+        publish_table.wait()
+
+    assert sorted(item["name"] for item in table_session.items) == ["t0.parquet", "t1.parquet", "t2.parquet"]
+    assert len(column_session.items) == 6
+
+
+def test_throttled_posts_are_retried(items):
+    import src.modules.logic.concurrency as cc
+
+    class ThrottlingSession(FakeSession):
+        def post(self, url, json=None, data=None, headers=None):
+            with self.lock:
+                self.requests.append(None)
+                if len(self.requests) % 2:
+                    return FakeResponse(429)
+                self.items.append(json)
+                return FakeResponse(201)
+
+    session = ThrottlingSession()
+    limiter = cc.AdaptiveLimiter("POST catalog/columns", sleep=lambda seconds: None)
+    poster = posts.CatalogPoster("http://catalog", max_concurrency=1, session=session, limiter=limiter)
+    poster.post_items(items[:5])
+    assert session.items == items[:5]
+    assert limiter.metrics()["retries"] == 5
@@ -0,0 +1,72 @@
+import io
+import json
+import zipfile
+import pandas as pd
+import pytest
+import threading
+import register_products as rp
+from benchmarks.stand_ins import LocalCatalogServer
+
+
+@pytest.fixture
+def manifest(tmp_path):
+    """Fixture that writes a manifest with a zipped product, a product folder and a product with a missing zip"""
+    df = pd.DataFrame({'a':[1,2,3],'b':['x','y','z']})
+    folder = tmp_path / "orders"
+    folder.mkdir()
+    df.to_csv(folder / "orders.csv", index=False)
+    df.to_parquet(folder / "orders.parquet")
+    with zipfile.ZipFile(tmp_path / "sales.zip", "w", zipfile.ZIP_DEFLATED) as zip_:
+        zip_.writestr("sales/sales.csv", df.to_csv(index=False))
+
+    information = {"domain": "ODS", "description": "Test", "data_owner": "Jana Doe", "language": ["en"]}
+    products = [
+        {"data_product_name": "sales", "path": "sales.zip", "information": information},
+        {"data_product_name": "orders", "path": "orders", "information": information, "tags": ["orders"]},
+        {"data_product_name": "missing", "path": "missing.zip", "information": information},
+    ]
+    path = tmp_path / "manifest.json"
+    path.write_text(json.dumps({"products": products}))
+    return path
+
+
+def test_registers_products_in_parallel(manifest, blob_storage):
+    with LocalCatalogServer() as catalog:
+        settings = rp.RegistrationSettings(
+            f"{catalog.url}/products", f"{catalog.url}/tables", f"{catalog.url}/columns",
+            reader_options={"csv_engine": "arrow", "chunked_schema": True},
+        )
+        out = io.StringIO()
+        results = rp.run(rp.load_manifest(manifest), blob_storage, settings, workers=3, out=out)
+
+    assert [result.status for result in results] == ["ok", "ok", "error"]
+    assert [(result.tables, result.columns) for result in results[:2]] == [(1, 2), (2, 4)]
+    assert "FileNotFoundError" in results[2].error
+    assert sorted(blob_storage.blob_service_client.blobs) == [
+        "orders/orders.csv", "orders/orders.parquet", "sales/sales.csv"
+    ]
+    # every product, table and column was posted to the catalog
+    assert catalog.items == 2 + 3 + 6
+    assert len(out.getvalue().splitlines()) == 3
+
+    # registered products are rejected on a second run
+    again = rp.register_entry(rp.load_manifest(manifest)[0], blob_storage, settings)
+    assert again.status == "error" and "already exists" in again.error
+
+
+def test_results_are_printed_as_they_finish(monkeypatch):
+    finished = threading.Event()
+
+    def register_entry(entry, blob_handler, settings):
+        # the first product only finishes once the second one has
+        if entry["data_product_name"] == "slow":
+            finished.wait(5)
+        else:
+            finished.set()
+        return rp.ProductResult(entry["data_product_name"])
+
+    monkeypatch.setattr(rp, "register_entry", register_entry)
+    out = io.StringIO()
+    results = rp.run([{"data_product_name": "slow"}, {"data_product_name": "fast"}], None, None, workers=2, out=out)
+    assert [result.data_product_name for result in results] == ["slow", "fast"]
+    assert [line.split()[0] for line in out.getvalue().splitlines()] == ["fast", "slow"]
@@ -0,0 +1,103 @@
+import threading
+import pytest
+import src.modules.logic.resources as resources
+from azure.core.exceptions import HttpResponseError, ServiceResponseError
+from azure.core.pipeline.transport import HttpResponse, HttpTransport
+from azure.storage.blob import BlobServiceClient
+from test.conftest import CONNECTION_STRING
+
+
+def test_http_sessions_are_shared_per_host():
+    registry = resources.ResourceRegistry(pool_size=4)
+    tables = registry.http_session("https://catalog.example.com/api/tables")
+    columns = registry.http_session("https://catalog.example.com/api/columns")
+    backend = registry.http_session("https://backend.example.com/create")
+    assert tables is columns
+    assert tables is not backend
+    assert tables.get_adapter("https://catalog.example.com")._pool_maxsize == 4
+
+
+def test_blob_service_client_is_shared():
+    registry = resources.ResourceRegistry()
+    assert registry.blob_service_client(CONNECTION_STRING) is registry.blob_service_client(CONNECTION_STRING)
+
+
+class FakeResponse(HttpResponse):
+    def __init__(self, request, status_code: int):
+        super().__init__(request, None)
+        self.status_code = status_code
+        self.headers = {}
+        self.reason = "status"
+        self.content_type = None
+
+    def body(self):
+        return b""
+
+
+class FakeTransport(HttpTransport):
+    """Transport that raises or answers with the status codes of 'outcomes' one by one"""
+
+    def __init__(self, outcomes: list):
+        self.outcomes = outcomes
+        self.sent = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def send(self, request, **kwargs):
+        self.sent += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return FakeResponse(request, outcome)
+
+
+def stage_block(transport: FakeTransport) -> None:
+    client = BlobServiceClient.from_connection_string(
+        CONNECTION_STRING, transport=transport, retry_policy=resources.blob_retry_policy(initial_backoff=0, increment_base=0, random_jitter_range=0)
+    )
+    client.get_blob_client("data-products", "sales/data.csv").stage_block("MDAwMDAwMDA=", b"abc")
+
+
+def test_blob_service_client_retries_transient_errors_only():
+    registry = resources.ResourceRegistry()
+    policy = registry.blob_service_client(CONNECTION_STRING)._config.retry_policy
+    assert type(policy) is type(resources.blob_retry_policy())
+
+    timed_out = FakeTransport([ServiceResponseError("read timed out"), 500, 201])
+    stage_block(timed_out)
+    assert timed_out.sent == 3
+
+    # throttled requests are raised at once, the adaptive limiter retries them
+    throttled = FakeTransport([503, 201])
+    with pytest.raises(HttpResponseError) as e:
+        stage_block(throttled)
+    assert e.value.status_code == 503 and throttled.sent == 1
+
+
+def test_metrics_count_hits_and_misses_across_threads():
+    registry = resources.ResourceRegistry()
+    sessions = []
+    threads = [
+        threading.Thread(target=lambda: sessions.append(registry.http_session("https://catalog.example.com/x")))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({id(session) for session in sessions}) == 1
+    metrics = registry.metrics()
+    assert metrics["http_sessions"] == 1
+    assert metrics["misses"] == 1
+    assert metrics["hits"] == 7
@@ -0,0 +1,90 @@
+import io
+import numpy as np
+import pandas as pd
+import pytest
+import src.modules.logic.data_reader as dr
+import src.modules.logic.sample_reader as sr
+import src.modules.ui_components.dp_form as dp_form
+
+
+def test_reservoir_sample_draws_from_all_chunks():
+    chunks = (pd.DataFrame({"a": range(start, start + 100)}) for start in range(0, 10_000, 100))
+    sample = sr.reservoir_sample(chunks, 50, np.random.default_rng(1))
+    assert len(sample["a"]) == len(set(sample["a"])) == 50
+    # a uniform sample of 10000 rows does not come from the first chunk only
+    assert max(sample["a"]) > 1_000
+
+
+def test_reservoir_sample_keeps_all_rows_of_small_tables():
+    sample = sr.reservoir_sample([pd.DataFrame({"a": [1, None], "b": ["x", "y"]})], 10)
+    assert sample == {"a": [1.0, None], "b": ["x", "y"]}
+
+
+@pytest.mark.parametrize("csv_engine", ["pandas", "arrow"])
+def test_sample_csv(csv_engine):
+    data = io.BytesIO(b"a,b\n" + b"".join(f"{i},x{i}\n".encode() for i in range(1000)))
+    sample = sr.sample_csv(data, 5, csv_engine)
+    assert len(sample["a"]) == 5
+    assert all(b == f"x{a}" for a, b in zip(sample["a"], sample["b"]))
+
+
+def test_sample_csv_falls_back_to_pandas_when_later_blocks_change_type(monkeypatch):
+    monkeypatch.setattr(sr.cr, "STREAM_BLOCK_SIZE", 64)
+    data = io.BytesIO(b"a\n" + b"1\n" * 100 + b"text\n")
+    sample = sr.sample_csv(data, 200, "arrow")
+    assert len(sample["a"]) == 101
+
+
+def test_sample_parquet_reads_the_first_row_group_only():
+    data = io.BytesIO()
+    pd.DataFrame({"a": range(100)}).to_parquet(data, row_group_size=10)
+    assert sr.sample_parquet(data, 50) == {"a": list(range(10))}
+
+
+def test_sample_excel_reads_the_first_rows():
+    data = io.BytesIO()
+    pd.DataFrame({"a": range(100), "d": pd.date_range("2024-01-01", periods=100)}).to_excel(data, index=False)
+    sample = sr.sample_excel(data, 3, "xlsx")
+    assert sample["a"] == [0, 1, 2]
+    assert sample["d"][0].startswith("2024-01-01")
+
+
+def test_budget_cuts_rows_and_tables():
+    budget = sr.SampleBudget(max_bytes=20)
+    assert budget.fit({"a": [1, 2, 3], "b": ["x", "y", "z"]}) == {"a": [1, 2], "b": ["x", "y"]}
+    assert budget.fit({"a": [1000]}) == {}
+
+
+def test_data_reader_reads_samples():
+    reader = dr.DataReader("data.csv", b"a,b\n1,2\n3,4\n", schema_only=True, sample_rows=10)
+    assert reader.schema.samples == {"a": [1, 3], "b": [2, 4]}
+
+
+def test_schema_only_csv_without_schema_reader_is_read_once(monkeypatch):
+    def read_again(*args, **kwargs):
+        raise AssertionError("the file was read again")
+
+    monkeypatch.setattr(sr, "sample_csv", read_again)
+    monkeypatch.setattr(dr.cp, "profile_csv", read_again)
+    reader = dr.DataReader("data.csv", b"a,b\n1,2\n3,4\n", schema_only=True, sample_rows=10, profile=True)
+    assert reader.data is None
+    assert reader.schema.samples == {"a": [1, 3], "b": [2, 4]}
+    assert reader.schema.profiles["a"]["count"] == 2
+
+
+@pytest.mark.parametrize("sample_budget, has_sample_data", [(None, True), (0, False)])
+def test_register_product_sets_samples_and_flag(dp_zip, blob_storage, dp_details, sample_budget, has_sample_data):
+    dp_form.register_product(
+        dp_zip,
+        dp_details,
+        blob_storage,
+        reader_options={"sample_rows": 2},
+        sample_budget=sample_budget,
+    )
+    assert dp_details.flags["has_sample_data"] is has_sample_data
+    # the first column is column 'a' of the csv item, which is sampled at random
+    column = dp_details.data_product_detail_sample_data_column[0].to_dict()
+    if has_sample_data:
+        assert len(column["data"]) == 2 and set(column["data"]) <= {1, 2, 3}
+    else:
+        assert column["data"] == []
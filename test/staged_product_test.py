@@ -0,0 +1,60 @@
+import io
+import pandas as pd
+import pytest
+import src.modules.logic.blob_storage as bs
+import src.modules.logic.staged_product as sp
+import src.modules.ui_components.dp_form as dp_form
+
+
+@pytest.fixture
+def staging(make_blob_storage) -> bs.BlobStorage:
+    """Fixture that creates a staging container holding a large parquet file and a csv file under landing/sales"""
+    storage = make_blob_storage("landing")
+    with io.BytesIO() as f:
+        pd.DataFrame({'a':range(200_000),'b':[0.5]*200_000}).to_parquet(f)
+        storage.blob_service_client.blobs["landing/sales/big.parquet"] = f.getvalue()
+    storage.blob_service_client.blobs["landing/sales/small.csv"] = b"a,b\n1,x\n2,y\n"
+    return storage
+
+
+def test_staged_product_lists_and_checks_items(staging):
+    product = sp.StagedProduct(staging, "landing/sales/")
+    assert product.data_product_items == ["big.parquet", "small.csv"]
+    assert product.estimate.members == 2
+    assert product.size == product.estimate.uncompressed_bytes
+
+    staging.blob_service_client.blobs["landing/sales/notes.txt"] = b"hello"
+    with pytest.raises(ValueError, match="unsupported file type"):
+        sp.StagedProduct(staging, "landing/sales")
+    with pytest.raises(ValueError, match="no data"):
+        sp.StagedProduct(staging, "landing/orders")
+
+
+def test_register_staged_product_copies_items_server_side(staging, blob_storage, dp_details):
+    product = sp.StagedProduct(staging, "landing/sales")
+    dp_form.register_product(product, dp_details, blob_storage, max_workers=2, parse_workers=2)
+
+    tables = dp_details.data_product_detail_sample_data_table
+    assert [table.data_table_name for table in tables] == ["big.parquet", "small.csv"]
+    assert tables[0].schema.num_rows == 200_000
+    assert blob_storage.blob_service_client.blobs == {
+        "sales/big.parquet": staging.blob_service_client.blobs["landing/sales/big.parquet"],
+        "sales/small.csv": staging.blob_service_client.blobs["landing/sales/small.csv"],
+    }
+    # the parquet schema comes from the footer, only a small part of the file is downloaded
+    downloaded = staging.blob_service_client.downloaded["landing/sales/big.parquet"]
+    assert downloaded < len(staging.blob_service_client.blobs["landing/sales/big.parquet"]) / 2
+
+
+def test_staged_csv_is_read_only_until_its_schema_is_stable(staging, blob_storage, dp_details):
+    data = b"a,b\n" + b"".join(f"{i},x\n".encode() for i in range(800_000))
+    staging.blob_service_client.blobs["landing/sales/small.csv"] = data
+    product = sp.StagedProduct(staging, "landing/sales")
+    dp_form.register_product(product, dp_details, blob_storage, reader_options={"sample_rows": 5})
+
+    table = dp_details.data_product_detail_sample_data_table[1]
+    assert table.schema.columns['a'] == 'int64'
+    assert table.schema.num_rows is None
+    assert len(table.schema.samples['a']) == 5
+    assert staging.blob_service_client.downloaded["landing/sales/small.csv"] < len(data) / 2
+    assert blob_storage.blob_service_client.blobs["sales/small.csv"] == data
@@ -0,0 +1,13 @@
+import benchmarks.startup as startup
+
+
+def test_import_stays_within_budget():
+    result = startup.measure_import()
+    assert result["heavy_modules"] == []
+    assert result["seconds"] <= startup.IMPORT_BUDGET
+
+
+def test_first_render_stays_within_budget():
+    result = startup.measure_first_render()
+    assert result["exceptions"] == []
+    assert result["seconds"] <= startup.FIRST_RENDER_BUDGET
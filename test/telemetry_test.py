@@ -0,0 +1,73 @@
+import json
+import logging
+import urllib.request
+import pytest
+import src.modules.logic.telemetry as tm
+import src.modules.ui_components.dp_form as dp_form
+
+
+def test_span_logs_measurements_and_throughput(caplog):
+    telemetry = tm.Telemetry()
+    with caplog.at_level(logging.INFO, logger=tm.__name__):
+        with telemetry.span("upload", "sales/table.csv", bytes=2_000_000) as span:
+            span.set(rows=10, columns=2)
+        span.duration = 2.0
+
+    logged = json.loads(caplog.records[-1].getMessage())["span"]
+    assert logged["stage"] == "upload"
+    assert logged["name"] == "sales/table.csv"
+    assert (logged["bytes"], logged["rows"], logged["columns"]) == (2_000_000, 10, 2)
+    assert span.mb_per_s == 1.0
+    assert telemetry.histogram("registration_stage_duration_seconds", stage="upload", status="ok").count == 1
+
+
+def test_failing_span_is_recorded_as_error():
+    telemetry = tm.Telemetry()
+    with pytest.raises(RuntimeError):
+        with telemetry.span("parse", "table.csv"):
+            raise RuntimeError("broken file")
+    assert telemetry.histogram("registration_stage_duration_seconds", stage="parse", status="error").count == 1
+
+
+def test_render_prometheus_histograms_and_gauges():
+    telemetry = tm.Telemetry(buckets=(0.1, 1.0))
+    telemetry.observe_call("POST catalog.example.com/tables", 0.05)
+    telemetry.observe_call("POST catalog.example.com/tables", 0.5)
+    telemetry.register_gauges("shared_resources", lambda: {"http_sessions": 2})
+
+    text = telemetry.render()
+    labels = 'target="POST catalog.example.com/tables",status="ok"'
+    assert f'external_call_duration_seconds_bucket{{{labels},le="0.1"}} 1' in text
+    assert f'external_call_duration_seconds_bucket{{{labels},le="1.0"}} 2' in text
+    assert f'external_call_duration_seconds_bucket{{{labels},le="+Inf"}} 2' in text
+    assert f"external_call_duration_seconds_count{{{labels}}} 2" in text
+    assert "shared_resources_http_sessions 2" in text
+
+
+def test_http_target_drops_the_query_string():
+    assert tm.http_target("POST", "https://backend.example.com/create?code=secret") == "POST backend.example.com/create"
+
+
+def test_metrics_server_serves_metrics():
+    telemetry = tm.Telemetry()
+    telemetry.observe_call("blob.stage_block", 0.2)
+    server = tm.MetricsServer(telemetry, port=0, host="127.0.0.1")
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/metrics") as response:
+            body = response.read().decode()
+    finally:
+        server.stop()
+    assert 'external_call_duration_seconds_count{target="blob.stage_block",status="ok"} 1' in body
+
+
+def test_register_product_records_a_span_per_member(dp_zip, blob_storage, dp_details):
+    def count(stage):
+        histogram = tm.telemetry.histogram("registration_stage_duration_seconds", stage=stage, status="ok")
+        return histogram.count if histogram else 0
+
+    before = {stage: count(stage) for stage in ("zip_open", "parse", "upload")}
+    dp_form.register_product(dp_zip, dp_details, blob_storage, stream_upload=True)
+
+    assert count("zip_open") - before["zip_open"] == 1
+    assert count("parse") - before["parse"] == 3
+    assert count("upload") - before["upload"] == 3
@@ -0,0 +1,38 @@
+import pytest
+import io
+import src.modules.logic.data_product_details as dp
+import src.modules.logic.data_reader as dr
+import src.modules.logic.upload_cache as uc
+
+
+def make_tables(n_columns: int) -> list[dp.DataProductDetailSampleDataTable]:
+    schema = dr.TableSchema({f"column_{i}": "int64" for i in range(n_columns)})
+    return [dp.DataProductDetailSampleDataTable("data.parquet", 1, "parent", schema=schema)]
+
+
+def test_cache_key_depends_on_content_and_name():
+    first = uc.UploadCache.cache_key(io.BytesIO(b"zip"), "sales")
+    assert first == uc.UploadCache.cache_key(io.BytesIO(b"zip"), "sales")
+    assert first != uc.UploadCache.cache_key(io.BytesIO(b"zip"), "stock")
+    assert first != uc.UploadCache.cache_key(io.BytesIO(b"other zip"), "sales")
+
+
+def test_reuse_attaches_tables_to_the_new_data_product():
+    cache = uc.UploadCache({})
+    cache.put("key", make_tables(2))
+    table = cache.get("key").tables[0]
+    table_id, column_ids = table.id, table.get_all_registered_column_ids()
+    tables = cache.get("key").reuse("new-parent")
+    assert tables[0].parent_id == "new-parent"
+    # a retried registration does not post the ids of the earlier attempt
+    assert tables[0].id != table_id and tables[0].columns.parent_id == tables[0].id
+    assert not set(tables[0].get_all_registered_column_ids()) & set(column_ids)
+
+
+def test_least_recently_used_entries_are_evicted():
+    store = {}
+    cache = uc.UploadCache(store, max_bytes=1)
+    cache.put("old", make_tables(2))
+    cache.put("new", make_tables(2))
+    assert list(store["upload_cache"]) == ["new"]
+    assert uc.UploadCache(store).get("new") is not None
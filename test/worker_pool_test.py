@@ -0,0 +1,51 @@
+import pytest
+import threading
+import time
+import src.modules.logic.worker_pool as wp
+
+
+def test_results_in_submission_order():
+    with wp.BoundedWorkerPool(4) as pool:
+        for i in range(10):
+            pool.submit(lambda x: x * 2, i)
+        results = pool.wait()
+    assert results == [i * 2 for i in range(10)]
+
+
+def test_pending_is_bounded():
+    running = []
+    lock = threading.Lock()
+    peak = [0]
+
+    def task():
+        with lock:
+            running.append(1)
+            peak[0] = max(peak[0], len(running))
+        time.sleep(0.01)
+        with lock:
+            running.pop()
+
+    with wp.BoundedWorkerPool(2, max_pending=2) as pool:
+        for _ in range(8):
+            pool.submit(task)
+            assert len(pool._pending) <= 2
+        pool.wait()
+    assert peak[0] <= 2
+
+
+def test_first_error_cancels_outstanding():
+    started = []
+
+    def task(i):
+        started.append(i)
+        if i == 0:
+            raise RuntimeError("upload failed")
+        time.sleep(0.05)
+
+    pool = wp.BoundedWorkerPool(1, max_pending=20)
+    with pytest.raises(RuntimeError):
+        with pool:
+            for i in range(10):
+                pool.submit(task, i)
+            pool.wait()
+    assert len(started) < 10
@@ -0,0 +1,121 @@
+import io
+import zipfile
+import pyarrow as pa
+import pytest
+import src.modules.logic.zip_handler as zh
+
+
+class UnseekableStream(io.RawIOBase):
+    """Stream that can only be read from start to end, like a http response body"""
+
+    def __init__(self, data: bytes):
+        self._data = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        chunk = self._data.read(len(buffer))
+        buffer[: len(chunk)] = chunk
+        return len(chunk)
+
+
+def make_zip(compression: int) -> io.BytesIO:
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, "w", compression) as zip_:
+        zip_.writestr("sales/table.parquet", b"PAR1" + b"x" * 1000 + b"PAR1")
+        zip_.writestr("sales/table.csv", "a,b\n1,2\n")
+    data.seek(0)
+    return data
+
+
+def test_stored_items_are_mapped_without_copy():
+    handler = zh.ZipHandler(make_zip(zipfile.ZIP_STORED), "sales")
+    item = handler.open_seekable_dp_item("table.parquet")
+    assert isinstance(item, pa.BufferReader)
+    assert item.read() == b"PAR1" + b"x" * 1000 + b"PAR1"
+    assert handler.map_dp_item("table.csv").read() == b"a,b\n1,2\n"
+
+
+def test_mapped_items_do_not_lock_the_upload():
+    upload = make_zip(zipfile.ZIP_STORED)
+    handler = zh.ZipHandler(upload, "sales")
+    item = handler.map_dp_item("table.parquet")
+    # the upload can still be changed and closed, the mapped item keeps its content
+    upload.seek(0)
+    upload.write(b"overwritten")
+    upload.truncate(4)
+    upload.close()
+    assert item.read() == b"PAR1" + b"x" * 1000 + b"PAR1"
+
+
+@pytest.mark.parametrize("max_memory, spooled_type", [(10_000, io.BytesIO), (100, io.BufferedRandom)])
+def test_compressed_items_are_spooled(max_memory, spooled_type):
+    handler = zh.ZipHandler(make_zip(zipfile.ZIP_DEFLATED), "sales", max_memory=max_memory)
+    assert handler.map_dp_item("table.parquet") is None
+    with handler.open_seekable_dp_item("table.parquet") as item:
+        assert isinstance(item, spooled_type)
+        item.seek(-4, io.SEEK_END)
+        assert item.read() == b"PAR1"
+
+
+def test_unseekable_uploads_are_spooled():
+    handler = zh.ZipHandler(UnseekableStream(make_zip(zipfile.ZIP_STORED).getvalue()), "sales", max_memory=100)
+    assert handler.uploaded_file.seekable()
+    assert handler.map_dp_item("table.csv").read() == b"a,b\n1,2\n"
+
+
+def test_preflight_estimates_cost_from_central_directory():
+    handler = zh.ZipHandler(make_zip(zipfile.ZIP_DEFLATED), "sales")
+    assert handler.estimate.members == 2
+    assert handler.estimate.uncompressed_bytes == 1008 + 8
+    assert 0 < handler.estimate.compressed_bytes < handler.estimate.uncompressed_bytes
+    assert handler.estimate.seconds > 0
+    assert "2 data product items" in str(handler.estimate)
+
+
+def test_preflight_rejects_unsupported_file_types():
+    data = make_zip(zipfile.ZIP_STORED)
+    with zipfile.ZipFile(data, "a") as zip_:
+        zip_.writestr("sales/notes.txt", "hello")
+    with pytest.raises(ValueError, match="unsupported file type 'txt'"):
+        zh.ZipHandler(data, "sales")
+
+
+def test_preflight_rejects_oversized_items_and_zip_bombs():
+    with pytest.raises(ValueError, match="limit"):
+        zh.ZipHandler(make_zip(zipfile.ZIP_STORED), "sales", max_item_size=100)
+
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, "w", zipfile.ZIP_DEFLATED) as zip_:
+        zip_.writestr("sales/bomb.csv", b"0" * (4 * 1024 * 1024))
+    with pytest.raises(ValueError, match="compression ratio"):
+        zh.ZipHandler(data, "sales")
+    assert zh.ZipHandler(data, "sales", max_compression_ratio=10_000).estimate.members == 1
+
+
+def test_directory_entries_are_no_items():
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, "w") as zip_:
+        zip_.writestr("sales/", b"")
+        zip_.writestr("sales/table.csv", "a,b\n1,2\n")
+    handler = zh.ZipHandler(data, "sales")
+    assert handler.data_product_items == ["table.csv"]
+    assert handler.estimate.members == 1
+
+
+def test_preflight_rejects_items_above_the_total_size():
+    with pytest.raises(ValueError, match="limit for a data product"):
+        zh.ZipHandler(make_zip(zipfile.ZIP_STORED), "sales", max_total_size=1010)
+    assert zh.ZipHandler(make_zip(zipfile.ZIP_STORED), "sales", max_total_size=1016).estimate.members == 2
+
+
+def test_preflight_of_an_upload_rewinds_it():
+    data = make_zip(zipfile.ZIP_DEFLATED)
+    assert zh.ZipHandler.preflight(data).members == 2
+    assert data.tell() == 0
+    with pytest.raises(ValueError, match="limit"):
+        zh.ZipHandler.preflight(data, max_item_size=100)
+    assert data.tell() == 0
+    with pytest.raises(ValueError, match="no valid ZipFile"):
+        zh.ZipHandler.preflight(io.BytesIO(b"not a zip"))